@@ -0,0 +1,130 @@
+#! /usr/bin/python3
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks import workloads
+
+
+class _CountingStream(object):
+
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+        self.lines += text.count("\n")
+
+
+def _build_and_make(factory, args):
+    start = time.perf_counter()
+    sourceobj = factory(*args)
+    built = time.perf_counter()
+    stream = _CountingStream()
+    sourceobj.make(stream)
+    made = time.perf_counter()
+    return built - start, made - built, stream
+
+
+def _peak_memory(factory, args):
+    # traced separately, since tracemalloc slows down the timed runs
+    tracemalloc.start()
+    try:
+        _build_and_make(factory, args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(name, scale, repeat):
+    factory, size = workloads.WORKLOADS[name]
+    args = [max(1, int(size * scale))]
+    build_times = []
+    make_times = []
+    for _ in range(repeat):
+        gc.collect()
+        build_time, make_time, stream = _build_and_make(factory, args)
+        build_times.append(build_time)
+        make_times.append(make_time)
+    make_time = min(make_times)
+    return dict(
+        name=name,
+        size=args[0],
+        build_seconds=min(build_times),
+        make_seconds=make_time,
+        lines=stream.lines,
+        bytes=stream.bytes,
+        lines_per_second=stream.lines / make_time,
+        bytes_per_second=stream.bytes / make_time,
+        peak_memory_bytes=_peak_memory(factory, args),
+    )
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    old = {result["name"]: result for result in baseline["results"]}
+    for result in results["results"]:
+        if result["name"] not in old:
+            continue
+        for key in ["build_seconds", "make_seconds", "peak_memory_bytes"]:
+            before = old[result["name"]][key]
+            ratio = result[key] / before if before else float("inf")
+            print("{:16} {:18} {:+8.1%}".format(result["name"], key,
+                                                ratio - 1), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure rendering throughput and memory",
+    )
+    parser.add_argument("workloads", nargs="*",
+                        help="workloads to run, out of {} (default: all)"
+                        .format(", ".join(sorted(workloads.WORKLOADS))))
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply the size of every workload")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timed runs per workload, the best is kept")
+    parser.add_argument("--output", help="write JSON results to a file")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    args = parser.parse_args()
+    names = args.workloads or sorted(workloads.WORKLOADS)
+    for name in names:
+        if name not in workloads.WORKLOADS:
+            parser.error("unknown workload {}".format(name))
+    results = dict(
+        revision=_git_revision(),
+        python=platform.python_version(),
+        scale=args.scale,
+        results=[run(name, args.scale, args.repeat) for name in names],
+    )
+    text = json.dumps(results, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#! /usr/bin/python3
+
+import array
+
+from codegen.lang.c import ccode, cdata, cdecl, csource, ctemplate
+
+ct_int = cdecl.Primitive("int")
+
+
+def funcs(count):
+    sourceobj = csource.CSource()
+    for i in range(count):
+        a = ccode.Variable(ct_int("a"))
+        b = ccode.Variable(ct_int("b"), cdata.IntLiteral(i))
+        decl = cdecl.Func(ct_int, [a.decl])("func{}".format(i))
+        elseb = ccode.ElseBlock(code=[ccode.Return(b)])
+        sourceobj.add_element(ccode.Func(decl, variables=[b], code=[
+            ccode.AssignmentAddition(b, ccode.Multiplication(a, a)),
+            ccode.IfBlock(ccode.GreaterThan(b, cdata.IntLiteral(0)),
+                          code=[ccode.Return(ccode.Minus(b))],
+                          elseb=elseb),
+        ]))
+    return sourceobj
+
+
+def template_funcs(count):
+    # the same functions as funcs, instantiated from a template
+    name = ctemplate.Placeholder("name")
+    value = ctemplate.Placeholder("value")
+    a = ccode.Variable(ct_int("a"))
+    b = ccode.Variable(ct_int("b"), value)
+    decl = cdecl.Func(ct_int, [a.decl])(str(name))
+    elseb = ccode.ElseBlock(code=[ccode.Return(b)])
+    template = ctemplate.Template(ccode.Func(decl, variables=[b], code=[
+        ccode.AssignmentAddition(b, ccode.Multiplication(a, a)),
+        ccode.IfBlock(ccode.GreaterThan(b, cdata.IntLiteral(0)),
+                      code=[ccode.Return(ccode.Minus(b))],
+                      elseb=elseb),
+    ]))
+    sourceobj = csource.CSource()
+    for i in range(count):
+        sourceobj.add_element(template.instantiate(dict(
+            name="func{}".format(i),
+            value=str(i),
+        )))
+    return sourceobj
+
+
+def deep_chain(depth):
+    expr = ccode.Expr("x0")
+    for i in range(1, depth):
+        expr = ccode.Addition(expr, ccode.Expr("x{}".format(i)))
+    sourceobj = csource.CSource()
+    sourceobj.add_element(ccode.Global(ct_int("chain"), expr))
+    return sourceobj
+
+
+def compound_table(count):
+    values = [cdata.IntLiteral(i, cdata.IntLiteral.B_HEX)
+              for i in range(count)]
+    sourceobj = csource.CSource()
+    sourceobj.add_element(ccode.Global(cdecl.Array(ct_int)("table"),
+                                       cdata.CompoundLiteral(values)))
+    return sourceobj
+
+
+def array_table(count):
+    # the same table as compound_table, without an element per value
+    values = array.array("i", range(count))
+    sourceobj = csource.CSource()
+    sourceobj.add_element(ccode.Global(
+        cdecl.Array(ct_int)("table"),
+        cdata.ArrayLiteral(values, cdata.IntLiteral.B_HEX),
+    ))
+    return sourceobj
+
+
+def long_string(size):
+    data = bytes(i * 7 % 256 for i in range(size))
+    sourceobj = csource.CSource()
+    sourceobj.add_element(ccode.Global(
+        cdecl.Array(cdecl.Primitive("char"))("data"),
+        cdata.StringLiteral(data, width=76),
+    ))
+    return sourceobj
+
+
+def large_struct(count, structs=10):
+    sourceobj = csource.CSource()
+    for i in range(structs):
+        fields = [cdecl.Array(ct_int, j % 8 + 1)("field{}".format(j))
+                  for j in range(count)]
+        struct = cdecl.Struct("struct{}".format(i), fields)
+        sourceobj.add_element(ccode.Global(struct("instance{}".format(i))))
+    return sourceobj
+
+
+# name -> (factory, the size it is given at scale 1)
+WORKLOADS = dict(
+    funcs=(funcs, 10000),
+    template_funcs=(template_funcs, 10000),
+    deep_chain=(deep_chain, 10000),
+    compound_table=(compound_table, 1000000),
+    array_table=(array_table, 1000000),
+    long_string=(long_string, 1 << 20),
+    large_struct=(large_struct, 10000),
+)
@@ -1,11 +1,85 @@
 #! /usr/bin/python3
 
 
+def walk(source, gen):
+    # Render without recursion: every _iter_act generator yields the child
+    # elements it wants rendered, and is resumed once they are done.
+    stack = [gen]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        for child in stack[-1]:
+            push(child._iter_act(source))
+            break
+        else:
+            pop()
+
+
+def iter_walk(source, gen, hook=None):
+    # Same as walk, but gives control back to the caller after every step.
+    # If a hook is given, it is told about every element entering and
+    # leaving the stack, and may take over the rendering of an element.
+    stack = [(gen, None)]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        top, node = stack[-1]
+        for child in top:
+            if hook is None or hook._enter(source, child):
+                push((child._iter_act(source), child))
+            break
+        else:
+            pop()
+            if hook is not None and node is not None:
+                hook._leave(source, node)
+        yield
+
+
+class HookChain(object):
+
+    def __init__(self, hooks):
+        self.hooks = hooks
+
+    def _enter(self, source, element):
+        for i, hook in enumerate(self.hooks):
+            if not hook._enter(source, element):
+                # the element is done, for the hooks which have seen it
+                for entered in reversed(self.hooks[:i]):
+                    entered._leave(source, element)
+                return False
+        return True
+
+    def _leave(self, source, element):
+        for hook in reversed(self.hooks):
+            hook._leave(source, element)
+
+
 class Code(object):
 
+    __slots__ = ()
+
+    # set if the rendered text of the element only depends on its subtree,
+    # which must not be changed after it is created
+    CACHEABLE = False
+    # set if the element has a _version which is bumped whenever it changes
+    MUTABLE = False
+    # names of the slots which hold child elements, or lists of them
+    CHILDREN = ()
+    # slots in CHILDREN whose elements are declarations
+    DECLARATIONS = ()
+    # the CHILDREN of the element where it is declared, if they differ
+    DECLARATION_CHILDREN = None
+
     def _act(self, source):
         raise NotImplementedError("This is an abstract class")
 
+    def _iter_act(self, source):
+        # fallback for elements which only implement a recursive _act.
+        # elements without children may return an empty iterable instead of
+        # being generators, which spares walk() from creating one.
+        self._act(source)
+        return ()
+
     @staticmethod
     def _parts_act_with_seperator(source, parts, sep):
         first = True
@@ -16,8 +90,32 @@ class Code(object):
             part._act(source)
 
 
+class IterativeCode(Code):
+
+    __slots__ = ()
+
+    # Override _iter_act in child class. _act is derived from it.
+
+    def _act(self, source):
+        walk(source, self._iter_act(source))
+
+    def _iter_act(self, source):
+        raise NotImplementedError("This is an abstract class")
+
+    @staticmethod
+    def _iter_parts_with_seperator(source, parts, sep):
+        first = True
+        for part in parts:
+            if not first:
+                source.write(sep)
+            first = False
+            yield part
+
+
 class _EmptyLine(Code):
 
+    __slots__ = ()
+
     def _act(self, source):
         source.linefeed()
 
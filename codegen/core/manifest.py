@@ -0,0 +1,95 @@
+#! /usr/bin/python3
+
+import hashlib
+import json
+import os
+import stat
+
+
+def _create(dirname):
+    # Creates a new file in dirname, with the mode files are created with.
+    # Returns its descriptor and path.
+    while True:
+        path = os.path.join(dirname, ".{}.tmp".format(os.urandom(8).hex()))
+        try:
+            return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                           0o666), path
+        except FileExistsError:
+            continue
+
+
+def _replace(path, chunks):
+    # the temporary file is created next to path so that os.replace is atomic
+    fd, tmppath = _create(os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w") as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+        # the file it replaces keeps its mode
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            pass
+        else:
+            os.chmod(tmppath, mode)
+    except BaseException:
+        os.unlink(tmppath)
+        raise
+    return tmppath
+
+
+def make_if_changed(source, path, digest=None):
+    # Render source into path unless the rendered content hashes to digest
+    # and path exists. Returns the new digest and whether path was written.
+    sha = hashlib.sha256()
+
+    def chunks():
+        for chunk in source.iter_chunks():
+            sha.update(chunk.encode())
+            yield chunk
+
+    tmppath = _replace(path, chunks())
+    new_digest = sha.hexdigest()
+    if new_digest == digest and os.path.exists(path):
+        os.unlink(tmppath)
+        return new_digest, False
+    os.replace(tmppath, path)
+    return new_digest, True
+
+
+class Manifest(object):
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.changed = []
+        self._digests = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                content = json.load(f)
+            if content.get("version") == self.VERSION:
+                self._digests = content["files"]
+
+    # entries are relative to the manifest, so the tree may be moved around
+    def _key(self, path):
+        return os.path.relpath(path, os.path.dirname(self.path) or ".")
+
+    def get(self, path):
+        return self._digests.get(self._key(path))
+
+    def update(self, path, digest, changed):
+        self._digests[self._key(path)] = digest
+        if changed:
+            self.changed.append(path)
+
+    def make(self, path, source):
+        digest, changed = make_if_changed(source, path, self.get(path))
+        self.update(path, digest, changed)
+        return changed
+
+    def save(self):
+        content = dict(version=self.VERSION, files=self._digests)
+        tmppath = _replace(self.path, [json.dumps(content, indent=1,
+                                                  sort_keys=True)])
+        os.replace(tmppath, self.path)
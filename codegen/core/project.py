@@ -0,0 +1,68 @@
+#! /usr/bin/python3
+
+import collections
+import concurrent.futures
+
+from codegen.core import code, manifest
+
+FileResult = collections.namedtuple("FileResult", [
+    "path",
+    "error",
+    "changed",
+])
+
+
+def _make_file(path, source, digest):
+    return manifest.make_if_changed(source, path, digest)
+
+
+class Project(object):
+
+    def __init__(self):
+        self.files = collections.OrderedDict()
+
+    def add_file(self, path, source):
+        if path in self.files:
+            msg = "Multiple sources for {}".format(path)
+            raise code.CodeError(msg)
+        self.files[path] = source
+
+    @staticmethod
+    def _submit(executor, files, manifestobj):
+        futures = []
+        for path, source in files:
+            digest = None if manifestobj is None else manifestobj.get(path)
+            try:
+                future = executor.submit(_make_file, path, source, digest)
+            except Exception as e:
+                future = concurrent.futures.Future()
+                future.set_exception(e)
+            futures.append((path, future))
+        return futures
+
+    @staticmethod
+    def _result(path, future, manifestobj):
+        error = future.exception()
+        if error is not None:
+            return FileResult(path, error, False)
+        digest, changed = future.result()
+        if manifestobj is not None:
+            manifestobj.update(path, digest, changed)
+        return FileResult(path, None, changed)
+
+    # Sources are rendered by a process pool unless another executor is
+    # given. Results are returned in the order the files were added, with
+    # the exception that failed each file or None. If a manifest is given,
+    # files whose content did not change are left untouched, and the
+    # manifest is updated (but not saved).
+    def make(self, executor=None, max_workers=None, manifest=None):
+        own_executor = executor is None
+        if own_executor:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+        try:
+            futures = self._submit(executor, self.files.items(), manifest)
+            return [self._result(path, future, manifest)
+                    for path, future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
@@ -0,0 +1,62 @@
+#! /usr/bin/python3
+
+import collections
+
+
+class RenderCache(object):
+
+    DEFAULT_SIZE = 1 << 12
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # (element, indent level, indented) -> (text, dependencies), where
+        # dependencies are (element, version) pairs of the mutable elements
+        # the text was rendered from
+        self._entries = collections.OrderedDict()
+        # (key, dependencies) of the entries being rendered
+        self._captures = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    @staticmethod
+    def _is_valid(deps):
+        return all(element._version == version for element, version in deps)
+
+    def _enter(self, source, element):
+        if element.MUTABLE and self._captures:
+            self._captures[-1][1].append((element, element._version))
+        if not element.CACHEABLE:
+            return True
+        key = (element, source._indent_level, source._indented)
+        entry = self._entries.get(key)
+        if entry is not None:
+            text, deps = entry
+            if self._is_valid(deps):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if self._captures:
+                    self._captures[-1][1].extend(deps)
+                source._replay(text)
+                return False
+            del self._entries[key]
+        self.misses += 1
+        self._captures.append((key, []))
+        source._begin_capture()
+        return True
+
+    def _leave(self, source, element):
+        if not element.CACHEABLE:
+            return
+        key, deps = self._captures.pop()
+        text = source._end_capture()
+        if self._captures:
+            self._captures[-1][1].extend(deps)
+        self._entries[key] = (text, tuple(deps))
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
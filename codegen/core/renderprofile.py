@@ -0,0 +1,67 @@
+#! /usr/bin/python3
+
+import collections
+import time
+
+NodeProfile = collections.namedtuple("NodeProfile", [
+    "name",
+    "count",
+    "cumulative_time",
+    "self_time",
+    "bytes",
+])
+
+
+class _Stats(object):
+
+    __slots__ = ("count", "cumulative_time", "self_time", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.cumulative_time = 0.0
+        self.self_time = 0.0
+        self.bytes = 0
+
+
+class RenderProfile(object):
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._stats = collections.defaultdict(_Stats)
+        # [start time, start offset, time in children, bytes of children]
+        self._frames = []
+
+    def _enter(self, source, element):
+        self._frames.append([self.clock(), source._tell(), 0.0, 0])
+        return True
+
+    def _leave(self, source, element):
+        start, offset, child_time, child_bytes = self._frames.pop()
+        elapsed = self.clock() - start
+        written = source._tell() - offset
+        stats = self._stats[type(element)]
+        stats.count += 1
+        stats.cumulative_time += elapsed
+        stats.self_time += elapsed - child_time
+        stats.bytes += written - child_bytes
+        if self._frames:
+            self._frames[-1][2] += elapsed
+            self._frames[-1][3] += written
+
+    # elements which are nested in elements of the same class are counted
+    # in the cumulative time of both
+    def report(self):
+        profiles = [NodeProfile(cls.__name__, stats.count,
+                                stats.cumulative_time, stats.self_time,
+                                stats.bytes)
+                    for cls, stats in self._stats.items()]
+        profiles.sort(key=lambda profile: profile.self_time, reverse=True)
+        return profiles
+
+    def format(self):
+        lines = ["{:24} {:>10} {:>12} {:>12} {:>12}".format(
+            "class", "count", "cumulative", "self", "bytes")]
+        for profile in self.report():
+            lines.append("{:24} {:10} {:12.6f} {:12.6f} {:12}".format(
+                *profile))
+        return "\n".join(lines)
@@ -2,7 +2,9 @@
 
 import collections
 
-SourceConfig = collections.namedtuple("SourceFileConfig", [
+from codegen.core import code
+
+SourceConfig = collections.namedtuple("SourceConfig", [
     "indentation",
     "seperate_elements",
 ])
@@ -15,17 +17,20 @@ class _SourceStream(object):
         self.stream = stream
         self._indent_level = 0
         self._indented = False
+        # _indents[n] is the prefix of a line at indentation level n
+        self._indents = [""]
 
     def indent(self):
         self._indent_level += 1
+        if self._indent_level == len(self._indents):
+            self._indents.append(self._indent_level * self.config.indentation)
 
     def dedent(self):
         self._indent_level -= 1
 
     def write(self, text):
         if not self._indented:
-            self.stream.write(self._indent_level *
-                              self.config.indentation)
+            self.stream.write(self._indents[self._indent_level])
             self._indented = True
         self.stream.write(text)
 
@@ -37,10 +42,133 @@ class _SourceStream(object):
         self.write(text)
         self.linefeed()
 
+    def flush(self):
+        pass
+
+
+class _Captured(object):
+
+    # Text captured by a buffered source stream. It keeps the parts it was
+    # written in, where nested captures are kept as they are, so a capture
+    # does not copy the text of the ones inside it.
+    __slots__ = ("_parts", "_text", "length", "indented")
+
+    def __init__(self, parts, length, indented):
+        self._parts = parts
+        self._text = None
+        self.length = length
+        # whether the text does not end a line
+        self.indented = indented
+
+    def _write_parts(self, out):
+        stack = [iter(self._parts)]
+        while stack:
+            for part in stack[-1]:
+                if type(part) is not _Captured:
+                    out.append(part)
+                elif part._text is not None:
+                    out.append(part._text)
+                else:
+                    stack.append(iter(part._parts))
+                    break
+            else:
+                stack.pop()
+
+    @property
+    def text(self):
+        if self._text is None:
+            out = []
+            self._write_parts(out)
+            self._text = "".join(out)
+            self._parts = None
+        return self._text
+
+    def __str__(self):
+        return self.text
+
+
+class _BufferedSourceStream(_SourceStream):
+
+    DEFAULT_THRESHOLD = 1 << 16
+
+    def __init__(self, config, stream, threshold=DEFAULT_THRESHOLD):
+        _SourceStream.__init__(self, config, stream)
+        self.threshold = threshold
+        self._parts = []
+        self._pending = 0
+        self._flushed = 0
+        # (start offset in _parts, characters written before it) of the
+        # captures in progress
+        self._captures = []
+
+    def write(self, text):
+        parts = self._parts
+        if not self._indented:
+            prefix = self._indents[self._indent_level]
+            parts.append(prefix)
+            self._pending += len(prefix)
+            self._indented = True
+        parts.append(text)
+        self._pending += len(text)
+        if self._pending >= self.threshold:
+            self.flush()
+
+    def linefeed(self):
+        self._parts.append("\n")
+        self._indented = False
+        self._pending += 1
+        if self._pending >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        if self._captures:
+            return
+        if self._parts:
+            text = "".join(part.text if type(part) is _Captured else part
+                           for part in self._parts)
+            self.stream.write(text)
+            self._parts = []
+        self._flushed += self._pending
+        self._pending = 0
+
+    # number of characters written so far
+    def _tell(self):
+        return self._flushed + self._pending
+
+    def _begin_capture(self):
+        self._captures.append((len(self._parts), self._tell()))
+
+    # Returns what was written since the matching _begin_capture. It takes
+    # the place of its parts, so enclosing captures share it.
+    def _end_capture(self):
+        start, offset = self._captures.pop()
+        captured = _Captured(self._parts[start:], self._tell() - offset,
+                             self._indented)
+        self._parts[start:] = [captured]
+        return captured
+
+    # write what was previously returned by _end_capture, which was captured
+    # in the same indentation state
+    def _replay(self, captured):
+        if not captured.length:
+            return
+        self._parts.append(captured)
+        self._indented = captured.indented
+        self._pending += captured.length
+        if self._pending >= self.threshold:
+            self.flush()
+
+
+class _ChunkSink(object):
+
+    def __init__(self, chunks):
+        self.write = chunks.append
+
 
 class Source(object):
 
     _SOURCE_STREAM_CLASS = _SourceStream
+    _BUFFERED_SOURCE_STREAM_CLASS = _BufferedSourceStream
 
     def __init__(self, config):
         self.config = config
@@ -49,11 +177,56 @@ class Source(object):
     def add_element(self, element):
         self.elements.append(element)
 
-    def make(self, stream):
-        source_stream = self._SOURCE_STREAM_CLASS(self.config, stream)
+    def _make_source_stream(self, stream, buffered, threshold):
+        if not buffered:
+            return self._SOURCE_STREAM_CLASS(self.config, stream)
+        if threshold is None:
+            threshold = self._BUFFERED_SOURCE_STREAM_CLASS.DEFAULT_THRESHOLD
+        return self._BUFFERED_SOURCE_STREAM_CLASS(self.config, stream,
+                                                  threshold)
+
+    # buffered=False writes every fragment to the stream as it is produced,
+    # which is useful when the output is watched interactively
+    # render_cache and profile need to track the output, so they imply
+    # buffered=True. profile is told about elements before render_cache, so
+    # it sees cached elements as well.
+    def make(self, stream, buffered=True, threshold=None, render_cache=None,
+             profile=None):
+        hooks = [hook for hook in (profile, render_cache) if hook is not None]
+        if hooks:
+            buffered = True
+        source_stream = self._make_source_stream(stream, buffered, threshold)
+        gen = self._iter_act(source_stream)
+        if not hooks:
+            code.walk(source_stream, gen)
+        else:
+            hook = hooks[0] if len(hooks) == 1 else code.HookChain(hooks)
+            for _ in code.iter_walk(source_stream, gen, hook):
+                pass
+        source_stream.flush()
+
+    def iter_chunks(self, chunk_size=None):
+        chunks = []
+        source_stream = self._make_source_stream(_ChunkSink(chunks), True,
+                                                 chunk_size)
+        for _ in code.iter_walk(source_stream, self._iter_act(source_stream)):
+            if chunks:
+                yield from chunks
+                del chunks[:]
+        source_stream.flush()
+        yield from chunks
+
+    DEFAULT_FILE_BUFFERING = 1 << 20
+
+    def make_to_path(self, path, buffering=DEFAULT_FILE_BUFFERING,
+                     threshold=None):
+        with open(path, "w", buffering=buffering) as stream:
+            self.make(stream, threshold=threshold)
+
+    def _iter_act(self, source_stream):
         first = True
         for element in self.elements:
             if not first and self.config.seperate_elements:
                 source_stream.linefeed()
             first = False
-            element._act(source_stream)
+            yield element
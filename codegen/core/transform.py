@@ -0,0 +1,249 @@
+#! /usr/bin/python3
+
+from codegen.core import code
+
+# class -> names of all of its slots
+_SLOTS = {}
+
+
+def _all_slots(cls):
+    slots = _SLOTS.get(cls)
+    if slots is None:
+        slots = []
+        for base in reversed(cls.__mro__):
+            names = base.__dict__.get("__slots__", ())
+            if isinstance(names, str):
+                names = (names,)
+            slots.extend(name for name in names if name != "__weakref__")
+        slots = _SLOTS[cls] = tuple(slots)
+    return slots
+
+
+def _copy(node):
+    cls = type(node)
+    new = cls.__new__(cls)
+    for name in _all_slots(cls):
+        try:
+            value = getattr(node, name)
+        except AttributeError:
+            continue
+        object.__setattr__(new, name, value)
+    return new
+
+
+def _schema(node, declared):
+    if declared and node.DECLARATION_CHILDREN is not None:
+        return node.DECLARATION_CHILDREN
+    return node.CHILDREN
+
+
+def _iter_slots(node, slots):
+    # (child, whether it is declared there) for the children in slots
+    for name in slots:
+        value = getattr(node, name)
+        if value is None:
+            continue
+        declared = name in node.DECLARATIONS
+        if isinstance(value, (list, tuple)):
+            for child in value:
+                yield child, declared
+        else:
+            yield value, declared
+
+
+def children(node, declared=False):
+    # the child elements of node, in the order of its CHILDREN. declared
+    # tells whether node is where it is declared, rather than used.
+    for child, _ in _iter_slots(node, _schema(node, declared)):
+        yield child
+
+
+def iter_nodes(root):
+    # every element under root, parents before children
+    stack = [(root, False)]
+    while stack:
+        node, declared = stack.pop()
+        yield node
+        stack.extend(reversed(list(_iter_slots(node,
+                                               _schema(node, declared)))))
+
+
+def with_children(node, values, declared=False):
+    # Returns node with the slots in its CHILDREN set to values. Elements
+    # which are MUTABLE are changed in place. Others are copied, since they
+    # may be shared.
+    changed = [(name, value)
+               for name, value in zip(_schema(node, declared), values)
+               if value is not getattr(node, name)]
+    if not changed:
+        return node
+    if node.MUTABLE:
+        for name, value in changed:
+            old = getattr(node, name)
+            if isinstance(old, list):
+                old[:] = value
+            else:
+                setattr(node, name, value)
+        node._changed()
+        return node
+    node = _copy(node)
+    for name, value in changed:
+        object.__setattr__(node, name, value)
+    return node
+
+
+class Pass(object):
+
+    # Only elements of these types are given to transform. None means all.
+    TYPES = None
+    # Set if transform only returns elements whose children have already
+    # been through the walk, so later passes may run in the same walk.
+    FUSIBLE = True
+
+    # Override in child class. Called for every element after its children,
+    # returns what to put in its place. In a list of elements, a list may be
+    # returned to be spliced in its place.
+    def transform(self, node):
+        raise NotImplementedError("This is an abstract class")
+
+    # Override in child class. Returns whether node, which is a child of
+    # parent, is left for the transform of parent to handle. Both are as
+    # they were before the walk.
+    def defer(self, node, parent):
+        return False
+
+
+class _Frame(object):
+
+    __slots__ = ("node", "declared", "slots", "pending", "results")
+
+    def __init__(self, node, declared):
+        self.node = node
+        self.declared = declared
+        self.slots = _schema(node, declared)
+        # (child, whether it is declared there) to walk, last first
+        self.pending = list(_iter_slots(node, self.slots))
+        self.pending.reverse()
+        # what each walked child is replaced with
+        self.results = []
+
+    def values(self):
+        node = self.node
+        values = []
+        results = iter(self.results)
+        for name in self.slots:
+            value = getattr(node, name)
+            if value is None:
+                values.append(None)
+            elif isinstance(value, (list, tuple)):
+                new = []
+                for _ in value:
+                    result = next(results)
+                    if isinstance(result, list):
+                        new.extend(result)
+                    else:
+                        new.append(result)
+                if len(new) == len(value) and \
+                        all(a is b for a, b in zip(new, value)):
+                    new = value
+                elif isinstance(value, tuple):
+                    new = tuple(new)
+                values.append(new)
+            else:
+                result = next(results)
+                if isinstance(result, list):
+                    msg = "Cannot put a list of elements in {}.{}".format(
+                        type(node).__name__, name)
+                    raise code.CodeError(msg)
+                values.append(result)
+        return values
+
+
+class _Walk(object):
+
+    def __init__(self, passes):
+        self.passes = passes
+        # type -> transform methods which apply to it
+        self._dispatch = {}
+        self._deferring = [p for p in passes
+                           if type(p).defer is not Pass.defer]
+
+    def _transforms(self, cls):
+        transforms = self._dispatch.get(cls)
+        if transforms is None:
+            transforms = self._dispatch[cls] = tuple(
+                p.transform for p in self.passes
+                if p.TYPES is None or issubclass(cls, p.TYPES))
+        return transforms
+
+    def _apply(self, node, original, parent):
+        # runs the passes one after the other on node and what replaces it
+        deferred = ()
+        if parent is not None and self._deferring:
+            deferred = [p.transform for p in self._deferring
+                        if p.defer(original, parent)]
+        nodes = [node]
+        for p in self.passes:
+            new_nodes = []
+            for node in nodes:
+                if p.transform not in self._transforms(type(node)) or \
+                        p.transform in deferred:
+                    new_nodes.append(node)
+                    continue
+                result = p.transform(node)
+                if isinstance(result, list):
+                    new_nodes.extend(result)
+                elif result is not None:
+                    new_nodes.append(result)
+            nodes = new_nodes
+        if len(nodes) == 1:
+            return nodes[0]
+        return nodes
+
+    def run(self, root):
+        stack = [_Frame(root, False)]
+        while True:
+            frame = stack[-1]
+            if frame.pending:
+                child, declared = frame.pending.pop()
+                if _schema(child, declared) or \
+                        self._transforms(type(child)):
+                    stack.append(_Frame(child, declared))
+                else:
+                    frame.results.append(child)
+                continue
+            stack.pop()
+            node = with_children(frame.node, frame.values(), frame.declared)
+            parent = stack[-1].node if stack else None
+            result = self._apply(node, frame.node, parent)
+            if not stack:
+                return result
+            stack[-1].results.append(result)
+
+
+class PassManager(object):
+
+    def __init__(self, passes=None):
+        self.passes = list(passes) if passes is not None else []
+
+    def add_pass(self, p):
+        self.passes.append(p)
+
+    def _groups(self):
+        # passes which run in the same walk. A pass which is not FUSIBLE
+        # ends its group, since it may leave new elements behind.
+        group = []
+        for p in self.passes:
+            group.append(p)
+            if not p.FUSIBLE:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def run(self, root):
+        # Runs the passes over the tree under root, in as few walks as
+        # possible, and returns what root is replaced with.
+        for group in self._groups():
+            root = _Walk(group).run(root)
+        return root
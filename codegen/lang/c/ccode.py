@@ -1,63 +1,141 @@
 #! /usr/bin/python3
 
-import string
+import re
 
 from codegen.core import code
 
 from . import cdecl
 
-
-class _CCode(code.Code):
-
-    # set to a boolean value or override get_parentheses_behaviour
-    PARENTHESES_BEHAVIOUR = None
+# C operator precedence levels, from the loosest binding to the tightest
+(
+    LOWEST,
+    COMMA,
+    ASSIGNMENT,
+    CONDITIONAL,
+    LOGICAL_OR,
+    LOGICAL_AND,
+    BIT_OR,
+    BIT_XOR,
+    BIT_AND,
+    EQUALITY,
+    RELATIONAL,
+    SHIFT,
+    ADDITIVE,
+    MULTIPLICATIVE,
+    PREFIX,
+    POSTFIX,
+    PRIMARY,
+) = range(17)
+
+_COMPARISONS = frozenset(["==", "!=", "<", "<=", ">", ">="])
+
+# Operands which gcc -Wparentheses wants in parentheses, even though the
+# precedence makes them unambiguous.
+_CLARIFY = {
+    "<<": frozenset(["+", "-"]),
+    ">>": frozenset(["+", "-"]),
+    "&": frozenset(["+", "-"]) | _COMPARISONS,
+    "^": frozenset(["+", "-", "&"]) | _COMPARISONS,
+    "|": frozenset(["+", "-", "&", "^"]) | _COMPARISONS,
+    "||": frozenset(["&&"]),
+}
+_CLARIFY.update((op, _COMPARISONS) for op in _COMPARISONS)
+
+
+class _CCode(code.IterativeCode):
+
+    __slots__ = ()
+
+    # set to a precedence level or override get_precedence
+    PRECEDENCE = None
     SEMICOLON_BEHAVIOUR = True
+    # OPs of operands which are always put in parentheses
+    CLARIFY = frozenset()
 
-    def needs_parentheses(self):
-        if self.PARENTHESES_BEHAVIOUR is None:
-            return self.get_parentheses_behaviour()
-        return self.PARENTHESES_BEHAVIOUR
+    def precedence(self):
+        if self.PRECEDENCE is None:
+            return self.get_precedence()
+        return self.PRECEDENCE
 
-    def get_parentheses_behaviour(self):
+    def get_precedence(self):
         raise NotImplementedError("This is an abstract class")
 
-    def _act_with_parentheses(self, source, force=False):
-        needs_parentheses = True if force else self.needs_parentheses()
+    # whether the element needs parentheses to be the operand of an operator
+    # whose operands must bind at least as tight as precedence
+    def needs_parentheses(self, precedence=PREFIX):
+        return self.precedence() < precedence
+
+    # clarify is the CLARIFY of the operator, which force was found with
+    def _iter_act_with_parentheses(self, source, force=False,
+                                   precedence=PREFIX, clarify=frozenset()):
+        needs_parentheses = force or self.needs_parentheses(precedence)
         if needs_parentheses:
             source.write("(")
-        self._act(source)
+        yield self
         if needs_parentheses:
             source.write(")")
 
+    def _act_with_parentheses(self, source, force=False, precedence=PREFIX):
+        code.walk(source, self._iter_act_with_parentheses(source, force,
+                                                          precedence))
+
+    def _iter_operand(self, source, operand, precedence):
+        force = getattr(operand, "OP", None) in self.CLARIFY
+        yield from operand._iter_act_with_parentheses(source, force,
+                                                      precedence,
+                                                      self.CLARIFY)
+
 
 class Expr(_CCode):
 
+    __slots__ = ("expr", "_precedence")
+
     def __init__(self, expr):
         self.expr = expr
+        # (expr, its precedence), for the last expr it was found for
+        self._precedence = (None, None)
 
-    def _act(self, source):
+    def _iter_act(self, source):
         source.write(self.expr)
+        return ()
+
+    _TOKEN = re.compile(r"[0-9A-Za-z_]+\Z")
 
-    _IDENTIFIER_CHARS = string.digits + string.ascii_letters + "_"
+    def _find_precedence(self):
+        # nothing is known about the expression unless it is a single token
+        if self._TOKEN.match(self.expr):
+            return PRIMARY
+        return LOWEST
 
-    def get_parentheses_behaviour(self):
-        return not all(c in self._IDENTIFIER_CHARS for c in self.expr)
+    def get_precedence(self):
+        expr, precedence = self._precedence
+        if expr is not self.expr:
+            precedence = self._find_precedence()
+            self._precedence = (self.expr, precedence)
+        return precedence
 
 
 class Variable(Expr):
 
-    PARENTHESES_BEHAVIOUR = False
+    __slots__ = ("decl", "value")
+    PRECEDENCE = PRIMARY
+    # a variable is a name where it is used, its value is only a part of its
+    # declaration
+    DECLARATION_CHILDREN = ("value",)
 
     def __init__(self, decl, value=None):
         self.decl = decl
         self.value = value
         Expr.__init__(self, decl.name)
 
-    def _var_act(self, source):
-        source.write(str(self.decl))
+    def _iter_var_act(self, source):
+        self.decl._write(source)
         if self.value is not None:
             source.write(" = ")
-            self.value._act(source)
+            yield self.value
+
+    def _var_act(self, source):
+        code.walk(source, self._iter_var_act(source))
 
     @staticmethod
     def to_args(variables):
@@ -66,9 +144,12 @@ class Variable(Expr):
 
 class Global(Variable):
 
-    def _act(self, source):
-        Variable._var_act(self, source)
-        source.writeline(";");
+    __slots__ = ()
+    CHILDREN = ("value",)
+
+    def _iter_act(self, source):
+        yield from Variable._iter_var_act(self, source)
+        source.writeline(";")
 
     def to_variable(self):
         return Variable(self.decl, self.value)
@@ -76,8 +157,13 @@ class Global(Variable):
 
 class _BinaryOperation(_CCode):
 
+    __slots__ = ("left", "right")
     OP = None
-    PARENTHESES_BEHAVIOUR = True
+    CACHEABLE = True
+    CHILDREN = ("left", "right")
+    # the precedence the left and right operands must have
+    LEFT_PRECEDENCE = None
+    RIGHT_PRECEDENCE = None
 
     def __init__(self, left, right):
         if self.OP is None:
@@ -85,77 +171,187 @@ class _BinaryOperation(_CCode):
         self.left = left
         self.right = right
 
-    def _act(self, source):
-        self.left._act_with_parentheses(source)
+    def _iter_act(self, source):
+        yield from self._iter_operand(source, self.left, self.LEFT_PRECEDENCE)
         source.write(" {} ".format(self.OP))
-        self.right._act_with_parentheses(source)
-
-
-def _create_binary_operation(name, op):
-    return type(name, (_BinaryOperation,), dict(OP=op))
-
-
-Addition = _create_binary_operation("Addition", "+")
-Subtraction = _create_binary_operation("Subtraction", "-")
-Multiplication = _create_binary_operation("Multiplication", "*")
-Division = _create_binary_operation("Division", "/")
-Modulo = _create_binary_operation("Modulo", "%")
-Assignment = _create_binary_operation("Assignment", "=")
-AssignmentAddition = _create_binary_operation("AssignmentAddition", "+=")
-AssignmentSubtraction = _create_binary_operation("AssignmentSubtraction", "-=")
+        yield from self._iter_operand(source, self.right,
+                                      self.RIGHT_PRECEDENCE)
+
+
+def _create_binary_operation(name, op, precedence):
+    # assignments group right to left, everything else left to right
+    if precedence == ASSIGNMENT:
+        left, right = precedence + 1, precedence
+    else:
+        left, right = precedence, precedence + 1
+    return type(name, (_BinaryOperation,), dict(
+        OP=op,
+        PRECEDENCE=precedence,
+        LEFT_PRECEDENCE=left,
+        RIGHT_PRECEDENCE=right,
+        CLARIFY=_CLARIFY.get(op, frozenset()),
+        __slots__=(),
+    ))
+
+
+Addition = _create_binary_operation("Addition", "+", ADDITIVE)
+Subtraction = _create_binary_operation("Subtraction", "-", ADDITIVE)
+Multiplication = _create_binary_operation("Multiplication", "*",
+                                          MULTIPLICATIVE)
+Division = _create_binary_operation("Division", "/", MULTIPLICATIVE)
+Modulo = _create_binary_operation("Modulo", "%", MULTIPLICATIVE)
+Assignment = _create_binary_operation("Assignment", "=", ASSIGNMENT)
+AssignmentAddition = _create_binary_operation("AssignmentAddition", "+=",
+                                              ASSIGNMENT)
+AssignmentSubtraction = _create_binary_operation("AssignmentSubtraction",
+                                                 "-=", ASSIGNMENT)
 AssignmentMultiplication = _create_binary_operation(
     "AssignmentMultiplication",
-    "*",
+    "*=",
+    ASSIGNMENT,
 )
-AssignmentDivision = _create_binary_operation("AssignmentDivision", "/=")
-AssignmentModulo = _create_binary_operation("AssignmentModulo", "%=")
-Equal = _create_binary_operation("Equal", "==")
-Unequal = _create_binary_operation("Unequal", "!=")
-LessThan = _create_binary_operation("LessThan", "<")
-LessEqualThan = _create_binary_operation("LessEqualThan", "<=")
-GreaterThan = _create_binary_operation("GreaterThan", ">")
-GreaterEqualThan = _create_binary_operation("GreaterEqualThan", ">=")
-LeftShift = _create_binary_operation("LeftShift", "<<")
-RightShift = _create_binary_operation("RightShift", ">>")
-And = _create_binary_operation("And", "&")
-Or = _create_binary_operation("Or", "|")
-Xor = _create_binary_operation("Xor", "^")
-LogicalAnd = _create_binary_operation("LogicalAnd", "&&")
-LogicalOr = _create_binary_operation("LogicalOr", "||")
+AssignmentDivision = _create_binary_operation("AssignmentDivision", "/=",
+                                              ASSIGNMENT)
+AssignmentModulo = _create_binary_operation("AssignmentModulo", "%=",
+                                            ASSIGNMENT)
+Equal = _create_binary_operation("Equal", "==", EQUALITY)
+Unequal = _create_binary_operation("Unequal", "!=", EQUALITY)
+LessThan = _create_binary_operation("LessThan", "<", RELATIONAL)
+LessEqualThan = _create_binary_operation("LessEqualThan", "<=", RELATIONAL)
+GreaterThan = _create_binary_operation("GreaterThan", ">", RELATIONAL)
+GreaterEqualThan = _create_binary_operation("GreaterEqualThan", ">=",
+                                            RELATIONAL)
+LeftShift = _create_binary_operation("LeftShift", "<<", SHIFT)
+RightShift = _create_binary_operation("RightShift", ">>", SHIFT)
+And = _create_binary_operation("And", "&", BIT_AND)
+Or = _create_binary_operation("Or", "|", BIT_OR)
+Xor = _create_binary_operation("Xor", "^", BIT_XOR)
+LogicalAnd = _create_binary_operation("LogicalAnd", "&&", LOGICAL_AND)
+LogicalOr = _create_binary_operation("LogicalOr", "||", LOGICAL_OR)
+
+
+class _NaryOperation(_CCode):
+
+    __slots__ = ("operands",)
+    OP = None
+    # the binary operation this is a chain of
+    BINARY = None
+    CACHEABLE = True
+    CHILDREN = ("operands",)
+
+    def __init__(self, operands):
+        if self.OP is None:
+            raise NotImplementedError("This is an abstract class")
+        operands = tuple(operands)
+        if not operands:
+            raise code.CodeError("An operation needs at least one operand")
+        self.operands = operands
+
+    def _iter_act(self, source):
+        sep = " {} ".format(self.OP)
+        # grouped like a left-nested chain of the binary operation
+        precedence = self.BINARY.LEFT_PRECEDENCE
+        first = True
+        for operand in self.operands:
+            if not first:
+                source.write(sep)
+            first = False
+            yield from self._iter_operand(source, operand, precedence)
+            precedence = self.BINARY.RIGHT_PRECEDENCE
+
+
+def _create_nary_operation(name, binary):
+    return type(name, (_NaryOperation,), dict(
+        OP=binary.OP,
+        BINARY=binary,
+        PRECEDENCE=binary.PRECEDENCE,
+        CLARIFY=binary.CLARIFY,
+        __slots__=(),
+    ))
+
+
+NaryAddition = _create_nary_operation("NaryAddition", Addition)
+NaryMultiplication = _create_nary_operation("NaryMultiplication",
+                                            Multiplication)
+NaryAnd = _create_nary_operation("NaryAnd", And)
+NaryOr = _create_nary_operation("NaryOr", Or)
+NaryXor = _create_nary_operation("NaryXor", Xor)
+NaryLogicalAnd = _create_nary_operation("NaryLogicalAnd", LogicalAnd)
+NaryLogicalOr = _create_nary_operation("NaryLogicalOr", LogicalOr)
 
 
 class _UnaryOperation(_CCode):
 
+    __slots__ = ("operand",)
     OP = None
-    PARENTHESES_BEHAVIOUR = False
+    CACHEABLE = True
+    CHILDREN = ("operand",)
+    # the precedence the operand must have
+    OPERAND_PRECEDENCE = None
 
     def __init__(self, operand):
         if self.OP is None:
             raise NotImplementedError("This is an abstract class")
         self.operand = operand
 
-    def _act_op(self, source):
+    def _iter_act_op(self, source):
         source.write(self.OP)
+        return ()
 
 
 class _PrefixUnaryOperation(_UnaryOperation):
 
-    def _act(self, source):
-        self._act_op(source)
-        self.operand._act_with_parentheses(source)
+    __slots__ = ()
+    PRECEDENCE = PREFIX
+    OPERAND_PRECEDENCE = PREFIX
+
+    # whether the operand would be read as a part of the operator, like in
+    # - -1, which must not be written as --1
+    def _pastes(self):
+        op = self.OP
+        if not isinstance(op, str) or op[-1:] not in ("+", "-", "&"):
+            return False
+        operand = self.operand
+        if isinstance(operand, _PrefixUnaryOperation):
+            first = operand.OP
+        else:
+            first = getattr(operand, "expr", None)
+        return isinstance(first, str) and first[:1] == op[-1:]
+
+    def _iter_act(self, source):
+        yield from self._iter_act_op(source)
+        if self._pastes():
+            yield from self.operand._iter_act_with_parentheses(source, True)
+        else:
+            yield from self._iter_operand(source, self.operand,
+                                          self.OPERAND_PRECEDENCE)
 
 
 class _PostfixUnaryOperation(_UnaryOperation):
 
-    def _act(self, source):
-        force_parentheses = isinstance(self.operand, _PrefixUnaryOperation)
-        self.operand._act_with_parentheses(source, force_parentheses)
-        self._act_op(source)
+    __slots__ = ()
+    PRECEDENCE = POSTFIX
+    OPERAND_PRECEDENCE = POSTFIX
+
+    def _iter_act(self, source):
+        yield from self._iter_operand(source, self.operand,
+                                      self.OPERAND_PRECEDENCE)
+        yield from self._iter_act_op(source)
 
 
 def _create_unary_operation(name, op, is_suffix=False):
     base = _PostfixUnaryOperation if is_suffix else _PrefixUnaryOperation
-    return type(name, (base,), dict(OP=op))
+    return type(name, (base,), dict(OP=op, __slots__=()))
+
+
+def _create_keyword(name, op):
+    # a keyword takes a whole expression, and is not an operand itself
+    return type(name, (_PrefixUnaryOperation,), dict(
+        OP=op,
+        PRECEDENCE=LOWEST,
+        OPERAND_PRECEDENCE=COMMA,
+        __slots__=(),
+    ))
 
 
 BitNegation = _create_unary_operation("BitNegation", "~")
@@ -167,20 +363,24 @@ PreIncrement = _create_unary_operation("PreIncrement", "++")
 PreDecrement = _create_unary_operation("PreDecrement", "--")
 PostIncrement = _create_unary_operation("PostIncrement", "++", True)
 PostDecrement = _create_unary_operation("PostDecrement", "--", True)
-Return = _create_unary_operation("Return", "return ")
-Extern = _create_unary_operation("Extern", "extern ")
-Static = _create_unary_operation("Static", "static ")
-Const = _create_unary_operation("Const", "const ")
-Typedef = _create_unary_operation("Typedef", "typedef ")
+Return = _create_keyword("Return", "return ")
+Extern = _create_keyword("Extern", "extern ")
+Static = _create_keyword("Static", "static ")
+Const = _create_keyword("Const", "const ")
+Typedef = _create_keyword("Typedef", "typedef ")
 
 
 class Block(_CCode):
 
+    __slots__ = ("vars", "code", "_version")
     # set to a boolean value if the same behaviour is always wanted
     BRACELETS_BEHAVIOUR = None
     SEMICOLON_BEHAVIOUR = False
     # only valid if self.needs_bracelets()
     END_WITH_LINEFEED = True
+    MUTABLE = True
+    CHILDREN = ("vars", "code")
+    DECLARATIONS = ("vars",)
 
     def __init__(self, variables=None, code=None):
         if variables is None:
@@ -189,17 +389,27 @@ class Block(_CCode):
         if code is None:
             code = []
         self.code = code
+        self._version = 0
 
     def add_code(self, code):
         self.code.append(code)
+        self._version += 1
 
     def add_var(self, var):
         self.vars.append(var)
+        self._version += 1
+
+    # call after changing the block other than through its methods
+    def _changed(self):
+        self._version += 1
 
     @staticmethod
-    def _parts_act(source, parts, attr="_act"):
+    def _iter_parts(source, parts, attr=None):
         for part in parts:
-            getattr(part, attr)(source)
+            if attr is None:
+                yield part
+            else:
+                yield from getattr(part, attr)(source)
             if part.SEMICOLON_BEHAVIOUR:
                 source.writeline(";")
 
@@ -208,29 +418,34 @@ class Block(_CCode):
             return self.BRACELETS_BEHAVIOUR
         return len(self.vars) != 0 or len(self.code) != 1
 
-    def _act(self, source, force_bracelets=False):
+    def end_with_linefeed(self):
+        return self.END_WITH_LINEFEED
+
+    def _iter_act(self, source, force_bracelets=False):
         needs_bracelets = force_bracelets or self.needs_bracelets()
         do_indent = needs_bracelets or not source._indented
         if needs_bracelets:
             source.writeline("{")
         if do_indent:
             source.indent()
-        self._parts_act(source, self.vars, attr="_var_act")
+        yield from self._iter_parts(source, self.vars, attr="_iter_var_act")
         if self.vars:
             source.linefeed()
-        self._parts_act(source, self.code)
+        yield from self._iter_parts(source, self.code)
         if do_indent:
             source.dedent()
         if needs_bracelets:
             source.write("}")
-            if self.END_WITH_LINEFEED:
+            if self.end_with_linefeed():
                 source.linefeed()
 
 
 class _CondBlock(Block):
 
+    __slots__ = ("cond",)
     # Override this in child class
     MAGIC_WORD = None
+    CHILDREN = ("cond", "vars", "code")
 
     def __init__(self, cond, *args, **kw):
         if self.MAGIC_WORD is None:
@@ -238,30 +453,34 @@ class _CondBlock(Block):
         self.cond = cond
         Block.__init__(self, *args, **kw)
 
-    def _act(self, source, *args, **kw):
+    def _iter_act(self, source, force_bracelets=False):
         source.write("{} (".format(self.MAGIC_WORD))
-        self.cond._act(source)
+        yield self.cond
         source.write(")")
-        if self.needs_bracelets():
+        if force_bracelets or self.needs_bracelets():
             source.write(" ")
         else:
             source.linefeed()
-        Block._act(self, source, *args, **kw)
+        yield from Block._iter_act(self, source, force_bracelets)
 
 
 class ElseBlock(Block):
 
+    __slots__ = ()
+
     def needs_bracelets(self):
         return Block.needs_bracelets(self) or type(self.code[0]) is not IfBlock
 
-    def _act(self, source):
+    def _iter_act(self, source):
         source.write(" else ")
-        Block._act(self, source)
+        yield from Block._iter_act(self, source)
 
 
 class IfBlock(_CondBlock):
 
+    __slots__ = ("elseb",)
     MAGIC_WORD = "if"
+    CHILDREN = ("cond", "vars", "code", "elseb")
 
     def __init__(self, *args, **kw):
         elseb = kw.pop("elseb", None)
@@ -274,65 +493,161 @@ class IfBlock(_CondBlock):
         if self.elseb is not None:
             msg = "Cannot attach multiple else blocks to a single if block"
             raise code.CodeError(msg)
-        self.BRACELETS_BEHAVIOUR = True
-        self.END_WITH_LINEFEED = False
         self.elseb = elseb
+        self._version += 1
+
+    # an else block continues on the closing line of the if block
+    def needs_bracelets(self):
+        return self.elseb is not None or _CondBlock.needs_bracelets(self)
 
-    def _act(self, source):
+    def end_with_linefeed(self):
+        return self.elseb is None and _CondBlock.end_with_linefeed(self)
+
+    def _iter_act(self, source):
         # if source line is already indented, we are part of an else-if
         force_bracelets = source._indented
-        _CondBlock._act(self, source, force_bracelets)
+        yield from _CondBlock._iter_act(self, source, force_bracelets)
         if self.elseb:
-            self.elseb._act(source)
+            yield self.elseb
 
 
 class WhileLoop(_CondBlock):
 
+    __slots__ = ()
     MAGIC_WORD = "while"
 
 
 class ForLoop(_CondBlock):
 
+    __slots__ = ()
     MAGIC_WORD = "for"
 
     class _ForCond(_CCode):
 
+        __slots__ = ("args",)
+        CHILDREN = ("args",)
+
         def __init__(self, *args):
             self.args = args
 
-        def _act(self, source):
-            self._parts_act_with_seperator(source, self.args, "; ")
+        def _iter_act(self, source):
+            yield from self._iter_parts_with_seperator(source, self.args,
+                                                       "; ")
 
     def __init__(self, init, cond, loop, *args, **kw):
         _CondBlock.__init__(self, self._ForCond(init, cond, loop), *args, **kw)
 
 
+class Case(Block):
+
+    __slots__ = ("values", "fallthrough")
+    CHILDREN = ("values", "vars", "code")
+
+    def __init__(self, values, variables=None, code=None, fallthrough=False):
+        self.values = values
+        self.fallthrough = fallthrough
+        Block.__init__(self, variables, code)
+
+    def _iter_labels(self, source):
+        first = True
+        for value in self.values:
+            if not first:
+                source.linefeed()
+            first = False
+            source.write("case ")
+            yield value
+            source.write(":")
+
+    def _ends_with_jump(self):
+        return bool(self.code) and type(self.code[-1]) is Return
+
+    def _iter_act(self, source):
+        # labels are aligned with the switch statement
+        source.dedent()
+        yield from self._iter_labels(source)
+        if self.vars:
+            # declarations may not follow a label directly
+            source.writeline(" {")
+        else:
+            source.linefeed()
+        source.indent()
+        yield from self._iter_parts(source, self.vars, attr="_iter_var_act")
+        if self.vars:
+            source.linefeed()
+        yield from self._iter_parts(source, self.code)
+        if not self.fallthrough:
+            if not self._ends_with_jump():
+                source.writeline("break;")
+        elif self.code:
+            source.writeline("/* fallthrough */")
+        if self.vars:
+            source.dedent()
+            source.writeline("}")
+            source.indent()
+
+
+class Default(Case):
+
+    __slots__ = ()
+
+    def __init__(self, variables=None, code=None, fallthrough=False):
+        Case.__init__(self, (), variables, code, fallthrough)
+
+    def _iter_labels(self, source):
+        source.write("default:")
+        return ()
+
+
+class SwitchBlock(_CondBlock):
+
+    __slots__ = ()
+    MAGIC_WORD = "switch"
+    BRACELETS_BEHAVIOUR = True
+
+    def __init__(self, cond, cases=None):
+        _CondBlock.__init__(self, cond, code=cases)
+
+    def add_case(self, case):
+        self.add_code(case)
+
+
 class Call(_PostfixUnaryOperation):
 
+    __slots__ = ("args",)
     OP = object()  # not None
+    CHILDREN = ("operand", "args")
 
     def __init__(self, func, args):
-        self.func = func
         self.args = args
         _PostfixUnaryOperation.__init__(self, func)
 
-    def _act_op(self, source):
+    @property
+    def func(self):
+        return self.operand
+
+    @func.setter
+    def func(self, func):
+        self.operand = func
+
+    def _iter_act_op(self, source):
         source.write("(")
-        self._parts_act_with_seperator(source, self.args, ", ")
+        yield from self._iter_parts_with_seperator(source, self.args, ", ")
         source.write(")")
 
 
 class Func(Block):
 
+    __slots__ = ("decl",)
     BRACELETS_BEHAVIOUR = True
 
     def __init__(self, decl, *args, **kw):
         self.decl = decl
         Block.__init__(self, *args, **kw)
 
-    def _act(self, source):
-        source.writeline(str(self.decl))
-        Block._act(self, source)
+    def _iter_act(self, source):
+        self.decl._write(source)
+        source.linefeed()
+        yield from Block._iter_act(self, source)
 
     def to_expr(self):
         return Expr(self.decl.name)
@@ -340,32 +655,58 @@ class Func(Block):
 
 class StatementExpression(Block):
 
+    __slots__ = ()
     END_WITH_LINEFEED = False
 
-    def _act(self, source):
+    def _iter_act(self, source):
         source.write("(")
-        Block._act(self, source)
+        yield from Block._iter_act(self, source)
         source.writeline(")")
 
 
+class StaticAssert(_CCode):
+
+    __slots__ = ("cond", "message")
+    SEMICOLON_BEHAVIOUR = False
+    CHILDREN = ("cond", "message")
+
+    def __init__(self, cond, message):
+        self.cond = cond
+        self.message = message
+
+    def _iter_act(self, source):
+        source.write("_Static_assert(")
+        yield self.cond
+        source.write(", ")
+        yield self.message
+        source.writeline(");")
+
+
 class Cast(_PrefixUnaryOperation):
 
-    PARENTHESES_BEHAVIOUR = True
+    __slots__ = ("casttype",)
+    OP = object()  # not None
 
     def __init__(self, casttype, value):
-        self.OP = "({})".format(cdecl.NamelessArg(casttype))
+        self.casttype = casttype
         _PrefixUnaryOperation.__init__(self, value)
 
+    def _iter_act_op(self, source):
+        source.write("({})".format(cdecl.NamelessArg(self.casttype)))
+        return ()
+
 
 class Subscript(_PostfixUnaryOperation):
 
+    __slots__ = ("index",)
     OP = object()  # not None
+    CHILDREN = ("operand", "index")
 
     def __init__(self, arr, index):
         self.index = index
         _PostfixUnaryOperation.__init__(self, arr)
 
-    def _act_op(self, source):
+    def _iter_act_op(self, source):
         source.write("[")
-        self.index._act(source)
+        yield self.index
         source.write("]")
@@ -0,0 +1,341 @@
+#! /usr/bin/python3
+
+import collections
+import re
+
+from codegen.core import transform
+
+from . import ccode, cdecl, crewrite
+
+# the type of the variables expressions are hoisted into
+AUTO_TYPE = cdecl.Primitive("__auto_type")
+
+_KEYWORDS = frozenset([
+    ccode.Return,
+    ccode.Extern,
+    ccode.Static,
+    ccode.Const,
+    ccode.Typedef,
+])
+_MODIFIERS = crewrite.INCREMENTS | frozenset([ccode.AddressOf])
+_IMPURE = (crewrite.ASSIGNMENTS | crewrite.INCREMENTS | _KEYWORDS |
+           frozenset([ccode.Call]))
+# only the first operand of these is always evaluated
+_SHORT_CIRCUIT = (
+    ccode.LogicalAnd,
+    ccode.LogicalOr,
+    ccode.NaryLogicalAnd,
+    ccode.NaryLogicalOr,
+)
+_MEMORY_READS = (ccode.Dereference, ccode.Subscript)
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*\Z")
+_IDENTIFIERS = re.compile(r"[A-Za-z_]\w*")
+
+
+class _Expressions(object):
+
+    # Gives structurally equal expressions the same key, and keeps what is
+    # known about the expressions per key.
+    def __init__(self):
+        self._ids = {}
+        # node -> key
+        self.keys = {}
+        # key -> a node with that key
+        self.nodes = {}
+        self.pure = {}
+        # key -> names the expression reads
+        self.reads = {}
+        # key -> whether the expression reads memory
+        self.memory = {}
+        # key -> number of nodes in the expression
+        self.size = {}
+
+    def key(self, root):
+        keys = self.keys
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            if node in keys:
+                continue
+            children = crewrite.children(node)
+            if visited:
+                self._add(node, children)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+        return keys[root]
+
+    def _add(self, node, children):
+        if not children:
+            if crewrite.is_leaf(node):
+                ident = (ccode.Expr, node.expr)
+                pure = True
+                reads = frozenset()
+                if _IDENTIFIER.match(node.expr):
+                    reads = frozenset([node.expr])
+            else:
+                # nothing is known about it, so it is only equal to itself
+                ident = (type(node), id(node))
+                pure = False
+                reads = frozenset()
+            memory = False
+            size = 1
+        else:
+            child_keys = tuple(self.keys[child] for child in children)
+            extra = node.casttype if isinstance(node, ccode.Cast) else None
+            ident = (type(node), extra) + child_keys
+            pure = (type(node) not in _IMPURE and
+                    all(self.pure[key] for key in child_keys))
+            reads = frozenset().union(*(self.reads[key]
+                                        for key in child_keys))
+            memory = (isinstance(node, _MEMORY_READS) or
+                      any(self.memory[key] for key in child_keys))
+            size = 1 + sum(self.size[key] for key in child_keys)
+        key = self._ids.setdefault(ident, len(self._ids))
+        if key not in self.nodes:
+            self.nodes[key] = node
+            self.pure[key] = pure
+            self.reads[key] = reads
+            self.memory[key] = memory
+            self.size[key] = size
+        self.keys[node] = key
+
+
+class _SideEffects(object):
+
+    # What the expressions of a block may change when they run.
+    def __init__(self, block):
+        self.names = set()
+        self.memory = False
+        self.calls = False
+        self.unknown = False
+        for expr in crewrite.expressions(block):
+            for node in crewrite.nodes(expr):
+                self._add(node)
+
+    def _add(self, node):
+        if type(node) in crewrite.ASSIGNMENTS:
+            self._write(node.left)
+        elif type(node) in _MODIFIERS:
+            # a variable whose address is taken may be written through it
+            self._write(node.operand)
+        elif isinstance(node, ccode.Call):
+            self.calls = True
+        elif not crewrite.children(node) and not crewrite.is_leaf(node):
+            self.unknown = True
+
+    def _write(self, target):
+        if crewrite.is_token(target):
+            self.names.add(target.expr)
+        else:
+            self.memory = True
+
+    # whether an expression keeps its value throughout the block
+    def keeps(self, exprs, key, local_names):
+        reads = exprs.reads[key]
+        if self.unknown or not reads.isdisjoint(self.names):
+            return False
+        if exprs.memory[key] and (self.memory or self.calls):
+            return False
+        # functions may change anything but local variables
+        return not self.calls or reads <= local_names
+
+
+def _is_opaque(expr):
+    # whether control may leave expr halfway
+    return any(isinstance(node, ccode.Call) or
+               (not crewrite.children(node) and not crewrite.is_leaf(node))
+               for node in crewrite.nodes(expr))
+
+
+def _is_barrier(statement):
+    # whether control may not go on to the next statement
+    return (type(statement) in _KEYWORDS or
+            not crewrite.children(statement) or _is_opaque(statement))
+
+
+class _Eliminator(object):
+
+    def __init__(self, ctype, prefix, names):
+        self.ctype = ctype
+        self.prefix = prefix
+        self.names = names
+        self.counter = 0
+
+    def _new_name(self):
+        while True:
+            name = "{}{}".format(self.prefix, self.counter)
+            self.counter += 1
+            if name not in self.names:
+                self.names.add(name)
+                return name
+
+    def eliminate(self, block, local_names):
+        blocks = [(block, frozenset(local_names))]
+        while blocks:
+            block, local_names = blocks.pop()
+            local_names = local_names | {var.decl.name for var in block.vars}
+            side_effects = _SideEffects(block)
+            if not side_effects.unknown:
+                self._block(block, side_effects, local_names)
+                local_names = local_names | {var.decl.name
+                                             for var in block.vars}
+            for statement in block.code:
+                if isinstance(statement, ccode.Block):
+                    blocks.append((statement, local_names))
+            if isinstance(block, ccode.IfBlock) and block.elseb is not None:
+                blocks.append((block.elseb, local_names))
+
+    def _roots(self, block):
+        # (expression, may it be hoisted from) for the expressions which
+        # are evaluated in the scope of block, in order
+        prefix = True
+        for statement in block.code:
+            if not isinstance(statement, ccode.Block):
+                yield statement, prefix and not _is_opaque(statement)
+                prefix = prefix and not _is_barrier(statement)
+                continue
+            conds = crewrite.conds(statement)
+            for i, cond in enumerate(conds):
+                # the last part of a for loop only runs after the body
+                anchored = (prefix and not _is_opaque(cond) and
+                            not (len(conds) == 3 and i == 2))
+                yield cond, anchored
+            prefix = False
+
+    def _block(self, block, side_effects, local_names):
+        exprs = _Expressions()
+        roots = []
+        counts = collections.Counter()
+        anchored = set()
+        for root, root_anchored in self._roots(block):
+            roots.append(root)
+            exprs.key(root)
+            stack = [(root, root_anchored)]
+            while stack:
+                node, node_anchored = stack.pop()
+                key = exprs.keys[node]
+                counts[key] += 1
+                if node_anchored:
+                    anchored.add(key)
+                children = crewrite.children(node)
+                for i, child in enumerate(children):
+                    conditional = i > 0 and isinstance(node, _SHORT_CIRCUIT)
+                    stack.append((child, node_anchored and not conditional))
+        selected = {
+            key for key, count in counts.items()
+            if count > 1 and exprs.size[key] > 1 and exprs.pure[key] and
+            key in anchored and side_effects.keeps(exprs, key, local_names)
+        }
+        selected = self._prune(exprs, roots, selected)
+        if not selected:
+            return
+        self._hoist(block, exprs, roots, selected)
+
+    @staticmethod
+    def _uses(exprs, roots, selected):
+        uses = collections.Counter()
+        stack = list(roots)
+        # a hoisted expression is evaluated once, in its initializer
+        for key in selected:
+            stack.extend(crewrite.children(exprs.nodes[key]))
+        while stack:
+            node = stack.pop()
+            key = exprs.keys[node]
+            if key in selected:
+                uses[key] += 1
+            else:
+                stack.extend(crewrite.children(node))
+        return uses
+
+    def _prune(self, exprs, roots, selected):
+        # drop expressions which are only used once after the larger ones
+        # containing them are hoisted
+        while selected:
+            uses = self._uses(exprs, roots, selected)
+            used = {key for key in selected if uses[key] > 1}
+            if used == selected:
+                break
+            selected = used
+        return selected
+
+    def _hoist(self, block, exprs, roots, selected):
+        refs = {}
+
+        def replace(node):
+            return refs.get(exprs.key(node), node)
+
+        # an expression is larger than those it contains, so they are
+        # declared before it
+        for key in sorted(selected, key=lambda key: (exprs.size[key], key)):
+            node = exprs.nodes[key]
+            children = crewrite.children(node)
+            new = [crewrite.rewrite(child, replace) for child in children]
+            if any(n is not old for n, old in zip(new, children)):
+                node = crewrite.rebuild(node, new)
+            name = self._new_name()
+            block.add_var(ccode.Variable(self.ctype(name), node))
+            ref = refs[key] = ccode.Expr(name)
+            exprs.keys[ref] = key
+        new_roots = iter([crewrite.rewrite(root, replace) for root in roots])
+        for i, statement in enumerate(block.code):
+            if not isinstance(statement, ccode.Block):
+                block.code[i] = next(new_roots)
+                continue
+            conds = crewrite.conds(statement)
+            if not conds:
+                continue
+            new = [next(new_roots) for _ in conds]
+            if all(n is old for n, old in zip(new, conds)):
+                continue
+            if isinstance(statement.cond, ccode.ForLoop._ForCond):
+                statement.cond = type(statement.cond)(*new)
+            else:
+                statement.cond, = new
+            statement._changed()
+        block._changed()
+
+
+def _names(block):
+    names = set()
+    for expr in crewrite.expressions(block):
+        for node in crewrite.nodes(expr):
+            if isinstance(node, ccode.Expr):
+                names.update(_IDENTIFIERS.findall(node.expr))
+    blocks = [block]
+    while blocks:
+        block = blocks.pop()
+        names.update(var.decl.name for var in block.vars)
+        blocks.extend(s for s in block.code if isinstance(s, ccode.Block))
+        if isinstance(block, ccode.IfBlock) and block.elseb is not None:
+            blocks.append(block.elseb)
+    return names
+
+
+def eliminate(func, ctype=AUTO_TYPE, prefix="cse"):
+    # Hoists subexpressions which are repeated in the statements of a block
+    # into new variables of the block, for func and every block nested in
+    # it. Only expressions without side effects, which keep their value
+    # throughout the block and would have been evaluated anyway, are
+    # hoisted. By default the variables are declared with the __auto_type
+    # extension of gcc and clang.
+    names = _names(func)
+    local_names = set()
+    if isinstance(func, ccode.Func):
+        names.add(func.decl.name)
+        local_names.update(arg.name for arg in func.decl.ctype.args)
+    _Eliminator(ctype, prefix, names).eliminate(func, local_names)
+
+
+class EliminatePass(transform.Pass):
+
+    TYPES = (ccode.Func,)
+    FUSIBLE = False
+
+    def __init__(self, ctype=AUTO_TYPE, prefix="cse"):
+        self.ctype = ctype
+        self.prefix = prefix
+
+    def transform(self, func):
+        eliminate(func, self.ctype, self.prefix)
+        return func
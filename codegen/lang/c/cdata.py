@@ -1,10 +1,21 @@
 #! /usr/bin/python3
 
+import array
+import contextlib
+import mmap
+import os
+import re
+import struct
+import sys
+
+from codegen.core import code
+
 from . import ccode
 
 
 class IntLiteral(ccode.Expr):
 
+    __slots__ = ("value", "base")
     B_HEX = object()
     B_DEC = object()
 
@@ -14,34 +25,284 @@ class IntLiteral(ccode.Expr):
     }
 
     def __init__(self, value, base=B_DEC):
+        self.value = value
+        self.base = base
         ccode.Expr.__init__(self, self._BASE_TO_STR[base](value))
 
+    def _find_precedence(self):
+        if self.expr.startswith("-"):
+            return ccode.PREFIX
+        return ccode.Expr._find_precedence(self)
 
-class StringLiteral(ccode.Expr):
 
-    @staticmethod
-    def _convert_char(c):
+def _escapes():
+    # characters which are written as escape sequences, like repr writes
+    # them
+    table = {}
+    for i in range(0x100):
+        c = chr(i)
         if c == "\"":  # special case since repr will enclose this with ''
-            return "\\\""
-        return repr(c)[1:-1]  # repr("\n") == "'\\n'", repr("b") == "'b'"
+            table[i] = "\\\""
+        else:
+            converted = repr(c)[1:-1]
+            if converted != c:
+                table[i] = converted
+    return table
+
+
+def _byte_escapes():
+    # Like _escapes, but for bytes, which are not characters outside of
+    # ASCII. Octal escapes have at most three digits, so unlike hex escapes
+    # they never take in a digit after them.
+    table = {}
+    for i in range(0x100):
+        c = chr(i)
+        if c in "\"\\":
+            table[i] = "\\" + c
+        elif c in "\n\r\t":
+            table[i] = repr(c)[1:-1]
+        elif not " " <= c <= "~":
+            table[i] = "\\{:03o}".format(i)
+    return table
+
+
+class StringLiteral(ccode.Expr):
+
+    __slots__ = ("pieces",)
+    PRECEDENCE = ccode.PRIMARY
+
+    _ESCAPES = _escapes()
+    _BYTE_ESCAPES = _byte_escapes()
+    # lengths of the escape sequences which are not two characters long
+    _ESCAPE_LENGTHS = dict(x=4, u=6, U=10, **{str(i): 4 for i in range(8)})
+    # a hex escape goes on for as long as there are hex digits, so the
+    # literal is split after one which is followed by a digit
+    _HEX_ESCAPE_BEFORE_DIGIT = re.compile(
+        r"(?<!\\)((?:\\\\)*\\x[0-9a-fA-F]{2})(?=[0-9a-fA-F])")
+    # a ? after a ? is escaped, so that no trigraph is formed
+    _TRIGRAPH = re.compile(r"(?<=\?)\?")
 
-    def __init__(self, s):
-        converted = "".join(self._convert_char(c) for c in s)
-        ccode.Expr.__init__(self, "\"{}\"".format(converted))
+    # s may be a str or bytes. If width is given, the literal is split into
+    # adjacent literals on seperate lines, of about width characters each
+    # between their quotes.
+    def __init__(self, s, width=None):
+        if width is not None and width < 1:
+            msg = "Cannot split a string literal every {} characters".format(
+                width)
+            raise code.CodeError(msg)
+        # only str has hex escapes
+        hex_escapes = not isinstance(s, (bytes, bytearray, memoryview))
+        if not hex_escapes:
+            converted = bytes(s).decode("latin-1").translate(
+                self._BYTE_ESCAPES)
+        else:
+            converted = s.translate(self._ESCAPES)
+            if not converted.isprintable():
+                # only left for characters which are not in the table
+                converted = "".join(c if c.isprintable() else repr(c)[1:-1]
+                                    for c in converted)
+        if width is None:
+            pieces = [converted]
+        else:
+            pieces = list(self._split(converted, width)) or [""]
+        self.pieces = [self._seperate(piece, hex_escapes)
+                       for piece in pieces]
+        ccode.Expr.__init__(self, " ".join("\"{}\"".format(piece)
+                                           for piece in self.pieces))
+
+    @classmethod
+    def _seperate(cls, piece, hex_escapes):
+        if hex_escapes and "\\x" in piece:
+            piece = cls._HEX_ESCAPE_BEFORE_DIGIT.sub(r'\1" "', piece)
+        if "??" in piece:
+            piece = cls._TRIGRAPH.sub(r"\\?", piece)
+        return piece
+
+    @classmethod
+    def _split(cls, converted, width):
+        # pieces of converted, which are only split between escape sequences
+        start = 0
+        while start < len(converted):
+            end = start + width
+            if end < len(converted):
+                # an escape sequence which crosses end starts shortly before
+                i = converted.rfind("\\", max(start, end - 9), end)
+                if i >= 0:
+                    j = i
+                    while j > start and converted[j - 1] == "\\":
+                        j -= 1
+                    # otherwise it is the second of an escaped backslash
+                    if (i - j) % 2 == 0:
+                        length = cls._ESCAPE_LENGTHS.get(converted[i + 1], 2)
+                        if i + length > end:
+                            end = i if i > start else i + length
+            yield converted[start:end]
+            start = end
+
+    def _iter_act(self, source):
+        pieces = iter(self.pieces)
+        source.write("\"{}\"".format(next(pieces)))
+        source.indent()
+        for piece in pieces:
+            source.linefeed()
+            source.write("\"{}\"".format(piece))
+        source.dedent()
+        return ()
 
 
 class CompoundLiteral(ccode._CCode):
 
+    __slots__ = ("values",)
+    PRECEDENCE = ccode.PRIMARY
+    CHILDREN = ("values",)
+
     def __init__(self, values):
         self.values = values
 
-    def _act(self, source):
+    def _iter_act(self, source):
         source.writeline("{")
         source.indent()
         for value in self.values:
-            value._act(source)
+            yield value
             source.writeline(",")
-#            self._parts_act_with_seperator(source, self.values, ", ")
+#            yield from self._iter_parts_with_seperator(source, self.values,
+#                                                       ", ")
 #            source.write(" ")
         source.dedent()
         source.write("}")
+
+
+# formats of buffers whose values memoryview reads itself
+_NATIVE_FORMATS = frozenset("bBhHiIlLqQnNfd")
+# struct format characters -> the array typecodes which may hold their
+# values, which are copied there if memoryview does not read them itself
+_ARRAY_TYPECODES = dict(
+    [(char, "bhilq") for char in "bhilqn"] +
+    [(char, "BHILQ") for char in "BHILQN"] +
+    [("?", "B"), ("f", "f"), ("d", "d")]
+)
+
+
+def _buffer_values(view):
+    # The values of the buffer view, in C order, in a form which slicing and
+    # tolist work on. They are copied if view does not have that form.
+    fmt = view.format
+    if fmt.lstrip("@") in _NATIVE_FORMATS:
+        if view.ndim == 1:
+            return view
+        if view.c_contiguous:
+            return view.cast("B").cast(fmt)
+        return memoryview(view.tobytes()).cast(fmt)
+    # a single value, with an optional byte order
+    order = fmt[:-1]
+    try:
+        size = struct.calcsize(fmt)
+    except struct.error:
+        size = None
+    if size is None or order not in ("", "@", "=", "<", ">", "!"):
+        msg = "Cannot write values of format {!r}".format(fmt)
+        raise code.CodeError(msg)
+    data = view.tobytes()
+    for typecode in _ARRAY_TYPECODES.get(fmt[-1:], ""):
+        if array.array(typecode).itemsize == size:
+            values = array.array(typecode, data)
+            if order in ("<", ">", "!") and \
+                    (order == "<") != (sys.byteorder == "little"):
+                values.byteswap()
+            return memoryview(values)
+    # like half floats, which no array holds
+    return [value for value, in struct.iter_unpack(fmt, data)]
+
+
+class ArrayLiteral(ccode._CCode):
+
+    __slots__ = ("values", "base", "per_line", "suffix")
+    PRECEDENCE = ccode.PRIMARY
+    # lines of values which are formatted and written at once
+    CHUNK_LINES = 1 << 12
+
+    # values is any object with the buffer protocol, like an array.array,
+    # bytes or a numpy array, or a sequence of numbers. Buffers with several
+    # dimensions are written in C order, and bools as 0 and 1. Rendered like
+    # a CompoundLiteral of IntLiterals, but without an element per value.
+    def __init__(self, values, base=IntLiteral.B_DEC, per_line=1, suffix=""):
+        if per_line < 1:
+            msg = "Cannot put {} values in a line".format(per_line)
+            raise code.CodeError(msg)
+        try:
+            view = memoryview(values)
+        except TypeError:
+            pass
+        else:
+            values = _buffer_values(view)
+        self.values = values
+        self.base = base
+        self.per_line = per_line
+        self.suffix = suffix
+
+    def _to_str(self):
+        return IntLiteral._BASE_TO_STR[self.base]
+
+    # a context manager which gives the values to write
+    def _open(self):
+        return contextlib.nullcontext(self.values)
+
+    def _write_values(self, source, values):
+        to_str = self._to_str()
+        per_line = self.per_line
+        value_sep = "{}, ".format(self.suffix)
+        line_sep = "{},\n{}".format(self.suffix,
+                                    source._indents[source._indent_level])
+        step = per_line * self.CHUNK_LINES
+        for start in range(0, len(values), step):
+            chunk = values[start:start + step]
+            if isinstance(chunk, memoryview):
+                chunk = chunk.tolist()
+            strs = list(map(to_str, chunk))
+            if per_line == 1:
+                text = line_sep.join(strs)
+            else:
+                text = line_sep.join(value_sep.join(strs[i:i + per_line])
+                                     for i in range(0, len(strs), per_line))
+            source.write(text)
+            source.writeline("{},".format(self.suffix))
+
+    def _iter_act(self, source):
+        source.writeline("{")
+        source.indent()
+        with self._open() as values:
+            if len(values):
+                self._write_values(source, values)
+        source.dedent()
+        source.write("}")
+        return ()
+
+
+class BlobLiteral(ArrayLiteral):
+
+    __slots__ = ("path",)
+
+    # The bytes of the file at path, written like xxd -i writes them. The
+    # file is only read when the literal is rendered, and is mapped to
+    # memory rather than read into it.
+    def __init__(self, path, per_line=12, suffix=""):
+        ArrayLiteral.__init__(self, b"", IntLiteral.B_HEX, per_line, suffix)
+        self.path = path
+
+    def _to_str(self):
+        return "0x{:02x}".format
+
+    @contextlib.contextmanager
+    def _open(self):
+        with open(self.path, "rb") as f:
+            # an empty file cannot be mapped
+            if not os.fstat(f.fileno()).st_size:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, \
+                    memoryview(m) as view:
+                yield view
+
+    # a global with the size of the file, like the one xxd -i writes
+    def length_global(self, decl):
+        return ccode.Global(decl, IntLiteral(os.path.getsize(self.path)))
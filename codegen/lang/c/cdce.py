@@ -0,0 +1,156 @@
+#! /usr/bin/python3
+
+import re
+
+from codegen.core import code, transform
+
+from . import ccode, cdata, cfold, crewrite
+
+# statements after which control goes elsewhere
+_JUMP = re.compile(r"\s*(?:(?:break|continue)\s*\Z|goto\b)")
+# goto may reach code after a label, however dead it looks
+_LABEL = re.compile(r"\s*[A-Za-z_]\w*\s*:(?!:)")
+# statements which are replaced by what they hold if their condition is
+# constant
+_CONDITIONAL = (ccode.IfBlock, ccode.WhileLoop, ccode.ForLoop)
+
+
+def _constant(cond):
+    folded = cfold.fold(cond)
+    if isinstance(folded, cdata.IntLiteral) and \
+            isinstance(folded.value, int):
+        return folded.value
+    return None
+
+
+def _has_label(statement):
+    if isinstance(statement, ccode.Expr):
+        return bool(_LABEL.match(statement.expr))
+    if not isinstance(statement, ccode.Block):
+        return False
+    return any(isinstance(expr, ccode.Expr) and _LABEL.match(expr.expr)
+               for expr in crewrite.expressions(statement))
+
+
+def _terminates(statement, known):
+    # whether control never goes on to the statement after statement. known
+    # maps the ids of blocks to (block, version, whether it terminates),
+    # and the blocks looked up are removed from it.
+    stack = [statement]
+    while stack:
+        statement = stack.pop()
+        entry = known.pop(id(statement), None)
+        if entry is not None and entry[0] is statement and \
+                entry[1] == statement._version:
+            if entry[2]:
+                continue
+            return False
+        if type(statement) is ccode.Return:
+            continue
+        if isinstance(statement, ccode.Expr) and _JUMP.match(statement.expr):
+            continue
+        if type(statement) in (ccode.Block, ccode.ElseBlock) and \
+                statement.code:
+            stack.append(statement.code[-1])
+            continue
+        if type(statement) is ccode.IfBlock and statement.code and \
+                statement.elseb is not None:
+            stack.append(statement.code[-1])
+            stack.append(statement.elseb)
+            continue
+        return False
+    return True
+
+
+def _inline(block):
+    # the statements to replace a block which always runs once with
+    if block is None:
+        return []
+    if block.vars:
+        return [ccode.Block(block.vars, block.code)]
+    return list(block.code)
+
+
+def _replacement(statement):
+    # the statements to replace statement with, if its condition is constant
+    if type(statement) not in _CONDITIONAL:
+        return None
+    if type(statement) is ccode.ForLoop:
+        init, cond, _ = statement.cond.args
+    else:
+        init, cond = None, statement.cond
+    value = _constant(cond)
+    if value is None:
+        return None
+    if type(statement) is ccode.IfBlock:
+        taken = statement if value else statement.elseb
+        dropped = statement.elseb if value else statement
+        # the dropped arm may be entered by goto
+        if dropped is not None and _has_label(dropped):
+            return None
+        return _inline(taken)
+    if value or _has_label(statement):
+        return None
+    # the loop never runs, but its init does
+    if init is None or (type(init) is ccode.Expr and not init.expr):
+        return []
+    return [init]
+
+
+def _prune(block, known):
+    # Returns whether the last statement left in block terminates.
+    new_code = []
+    dead = False
+    for statement in block.code:
+        if dead:
+            if not _has_label(statement):
+                continue
+            dead = False
+        new_code.append(statement)
+        dead = _terminates(statement, known)
+    if len(new_code) != len(block.code):
+        block.code[:] = new_code
+        block._changed()
+    return dead
+
+
+class PrunePass(transform.Pass):
+
+    TYPES = (ccode.Block,)
+    # an arm which is always taken may be put in a new block
+    FUSIBLE = False
+
+    def __init__(self):
+        # whether the blocks which were pruned terminate, until their
+        # parents are pruned, so an else-if ladder is only followed once
+        self._terminating = {}
+
+    def transform(self, block):
+        terminates = _prune(block, self._terminating)
+        # an else arm may have been emptied
+        if isinstance(block, ccode.IfBlock) and block.elseb is not None and \
+                not block.elseb.vars and not block.elseb.code:
+            block.elseb = None
+            block._changed()
+        replacement = _replacement(block)
+        if replacement is not None:
+            return replacement
+        if type(block) is ccode.IfBlock:
+            terminates = terminates and block.elseb is not None and \
+                _terminates(block.elseb, self._terminating)
+        elif type(block) not in (ccode.Block, ccode.ElseBlock):
+            return block
+        self._terminating[id(block)] = (block, block._version, terminates)
+        return block
+
+
+def prune_block(block):
+    # Removes the statements in block and its nested blocks which can never
+    # run: branches of if statements and loops whose condition is constant,
+    # and statements after return, break, continue or goto.
+    if type(block) in _CONDITIONAL:
+        # it may have to be replaced, which cannot be done in place
+        msg = "Cannot prune {} in place, prune the block which holds " \
+            "it".format(type(block).__name__)
+        raise code.CodeError(msg)
+    transform.PassManager([PrunePass()]).run(block)
@@ -1,90 +1,283 @@
 #! /usr/bin/python3
 
+import io
+import weakref
+
+from codegen.core import source
+
+from . import csource
+
 
 class CDecl(object):
 
+    __slots__ = ("ctype", "name")
+
     def __init__(self, ctype, name):
         self.ctype = ctype
         self.name = name
 
+    # declarations are parts of the types which hold them, so they are
+    # immutable like types
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            msg = "{} is immutable".format(type(self).__name__)
+            raise AttributeError(msg)
+        object.__setattr__(self, name, value)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def __str__(self):
-        return self.ctype._make(self.name)
+        return self.ctype._decl(self.name)
+
+    def _write(self, source):
+        self.ctype._write(source, self.name)
+
+    def _key(self):
+        return (type(self), self.ctype, self.name)
+
+    def __eq__(self, other):
+        if not isinstance(other, CDecl):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        if not isinstance(other, CDecl):
+            return NotImplemented
+        return self._key() != other._key()
+
+    def __hash__(self):
+        return hash(self._key())
 
 
 class NamelessArg(CDecl):
 
+    __slots__ = ()
+
     def __init__(self, ctype):
         CDecl.__init__(self, ctype, "")
 
 
-class _CType(object):
+class _InternedType(type):
+
+    # Types are hash-consed: constructing a type which is structurally equal
+    # to a live one returns the live one. Since the parts of a type are
+    # canonical themselves, they are compared by identity.
+    _interned = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args, **kw):
+        args = cls._normalize(*args, **kw)
+        key = (cls,) + args
+        ctype = cls._interned.get(key)
+        if ctype is None:
+            ctype = type.__call__(cls, *args)
+            cls._interned[key] = ctype
+        return ctype
+
+
+class _CType(object, metaclass=_InternedType):
+
+    __slots__ = ("_decls", "__weakref__")
+
+    def __init__(self):
+        # name -> declarator
+        self._decls = {}
+
+    # convert the arguments of __init__ to a tuple of hashable positional
+    # arguments, which identifies the type
+    @staticmethod
+    def _normalize(*args):
+        return args
+
+    # attributes of the type, in the order given to __init__
+    _ARGS = ()
+
+    # types are shared by everyone who constructs them, so they are immutable
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            msg = "{} is immutable".format(type(self).__name__)
+            raise AttributeError(msg)
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, arg) for arg in self._ARGS))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def _make(self):
         raise NotImplementedError("This is an abstract class")
 
+    # the number of declarators each type keeps
+    _DECLS_SIZE = 64
+
+    def _decl(self, name):
+        decls = self._decls
+        # the most recently used declarators are last
+        decl = decls.pop(name, None)
+        if decl is None:
+            decl = self._make(name)
+            if len(decls) >= self._DECLS_SIZE:
+                del decls[next(iter(decls))]
+        decls[name] = decl
+        return decl
+
+    # write the declarator to a source stream. types which span multiple
+    # lines override this to write line by line.
+    def _write(self, source, decl):
+        source.write(self._decl(decl))
+
+    # whether declarators of this type are written in a single line
+    def _is_single_line(self):
+        return True
+
     def __call__(self, name):
         return CDecl(self, name)
 
 
 class Primitive(_CType):
 
+    __slots__ = ("typename",)
+    _ARGS = ("typename",)
+
     def __init__(self, typename):
+        _CType.__init__(self)
         self.typename = typename
 
     def _make(self, decl):
         return " ".join(s for s in (self.typename, decl) if s)
 
+    # this is as quick as looking the declarator up
+    _decl = _make
+
 
 void_args = (NamelessArg(Primitive("void")),)
 
 
-class _SuffixType(_CType):
-    pass
+class _DerivedType(_CType):
+
+    __slots__ = ("_single_line",)
+    # Override this in child class. The attribute which holds the type this
+    # one is derived from.
+    _BASE = None
+
+    # Override this in child class. Returns the type this one is derived
+    # from, and the declarator it should be rendered with.
+    def _derive(self, decl):
+        raise NotImplementedError("This is an abstract class")
+
+    def _make(self, decl):
+        ctype, decl = self._derive(decl)
+        return ctype._make(decl)
+
+    def _is_single_line(self):
+        try:
+            return self._single_line
+        except AttributeError:
+            pass
+        self._single_line = getattr(self, self._BASE)._is_single_line()
+        return self._single_line
+
+    def _write(self, source, decl):
+        # only declarators of composites are written part by part, the rest
+        # are written from the cache
+        if self._is_single_line():
+            source.write(self._decl(decl))
+            return
+        ctype, decl = self._derive(decl)
+        ctype._write(source, decl)
+
+
+class _SuffixType(_DerivedType):
 
+    __slots__ = ()
 
-class Pointer(_CType):
+
+class Pointer(_DerivedType):
+
+    __slots__ = ("ptype",)
+    _ARGS = ("ptype",)
+    _BASE = "ptype"
 
     def __init__(self, ptype):
+        _CType.__init__(self)
         self.ptype = ptype
 
-    def _make(self, decl):
+    def _derive(self, decl):
         base_fmt = "*{}".format(format(decl))
         if isinstance(self.ptype, _SuffixType):
             base_fmt = "({})".format(base_fmt)
-        return self.ptype._make(base_fmt)
+        return self.ptype, base_fmt
 
 
 class Array(_SuffixType):
 
+    __slots__ = ("etype", "size")
+    _ARGS = ("etype", "size")
+    _BASE = "etype"
+
+    @staticmethod
+    def _normalize(etype, size=""):
+        return (etype, size)
+
     def __init__(self, etype, size=""):
+        _CType.__init__(self)
         self.etype = etype
         self.size = size
 
-    def _make(self, decl):
-        return self.etype._make("{}[{}]".format(decl, self.size))
+    def _derive(self, decl):
+        return self.etype, "{}[{}]".format(decl, self.size)
 
 
 class Func(_SuffixType):
 
+    __slots__ = ("rettype", "args", "_args_str")
+    _ARGS = ("rettype", "args")
+    _BASE = "rettype"
+
+    @staticmethod
+    def _normalize(rettype, args):
+        return (rettype, tuple(args))
+
     def __init__(self, rettype, args):
+        _CType.__init__(self)
         self.rettype = rettype
         self.args = args
-        self._args_str = ", ".join(str(a) for a in args)
 
-    def _make(self, decl):
-        return self.rettype._make("{}({})".format(decl, self._args_str))
+    def _derive(self, decl):
+        try:
+            args_str = self._args_str
+        except AttributeError:
+            args_str = self._args_str = ", ".join(str(a) for a in self.args)
+        return self.rettype, "{}({})".format(decl, args_str)
 
 
 class _CompositeType(_CType):
 
+    __slots__ = ("name", "fields")
+    _ARGS = ("name", "fields")
     MAGIC_WORD = None
 
-    def __init__(self, name, fields):
-        if self.MAGIC_WORD is None:
+    @classmethod
+    def _normalize(cls, name, fields):
+        if cls.MAGIC_WORD is None:
             raise NotImplementedError("This is an abstract class")
+        return (name, tuple(fields))
+
+    def __init__(self, name, fields):
+        _CType.__init__(self)
         self.name = name
         self.fields = fields
 
+    def _is_single_line(self):
+        return False
+
     def to_nonverbose(self):
         return Primitive("{} {}".format(self.MAGIC_WORD, self.name))
 
@@ -93,18 +286,28 @@ class _CompositeType(_CType):
         return "{}{}".format(" " if s else "", s)
 
     def _make(self, decl):
-        return (
-            "{}{} {}".format(self.MAGIC_WORD, self.withspace(self.name),
-                               "{") +
-            "".join("\n\t{};".format(field) for field in self.fields) +
-            "\n{}{}".format("}", self.withspace(decl)))
+        stream = io.StringIO()
+        self._write(source._SourceStream(csource._config, stream), decl)
+        return stream.getvalue()
+
+    def _write(self, source, decl):
+        source.writeline("{}{} {}".format(self.MAGIC_WORD,
+                                          self.withspace(self.name), "{"))
+        source.indent()
+        for field in self.fields:
+            field._write(source)
+            source.writeline(";")
+        source.dedent()
+        source.write("{}{}".format("}", self.withspace(decl)))
 
 
 class Struct(_CompositeType):
 
+    __slots__ = ()
     MAGIC_WORD = "struct"
 
 
 class Union(_CompositeType):
 
+    __slots__ = ()
     MAGIC_WORD = "union"
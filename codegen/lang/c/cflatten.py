@@ -0,0 +1,74 @@
+#! /usr/bin/python3
+
+from codegen.core import transform
+
+from . import ccode
+
+_NARY = {
+    nary.BINARY: nary for nary in [
+        ccode.NaryAddition,
+        ccode.NaryMultiplication,
+        ccode.NaryAnd,
+        ccode.NaryOr,
+        ccode.NaryXor,
+        ccode.NaryLogicalAnd,
+        ccode.NaryLogicalOr,
+    ]
+}
+
+# Operations which give the same result however they are grouped. The
+# others are only flattened along their left operand, which is how C groups
+# a chain anyway, so that overflow and rounding stay the same.
+_ASSOCIATIVE = frozenset([
+    ccode.NaryAnd,
+    ccode.NaryOr,
+    ccode.NaryXor,
+    ccode.NaryLogicalAnd,
+    ccode.NaryLogicalOr,
+])
+
+
+def _flatten_expr(expr):
+    nary = _NARY.get(type(expr))
+    if nary is None:
+        return expr
+    binary = type(expr)
+    associative = nary in _ASSOCIATIVE
+    operands = []
+    # (operand, whether it may continue the chain), left operands first
+    stack = [(expr, True)]
+    while stack:
+        node, in_chain = stack.pop()
+        if in_chain and type(node) is binary:
+            stack.append((node.right, associative))
+            stack.append((node.left, True))
+        elif in_chain and type(node) is nary:
+            operands.extend(node.operands)
+        else:
+            operands.append(node)
+    return nary(operands)
+
+
+class FlattenPass(transform.Pass):
+
+    TYPES = tuple(_NARY)
+
+    def transform(self, node):
+        return _flatten_expr(node)
+
+    # operations inside a chain are flattened once, with the operation at
+    # the top of the chain
+    def defer(self, node, parent):
+        if type(node) is not type(parent) or type(node) not in _NARY:
+            return False
+        return parent.left is node or _NARY[type(node)] in _ASSOCIATIVE
+
+
+def flatten(expr):
+    # Returns expr with chains of +, *, &, |, ^, && and || replaced by flat
+    # n-ary operations. expr itself is left untouched.
+    return transform.PassManager([FlattenPass()]).run(expr)
+
+
+def flatten_block(block):
+    transform.PassManager([FlattenPass()]).run(block)
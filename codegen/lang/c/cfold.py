@@ -0,0 +1,161 @@
+#! /usr/bin/python3
+
+import operator
+
+from codegen.core import transform
+
+from . import ccode, cdata, crewrite
+
+# folding is done with the semantics of int, and only when the result is
+# defined and representable
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31) - 1
+INT_BITS = 32
+
+
+def _div(a, b):
+    # C division truncates towards zero
+    if b == 0:
+        return None
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _mod(a, b):
+    q = _div(a, b)
+    return None if q is None else a - b * q
+
+
+def _shift(op):
+    def shift(a, b):
+        if a < 0 or not 0 <= b < INT_BITS:
+            return None
+        return op(a, b)
+    return shift
+
+
+def _compare(op):
+    return lambda a, b: int(op(a, b))
+
+
+_BINARY = {
+    ccode.Addition: operator.add,
+    ccode.Subtraction: operator.sub,
+    ccode.Multiplication: operator.mul,
+    ccode.Division: _div,
+    ccode.Modulo: _mod,
+    ccode.LeftShift: _shift(operator.lshift),
+    ccode.RightShift: _shift(operator.rshift),
+    ccode.And: operator.and_,
+    ccode.Or: operator.or_,
+    ccode.Xor: operator.xor,
+    ccode.Equal: _compare(operator.eq),
+    ccode.Unequal: _compare(operator.ne),
+    ccode.LessThan: _compare(operator.lt),
+    ccode.LessEqualThan: _compare(operator.le),
+    ccode.GreaterThan: _compare(operator.gt),
+    ccode.GreaterEqualThan: _compare(operator.ge),
+    ccode.LogicalAnd: lambda a, b: int(bool(a and b)),
+    ccode.LogicalOr: lambda a, b: int(bool(a or b)),
+}
+
+_UNARY = {
+    ccode.Minus: operator.neg,
+    ccode.BitNegation: operator.invert,
+    ccode.LogicalNot: lambda a: int(not a),
+}
+
+# op -> value of a literal operand which makes op return the other operand
+_RIGHT_IDENTITY = {
+    ccode.Addition: 0,
+    ccode.Subtraction: 0,
+    ccode.Multiplication: 1,
+    ccode.Division: 1,
+    ccode.LeftShift: 0,
+    ccode.RightShift: 0,
+    ccode.Or: 0,
+    ccode.Xor: 0,
+}
+
+_LEFT_IDENTITY = {
+    ccode.Addition: 0,
+    ccode.Multiplication: 1,
+    ccode.Or: 0,
+    ccode.Xor: 0,
+}
+
+
+def _int_value(expr):
+    if isinstance(expr, cdata.IntLiteral) and \
+            isinstance(expr.value, int) and INT_MIN <= expr.value <= INT_MAX:
+        return expr.value
+    return None
+
+
+def _literal(value, *operands):
+    # INT_MIN has no literal, -2147483648 is the negation of a long
+    if value is None or not INT_MIN < value <= INT_MAX:
+        return None
+    hexadecimal = all(operand.base is cdata.IntLiteral.B_HEX
+                      for operand in operands)
+    base = cdata.IntLiteral.B_HEX if hexadecimal else cdata.IntLiteral.B_DEC
+    return cdata.IntLiteral(value, base)
+
+
+def _fold_binary(expr):
+    op = type(expr)
+    left = _int_value(expr.left)
+    right = _int_value(expr.right)
+    if left is not None and right is not None and op in _BINARY:
+        folded = _literal(_BINARY[op](left, right), expr.left, expr.right)
+        if folded is not None:
+            return folded
+    # the right operand of a short-circuit operator may not be evaluated at
+    # all, so it does not matter whether it is constant
+    if op is ccode.LogicalAnd and left == 0:
+        return _literal(0, expr.left)
+    if op is ccode.LogicalOr and left is not None and left != 0:
+        return _literal(1, expr.left)
+    if right is not None and _RIGHT_IDENTITY.get(op) == right:
+        return expr.left
+    if left is not None and _LEFT_IDENTITY.get(op) == left:
+        return expr.right
+    return expr
+
+
+def _fold_unary(expr):
+    op = type(expr)
+    operand = _int_value(expr.operand)
+    if operand is not None and op in _UNARY:
+        folded = _literal(_UNARY[op](operand), expr.operand)
+        if folded is not None:
+            return folded
+    return expr
+
+
+def _fold_expr(expr):
+    if isinstance(expr, ccode._BinaryOperation):
+        return _fold_binary(expr)
+    if isinstance(expr, ccode._UnaryOperation):
+        return _fold_unary(expr)
+    return expr
+
+
+def fold(expr):
+    # Returns expr with constant subexpressions folded. expr itself is left
+    # untouched.
+    return crewrite.rewrite(expr, _fold_expr)
+
+
+class FoldPass(transform.Pass):
+
+    TYPES = (ccode._BinaryOperation, ccode._UnaryOperation)
+
+    def transform(self, node):
+        return _fold_expr(node)
+
+
+def fold_block(block):
+    # Folds the expressions in the statements of block and its nested
+    # blocks, replacing them in place.
+    transform.PassManager([FoldPass()]).run(block)
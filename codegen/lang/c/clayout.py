@@ -0,0 +1,230 @@
+#! /usr/bin/python3
+
+import collections
+
+from codegen.core import code
+
+from . import ccode, cdata, cdecl
+
+ABI = collections.namedtuple("ABI", [
+    # typename -> (size, alignment)
+    "primitives",
+    "pointer_size",
+    "pointer_align",
+    "cache_line",
+])
+
+
+def _primitives(long_size, long_double, align64=8):
+    # align64 is the alignment of 8 byte types
+    primitives = {
+        "_Bool": (1, 1),
+        "char": (1, 1),
+        "short": (2, 2),
+        "int": (4, 4),
+        "long": (long_size, min(long_size, align64)),
+        "long long": (8, align64),
+        "float": (4, 4),
+        "double": (8, align64),
+        "long double": long_double,
+    }
+    for bits in (8, 16, 32, 64):
+        size = bits // 8
+        for prefix in ("int", "uint"):
+            name = "{}{}_t".format(prefix, bits)
+            primitives[name] = (size, min(size, align64))
+    for name in ("size_t", "ssize_t", "ptrdiff_t", "intptr_t", "uintptr_t"):
+        primitives[name] = primitives["long"]
+    return primitives
+
+
+LP64 = ABI(
+    primitives=_primitives(8, (16, 16)),
+    pointer_size=8,
+    pointer_align=8,
+    cache_line=64,
+)
+
+# the System V i386 ABI, where 8 byte types are only 4 aligned
+I386 = ABI(
+    primitives=_primitives(4, (12, 4), align64=4),
+    pointer_size=4,
+    pointer_align=4,
+    cache_line=64,
+)
+
+ARM_EABI = ABI(
+    primitives=_primitives(4, (8, 8)),
+    pointer_size=4,
+    pointer_align=4,
+    cache_line=64,
+)
+
+FieldLayout = collections.namedtuple("FieldLayout", [
+    "decl",
+    "offset",
+    "size",
+    "align",
+])
+
+
+class CompositeLayout(collections.namedtuple("CompositeLayout", [
+    "ctype",
+    "size",
+    "align",
+    "fields",
+])):
+
+    __slots__ = ()
+
+    @property
+    def padding(self):
+        if isinstance(self.ctype, cdecl.Union):
+            return self.size - max([f.size for f in self.fields] or [0])
+        return self.size - sum(f.size for f in self.fields)
+
+    def cache_line_splits(self, cache_line):
+        return sum(1 for f in self.fields if f.size and
+                   f.offset // cache_line !=
+                   (f.offset + f.size - 1) // cache_line)
+
+
+def _round_up(offset, align):
+    return (offset + align - 1) // align * align
+
+
+_IGNORED_WORDS = frozenset(["const", "volatile", "signed", "unsigned"])
+
+
+def _base_typename(typename):
+    words = [word for word in typename.split() if word not in _IGNORED_WORDS]
+    if words[-1:] == ["int"] and len(words) > 1:
+        words.pop()
+    return " ".join(words) or "int"
+
+
+class Layout(object):
+
+    def __init__(self, abi=LP64):
+        self.abi = abi
+        # composite layouts, and composite types referred to by name
+        self._layouts = {}
+        self._composites = {}
+
+    # let "struct name" primitives (see to_nonverbose) refer to ctype
+    def define(self, ctype):
+        self._composites[ctype.to_nonverbose()] = ctype
+
+    def _size_align(self, ctype):
+        if isinstance(ctype, cdecl._CompositeType):
+            layout = self.layout(ctype)
+            return layout.size, layout.align
+        if isinstance(ctype, cdecl.Pointer):
+            return self.abi.pointer_size, self.abi.pointer_align
+        if isinstance(ctype, cdecl.Array):
+            size, align = self._size_align(ctype.etype)
+            if ctype.size == "":
+                return 0, align
+            return size * int(ctype.size), align
+        if isinstance(ctype, cdecl.Primitive):
+            if ctype in self._composites:
+                return self._size_align(self._composites[ctype])
+            typename = _base_typename(ctype.typename)
+            if typename in self.abi.primitives:
+                return self.abi.primitives[typename]
+        msg = "Cannot compute the layout of {}".format(
+            cdecl.NamelessArg(ctype))
+        raise code.CodeError(msg)
+
+    def sizeof(self, ctype):
+        return self._size_align(ctype)[0]
+
+    def alignof(self, ctype):
+        return self._size_align(ctype)[1]
+
+    def layout(self, ctype):
+        layout = self._layouts.get(ctype)
+        if layout is None:
+            layout = self._layouts[ctype] = self._compute(ctype)
+        return layout
+
+    def _compute(self, ctype):
+        is_union = isinstance(ctype, cdecl.Union)
+        offset = 0
+        struct_align = 1
+        fields = []
+        for i, field in enumerate(ctype.fields):
+            size, align = self._size_align(field.ctype)
+            flexible = (isinstance(field.ctype, cdecl.Array) and
+                        field.ctype.size == "")
+            if flexible and (is_union or i != len(ctype.fields) - 1):
+                msg = "Flexible array member {} is not last".format(field)
+                raise code.CodeError(msg)
+            field_offset = 0 if is_union else _round_up(offset, align)
+            fields.append(FieldLayout(field, field_offset, size, align))
+            offset = max(offset, field_offset + size)
+            struct_align = max(struct_align, align)
+        return CompositeLayout(ctype, _round_up(offset, struct_align),
+                               struct_align, tuple(fields))
+
+    # Returns a type with the same fields, ordered by decreasing alignment,
+    # which leaves no padding between fields whose sizes are multiples of
+    # their alignments. If cache_line is given, fields which would cross a
+    # cache line are moved after ones which fit in the rest of the line.
+    def reorder(self, ctype, cache_line=None):
+        if isinstance(ctype, cdecl.Union):
+            return ctype
+        fields = list(ctype.fields)
+        flexible = []
+        if fields and self.sizeof(fields[-1].ctype) == 0:
+            flexible.append(fields.pop())
+        fields.sort(key=lambda f: (-self.alignof(f.ctype),
+                                   -self.sizeof(f.ctype)))
+        if cache_line is not None:
+            fields = self._pack_cache_lines(fields, cache_line)
+        return type(ctype)(ctype.name, fields + flexible)
+
+    def _pack_cache_lines(self, fields, cache_line):
+        packed = []
+        offset = 0
+        while fields:
+            for i, field in enumerate(fields):
+                size, align = self._size_align(field.ctype)
+                start = _round_up(offset, align)
+                fits = start % cache_line + size <= cache_line
+                if fits or size > cache_line:
+                    break
+            else:
+                i = 0
+                size, align = self._size_align(fields[0].ctype)
+                start = _round_up(offset, align)
+            packed.append(fields.pop(i))
+            offset = start + size
+        return packed
+
+    # Returns _Static_assert checks of the size of ctype and the offsets of
+    # its fields. typename is how ctype is referred to in C, which defaults
+    # to its tag.
+    def static_asserts(self, ctype, typename=None):
+        if typename is None:
+            if not ctype.name:
+                msg = "A tagless composite needs a typename to be checked"
+                raise code.CodeError(msg)
+            typename = "{} {}".format(ctype.MAGIC_WORD, ctype.name)
+        layout = self.layout(ctype)
+        type_expr = ccode.Expr(typename)
+        asserts = [ccode.StaticAssert(
+            ccode.Equal(ccode.Call(ccode.Expr("sizeof"), [type_expr]),
+                        cdata.IntLiteral(layout.size)),
+            cdata.StringLiteral("sizeof({})".format(typename)),
+        )]
+        for field in layout.fields:
+            asserts.append(ccode.StaticAssert(
+                ccode.Equal(ccode.Call(ccode.Expr("offsetof"), [
+                    type_expr,
+                    ccode.Expr(field.decl.name),
+                ]), cdata.IntLiteral(field.offset)),
+                cdata.StringLiteral("offsetof({}, {})".format(
+                    typename, field.decl.name)),
+            ))
+        return asserts
@@ -3,12 +3,14 @@
 from codegen.core import code
 
 
-class _CppDirective(code.Code):
-    pass
+class _CppDirective(code.IterativeCode):
+
+    __slots__ = ()
 
 
 class _IncludeFile(_CppDirective):
 
+    __slots__ = ("name",)
     OPENER = None
     CLOSER = None
 
@@ -17,27 +19,32 @@ class _IncludeFile(_CppDirective):
             raise NotImplementedError("This is an abstract class")
         self.name = name
 
-    def _act(self, source):
+    def _iter_act(self, source):
         source.write("{}{}{}".format(self.OPENER, self.name, self.CLOSER))
+        return ()
 
 
 class LocalIncludeFile(_IncludeFile):
 
+    __slots__ = ()
     OPENER = CLOSER = "\""
 
 
 class GlobalIncludeFile(_IncludeFile):
 
+    __slots__ = ()
     OPENER = "<"
     CLOSER = ">"
 
 
 class Include(_CppDirective):
 
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
-    def _act(self, source):
+    def _iter_act(self, source):
         source.write("#include ")
-        self.name._act(source)
+        yield self.name
         source.linefeed()
@@ -0,0 +1,208 @@
+#! /usr/bin/python3
+
+import copy
+
+from codegen.core import transform
+
+from . import ccode, cdata
+
+ASSIGNMENTS = frozenset([
+    ccode.Assignment,
+    ccode.AssignmentAddition,
+    ccode.AssignmentSubtraction,
+    ccode.AssignmentMultiplication,
+    ccode.AssignmentDivision,
+    ccode.AssignmentModulo,
+])
+INCREMENTS = frozenset([
+    ccode.PreIncrement,
+    ccode.PreDecrement,
+    ccode.PostIncrement,
+    ccode.PostDecrement,
+])
+
+
+def is_token(node):
+    # whether node is a single name or literal
+    return (isinstance(node, ccode.Expr) and
+            node.precedence() == ccode.PRIMARY)
+
+
+def is_leaf(node):
+    # whether node is a single name or literal, negative ones included
+    return is_token(node) or isinstance(node, cdata.IntLiteral)
+
+
+def children(expr):
+    # a statement expression is a single operand to what contains it
+    if isinstance(expr, ccode.Block):
+        return []
+    return list(transform.children(expr))
+
+
+def rebuild(expr, children):
+    # Returns a copy of expr with the given children, in the order children
+    # returns them in.
+    children = iter(children)
+    values = []
+    for name in expr.CHILDREN:
+        value = getattr(expr, name)
+        if value is None:
+            values.append(None)
+        elif isinstance(value, (list, tuple)):
+            values.append(type(value)(next(children) for _ in value))
+        else:
+            values.append(next(children))
+    return transform.with_children(expr, values)
+
+
+def rewrite(expr, func):
+    # Returns expr with func applied to each of its subexpressions,
+    # children first. Nodes whose children were replaced are rebuilt rather
+    # than changed, since subtrees may be shared. The tree is walked with an
+    # explicit stack, so long operator chains are fine.
+    done = []
+    stack = [(expr, None)]
+    while stack:
+        node, nodes = stack.pop()
+        if nodes is None:
+            nodes = children(node)
+            stack.append((node, nodes))
+            stack.extend((child, None) for child in reversed(nodes))
+            continue
+        start = len(done) - len(nodes)
+        new = done[start:]
+        del done[start:]
+        if any(new_node is not old for new_node, old in zip(new, nodes)):
+            node = rebuild(node, new)
+        done.append(func(node))
+    return done[0]
+
+
+class RewritePass(transform.Pass):
+
+    # applies func to every element, like rewrite does
+    def __init__(self, func, types=None):
+        self.func = func
+        self.TYPES = types
+
+    def transform(self, node):
+        return self.func(node)
+
+
+def rewrite_block(block, func):
+    # Applies rewrite to the expressions in the statements of block and its
+    # nested blocks, replacing them in place.
+    transform.PassManager([RewritePass(func)]).run(block)
+
+
+def nodes(expr):
+    # every node of expr, parents before children
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(children(node))
+
+
+def is_pure(expr):
+    # whether evaluating expr is known to have no side effects
+    for node in nodes(expr):
+        if type(node) in ASSIGNMENTS or type(node) in INCREMENTS or \
+                isinstance(node, ccode.Call):
+            return False
+        if not children(node) and not is_leaf(node):
+            return False
+    return True
+
+
+def equal(a, b):
+    # whether two expressions are known to be the same
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        if a is b:
+            continue
+        if type(a) is not type(b):
+            return False
+        a_children = children(a)
+        b_children = children(b)
+        if not a_children:
+            if b_children or not is_leaf(a) or not is_leaf(b) or \
+                    a.expr != b.expr:
+                return False
+            continue
+        if len(a_children) != len(b_children):
+            return False
+        if isinstance(a, ccode.Cast) and a.casttype is not b.casttype:
+            return False
+        stack.extend(zip(a_children, b_children))
+    return True
+
+
+def conds(block):
+    # the expressions which control block
+    if isinstance(block, ccode.Case):
+        return list(block.values)
+    if not isinstance(block, ccode._CondBlock):
+        return []
+    if isinstance(block.cond, ccode.ForLoop._ForCond):
+        return list(block.cond.args)
+    return [block.cond]
+
+
+def expressions(block):
+    # every expression in block and the blocks nested in it
+    blocks = [block]
+    while blocks:
+        block = blocks.pop()
+        for var in block.vars:
+            if var.value is not None:
+                yield var.value
+        for statement in block.code:
+            if isinstance(statement, ccode.Block):
+                yield from conds(statement)
+                blocks.append(statement)
+            else:
+                yield statement
+        if isinstance(block, ccode.IfBlock) and block.elseb is not None:
+            blocks.append(block.elseb)
+
+
+def _clone_shell(block, func):
+    clone = copy.copy(block)
+    clone.vars = [ccode.Variable(var.decl, None if var.value is None else
+                                 rewrite(var.value, func))
+                  for var in block.vars]
+    clone.code = []
+    clone._version = 0
+    if isinstance(block, ccode.Case):
+        clone.values = [rewrite(value, func) for value in block.values]
+    if isinstance(block, ccode._CondBlock):
+        cond = block.cond
+        if isinstance(cond, ccode.ForLoop._ForCond):
+            clone.cond = type(cond)(*(rewrite(arg, func) for arg in cond.args))
+        else:
+            clone.cond = rewrite(cond, func)
+    return clone
+
+
+def clone_block(block, func):
+    # Returns a copy of block and its nested blocks, with rewrite applied to
+    # all of their expressions. Expressions are shared where func leaves
+    # them unchanged.
+    top = _clone_shell(block, func)
+    stack = [(block, top)]
+    while stack:
+        block, clone = stack.pop()
+        for statement in block.code:
+            if isinstance(statement, ccode.Block):
+                new = _clone_shell(statement, func)
+                stack.append((statement, new))
+            else:
+                new = rewrite(statement, func)
+            clone.code.append(new)
+        if isinstance(block, ccode.IfBlock) and block.elseb is not None:
+            clone.elseb = _clone_shell(block.elseb, func)
+            stack.append((block.elseb, clone.elseb))
+    return top
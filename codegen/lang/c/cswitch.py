@@ -0,0 +1,250 @@
+#! /usr/bin/python3
+
+import re
+
+from codegen.core import code, transform
+
+from . import ccode, cdata, cdecl, clayout, crewrite
+
+# shorter chains are left as they are
+DEFAULT_MIN_CASES = 3
+# the type of the elements of lookup tables
+TABLE_TYPE = cdecl.Primitive("const int")
+# a lookup table may have at most this many entries per value it replaces
+MAX_TABLE_SPARSENESS = 2
+
+_BREAK = re.compile(r"\bbreak\b")
+
+_FLOATING = frozenset(["float", "double", "long double"])
+_UNSIGNED = frozenset(["_Bool", "size_t", "uintptr_t"])
+
+
+def _int_value(expr):
+    if isinstance(expr, cdata.IntLiteral) and isinstance(expr.value, int):
+        return expr.value
+    return None
+
+
+def _compared(cond):
+    # (subject, literals) if cond compares subject with integer literals,
+    # like x == 1 || x == 2
+    equalities = []
+    stack = [cond]
+    while stack:
+        node = stack.pop()
+        if type(node) is ccode.LogicalOr:
+            stack.extend((node.right, node.left))
+        elif type(node) is ccode.NaryLogicalOr:
+            stack.extend(reversed(node.operands))
+        else:
+            equalities.append(node)
+    subject = None
+    literals = []
+    for equality in equalities:
+        if type(equality) is not ccode.Equal:
+            return None
+        other, literal = equality.left, equality.right
+        if _int_value(literal) is None:
+            other, literal = literal, other
+        if _int_value(literal) is None:
+            return None
+        if subject is None:
+            subject = other
+        elif not crewrite.equal(subject, other):
+            return None
+        literals.append(literal)
+    return subject, literals
+
+
+class _Chain(object):
+
+    # An else-if chain which compares one expression with integer literals.
+    def __init__(self, subject, arms, default):
+        self.subject = subject
+        # [(literals, block)], without values already handled by earlier arms
+        self.arms = arms
+        self.default = default
+
+
+def _match(ifb):
+    subject = None
+    arms = []
+    seen = set()
+    top = ifb
+    while True:
+        compared = _compared(ifb.cond)
+        if compared is None:
+            return None
+        if subject is None:
+            subject = compared[0]
+        elif not crewrite.equal(subject, compared[0]):
+            return None
+        literals = []
+        for literal in compared[1]:
+            if literal.value not in seen:
+                seen.add(literal.value)
+                literals.append(literal)
+        if literals:
+            arms.append((literals, ifb))
+        elseb = ifb.elseb
+        if elseb is not None and not elseb.vars and len(elseb.code) == 1 \
+                and type(elseb.code[0]) is ccode.IfBlock:
+            ifb = elseb.code[0]
+            continue
+        break
+    if not crewrite.is_pure(subject):
+        return None
+    # break would leave the switch instead of an enclosing loop
+    for expr in crewrite.expressions(top):
+        for node in crewrite.nodes(expr):
+            if isinstance(node, ccode.Expr) and _BREAK.search(node.expr):
+                return None
+    return _Chain(subject, arms, elseb)
+
+
+def _value_range(table_type):
+    # (low, high) of the values table_type holds, or None if it is not an
+    # integer type of a known size
+    if not isinstance(table_type, cdecl.Primitive):
+        return None
+    typename = clayout._base_typename(table_type.typename)
+    if typename in _FLOATING:
+        return None
+    try:
+        bits = clayout.Layout().sizeof(table_type) * 8
+    except code.CodeError:
+        return None
+    if typename == "_Bool":
+        return 0, 1
+    if "unsigned" in table_type.typename.split() or \
+            typename in _UNSIGNED or typename.startswith("uint"):
+        return 0, (1 << bits) - 1
+    return -(1 << bits - 1), (1 << bits - 1) - 1
+
+
+def _returned(block, value_range):
+    # the integer literal block only returns, if that is all it does and
+    # it is in value_range
+    if block.vars or len(block.code) != 1 or \
+            type(block.code[0]) is not ccode.Return:
+        return None
+    value = block.code[0].operand
+    low, high = value_range
+    if _int_value(value) is not None and low <= value.value <= high:
+        return value
+    return None
+
+
+def _table(chain, table_type):
+    value_range = _value_range(table_type)
+    if value_range is None:
+        return None
+    entries = {}
+    for literals, block in chain.arms:
+        value = _returned(block, value_range)
+        if value is None:
+            return None
+        for literal in literals:
+            entries[literal.value] = value
+    default = None
+    if chain.default is not None:
+        default = _returned(chain.default, value_range)
+        if default is None:
+            return None
+    low = min(entries)
+    high = max(entries)
+    size = high - low + 1
+    if size > MAX_TABLE_SPARSENESS * len(entries):
+        return None
+    if size != len(entries) and default is None:
+        return None
+    table = ccode.Cast(cdecl.Array(table_type), cdata.CompoundLiteral([
+        entries.get(value, default) for value in range(low, high + 1)
+    ]))
+    subject = chain.subject
+    index = subject
+    if low:
+        index = ccode.Subtraction(subject, cdata.IntLiteral(low))
+    in_range = ccode.LogicalAnd(
+        ccode.GreaterEqualThan(subject, cdata.IntLiteral(low)),
+        ccode.LessEqualThan(subject, cdata.IntLiteral(high)),
+    )
+    statements = [ccode.IfBlock(in_range, code=[
+        ccode.Return(ccode.Subscript(table, index)),
+    ])]
+    if default is not None:
+        statements.append(ccode.Return(default))
+    return statements
+
+
+def _switch(chain):
+    switch = ccode.SwitchBlock(chain.subject)
+    for literals, block in chain.arms:
+        switch.add_case(ccode.Case(literals, block.vars, block.code))
+    if chain.default is not None:
+        switch.add_case(ccode.Default(chain.default.vars, chain.default.code))
+    return [switch]
+
+
+def convert(ifb, min_cases=DEFAULT_MIN_CASES, table_type=TABLE_TYPE):
+    # Returns the statements to replace an else-if chain with, which
+    # compares one expression with integer literals. If every arm only
+    # returns an integer literal which table_type holds, the chain is
+    # replaced with a lookup in a table of table_type, unless table_type is
+    # None. Otherwise it is replaced with a switch statement. Returns None if
+    # the chain does not have that form, or has less than min_cases arms.
+    chain = _match(ifb)
+    if chain is None or len(chain.arms) < min_cases:
+        return None
+    if table_type is not None:
+        statements = _table(chain, table_type)
+        if statements is not None:
+            return statements
+    return _switch(chain)
+
+
+def _else_if(block):
+    # the if block of an else-if, if block is one
+    if type(block) is ccode.ElseBlock and not block.vars and \
+            len(block.code) == 1 and type(block.code[0]) is ccode.IfBlock:
+        return block.code[0]
+    return None
+
+
+class SwitchPass(transform.Pass):
+
+    TYPES = (ccode.Block,)
+    FUSIBLE = False
+
+    def __init__(self, min_cases=DEFAULT_MIN_CASES, table_type=TABLE_TYPE):
+        self.min_cases = min_cases
+        self.table_type = table_type
+
+    def _convert(self, ifb, block, i):
+        # converts the chain of ifb, which is block.code[i], or else the
+        # longest chain which ends it
+        while True:
+            statements = convert(ifb, self.min_cases, self.table_type)
+            if statements is not None:
+                block.code[i:i + 1] = statements
+                block._changed()
+                return
+            if ifb.elseb is None or _else_if(ifb.elseb) is None:
+                return
+            block, i = ifb.elseb, 0
+            ifb = block.code[0]
+
+    def transform(self, block):
+        # chains are walked from their first if block, which comes after
+        # the rest of the chain
+        if _else_if(block) is not None:
+            return block
+        for i in reversed(range(len(block.code))):
+            if type(block.code[i]) is ccode.IfBlock:
+                self._convert(block.code[i], block, i)
+        return block
+
+
+def switch_block(block, min_cases=DEFAULT_MIN_CASES, table_type=TABLE_TYPE):
+    # Converts the else-if chains in block and its nested blocks in place.
+    transform.PassManager([SwitchPass(min_cases, table_type)]).run(block)
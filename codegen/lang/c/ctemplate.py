@@ -0,0 +1,177 @@
+#! /usr/bin/python3
+
+import io
+
+from codegen.core import code, source
+
+from . import ccode, cdata, csource
+
+# wraps the placeholders in rendered text. It can never be a part of valid
+# C code.
+_SENTINEL = "\0"
+# seperates the name of a placeholder from how its value must be put in
+# parentheses there
+_SEPERATOR = "\1"
+
+
+def _render(element, config):
+    stream = io.StringIO()
+    element._act(source._SourceStream(config, stream))
+    return stream.getvalue()
+
+
+class Placeholder(ccode.Expr):
+
+    __slots__ = ("name",)
+    PRECEDENCE = ccode.PRIMARY
+
+    def __init__(self, name):
+        if _SENTINEL in name or _SEPERATOR in name:
+            raise code.CodeError("Bad placeholder name {!r}".format(name))
+        self.name = name
+        ccode.Expr.__init__(self, "{0}{1}{0}".format(_SENTINEL, name))
+
+    # the placeholder as a part of text, like the name of a declaration
+    def __str__(self):
+        return self.expr
+
+    # the value is put in parentheses when the template is rendered, if it
+    # needs them where the placeholder is, by the same rules as an operand
+    def _iter_act_with_parentheses(self, source, force=False,
+                                   precedence=ccode.PREFIX,
+                                   clarify=frozenset()):
+        source.write(_SEPERATOR.join([
+            _SENTINEL + self.name,
+            str(precedence),
+            "1" if force else "",
+            " ".join(sorted(clarify)) + _SENTINEL,
+        ]))
+        return ()
+
+
+def _gap(text):
+    # (name, precedence, force, clarify) of a placeholder, see
+    # Placeholder._iter_act_with_parentheses
+    parts = text.split(_SEPERATOR)
+    if len(parts) == 1:
+        # a placeholder used as text is replaced as it is
+        return (text, ccode.LOWEST, False, frozenset())
+    name, precedence, force, clarify = parts
+    return (name, int(precedence), bool(force), frozenset(clarify.split()))
+
+
+def _value_text(value, gap, before, config):
+    # the text of value where gap is, put in parentheses by the same rules
+    # as an operand. before is the text which comes just before it.
+    if isinstance(value, str):
+        value = ccode.Expr(value)
+    elif isinstance(value, int):
+        value = cdata.IntLiteral(value)
+    _, precedence, force, clarify = gap
+    text = _render(value, config)
+    # like in - -1, which must not be written as --1
+    pastes = before[-1:] in ("+", "-", "&") and text[:1] == before[-1:]
+    if force or pastes or getattr(value, "OP", None) in clarify or \
+            value.needs_parentheses(precedence):
+        text = "({})".format(text)
+    return text
+
+
+class _Rendered(object):
+
+    # The element of a template rendered with a source config, with its
+    # placeholders left as gaps.
+    def __init__(self, element, config):
+        parts = _render(element, config).split(_SENTINEL)
+        self.config = config
+        self.segments = parts[0::2]
+        self.gaps = [_gap(gap) for gap in parts[1::2]]
+        # indentation of the line each placeholder is in, for values which
+        # span several lines
+        self.prefixes = []
+        prefix = None
+        for segment in self.segments[:-1]:
+            start = segment.rfind("\n") + 1
+            if start or prefix is None:
+                line = segment[start:]
+                prefix = line[:len(line) - len(line.lstrip())]
+            self.prefixes.append(prefix)
+
+
+class Template(object):
+
+    # Renders element once per source config, with its placeholders left as
+    # gaps. The parts between them are kept, so an instance only renders its
+    # values.
+    def __init__(self, element):
+        self.element = element
+        # whether instances are followed by a semicolon in a block
+        self.semicolon = element.SEMICOLON_BEHAVIOUR
+        # config -> _Rendered, and the one used last
+        self._rendered = {}
+        self._last = None
+        self.names = frozenset(
+            gap[0] for gap in self._render_with(csource._config).gaps)
+
+    def _render_with(self, config):
+        rendered = self._last
+        if rendered is None or rendered.config is not config:
+            rendered = self._rendered.get(config)
+            if rendered is None:
+                rendered = self._rendered[config] = _Rendered(self.element,
+                                                              config)
+            self._last = rendered
+        return rendered
+
+    def render(self, values, config=csource._config):
+        # Returns the text of the element with each placeholder replaced by
+        # its value in values, which may be a string, an int or an element.
+        missing = self.names.difference(values)
+        if missing:
+            msg = "No values for placeholders {}".format(
+                ", ".join(sorted(missing)))
+            raise code.CodeError(msg)
+        rendered = self._render_with(config)
+        # (gap, the character before it) -> text of its value
+        texts = {}
+        parts = [rendered.segments[0]]
+        for gap, prefix, segment in zip(rendered.gaps, rendered.prefixes,
+                                        rendered.segments[1:]):
+            before = parts[-1]
+            key = (gap, before[-1:])
+            text = texts.get(key)
+            if text is None:
+                text = texts[key] = _value_text(values[gap[0]], gap, before,
+                                                config)
+            if "\n" in text:
+                text = text.replace("\n", "\n" + prefix)
+            parts.append(text)
+            parts.append(segment)
+        return "".join(parts)
+
+    def instantiate(self, values):
+        return Instance(self, values)
+
+
+class Instance(ccode._CCode):
+
+    __slots__ = ("template", "values")
+
+    def __init__(self, template, values):
+        self.template = template
+        self.values = values
+
+    @property
+    def SEMICOLON_BEHAVIOUR(self):
+        return self.template.semicolon
+
+    def _iter_act(self, source):
+        lines = self.template.render(self.values,
+                                     source.config).split("\n")
+        for line in lines[:-1]:
+            if line:
+                source.write(line)
+            source.linefeed()
+        if lines[-1]:
+            source.write(lines[-1])
+        return ()
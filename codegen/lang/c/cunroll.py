@@ -0,0 +1,257 @@
+#! /usr/bin/python3
+
+import re
+
+from codegen.core import code, transform
+
+from . import ccode, cdata, cfold, crewrite
+
+# loops with more iterations are only fully unrolled when asked for
+DEFAULT_MAX_TRIPS = 64
+
+_INCREMENTS = {
+    ccode.PreIncrement: 1,
+    ccode.PostIncrement: 1,
+    ccode.PreDecrement: -1,
+    ccode.PostDecrement: -1,
+}
+_STEPS = {
+    ccode.AssignmentAddition: 1,
+    ccode.AssignmentSubtraction: -1,
+}
+# direction of the step each comparison can terminate with
+_COMPARISONS = {
+    ccode.LessThan: 1,
+    ccode.LessEqualThan: 1,
+    ccode.GreaterThan: -1,
+    ccode.GreaterEqualThan: -1,
+    ccode.Unequal: 0,
+}
+# statements which jump out of an iteration, or to a label which would be
+# duplicated
+_JUMPS = re.compile(r"\b(?:break|continue|goto|case|default)\b|"
+                    r"^\s*[A-Za-z_]\w*\s*:(?!:)")
+_IDENTIFIERS = re.compile(r"[A-Za-z_]\w*")
+
+
+def _int_value(expr):
+    if isinstance(expr, cdata.IntLiteral) and isinstance(expr.value, int):
+        return expr.value
+    return None
+
+
+def _name(expr):
+    return expr.expr if crewrite.is_token(expr) else None
+
+
+def _trips(start, bound, step, op):
+    direction = _COMPARISONS[op]
+    if direction * step < 0:
+        return None
+    if op is ccode.LessEqualThan:
+        bound += 1
+    elif op is ccode.GreaterEqualThan:
+        bound -= 1
+    distance = bound - start
+    if op is ccode.Unequal:
+        if distance % step or distance // step < 0:
+            return None
+        return distance // step
+    return max(0, -(-distance // step))
+
+
+class _Loop(object):
+
+    # A for loop which counts a variable from one constant to another.
+    def __init__(self, loop, name, start, step, trips, base):
+        self.loop = loop
+        self.name = name
+        self.start = start
+        self.step = step
+        self.trips = trips
+        self.base = base
+
+    def value(self, i):
+        return cdata.IntLiteral(self.start + i * self.step, self.base)
+
+    def offset(self, i):
+        var = ccode.Expr(self.name)
+        if i == 0:
+            return var
+        if self.step > 0:
+            return ccode.Addition(var, cdata.IntLiteral(i * self.step))
+        return ccode.Subtraction(var, cdata.IntLiteral(-i * self.step))
+
+    def body(self, value):
+        # a copy of the body with the variable replaced by value
+        name = self.name
+
+        def substitute(node):
+            return value if _name(node) == name else node
+
+        body = crewrite.clone_block(self.loop, substitute)
+        if body.vars:
+            return [ccode.Block(body.vars, body.code)]
+        return body.code
+
+
+def _writes(expr, name):
+    for node in crewrite.nodes(expr):
+        if type(node) in crewrite.ASSIGNMENTS:
+            target = node.left
+        elif type(node) in _INCREMENTS or type(node) is ccode.AddressOf:
+            target = node.operand
+        elif crewrite.children(node) or _name(node) is not None:
+            continue
+        elif isinstance(node, ccode.Expr):
+            # nothing is known about it but the names it mentions
+            if name in _IDENTIFIERS.findall(node.expr):
+                return True
+            continue
+        else:
+            return True
+        if _name(target) == name:
+            return True
+    return False
+
+
+def _is_simple_body(loop, name):
+    # whether the body may be copied, and leaves the variable alone
+    blocks = [loop]
+    while blocks:
+        block = blocks.pop()
+        if any(var.decl.name == name for var in block.vars):
+            return False
+        blocks.extend(s for s in block.code if isinstance(s, ccode.Block))
+        if isinstance(block, ccode.IfBlock) and block.elseb is not None:
+            blocks.append(block.elseb)
+    for expr in crewrite.expressions(loop):
+        if _writes(expr, name):
+            return False
+        for node in crewrite.nodes(expr):
+            if isinstance(node, ccode.Expr) and _JUMPS.search(node.expr):
+                return False
+    return True
+
+
+def _match(loop):
+    if type(loop) is not ccode.ForLoop:
+        return None
+    init, cond, step = loop.cond.args
+    if type(init) is not ccode.Assignment:
+        return None
+    name = _name(init.left)
+    start = _int_value(init.right)
+    if name is None or start is None:
+        return None
+    if type(cond) not in _COMPARISONS or _name(cond.left) != name:
+        return None
+    bound = _int_value(cond.right)
+    if bound is None:
+        return None
+    if type(step) in _INCREMENTS and _name(step.operand) == name:
+        delta = _INCREMENTS[type(step)]
+    elif type(step) in _STEPS and _name(step.left) == name:
+        delta = _int_value(step.right)
+        if not delta:
+            return None
+        delta *= _STEPS[type(step)]
+    else:
+        return None
+    trips = _trips(start, bound, delta, type(cond))
+    if trips is None:
+        return None
+    # the variable must not overflow on its way, or reach INT_MIN which has
+    # no literal
+    end = start + trips * delta
+    if not cfold.INT_MIN < end <= cfold.INT_MAX:
+        return None
+    if not _is_simple_body(loop, name):
+        return None
+    return _Loop(loop, name, start, delta, trips, init.right.base)
+
+
+def _full(match):
+    statements = []
+    for i in range(match.trips):
+        statements.extend(match.body(match.value(i)))
+    # the variable is left as the loop would leave it
+    statements.append(ccode.Assignment(ccode.Expr(match.name),
+                                       match.value(match.trips)))
+    return statements
+
+
+def _partial(match, factor):
+    name = match.name
+    var = ccode.Expr(name)
+    trips = match.trips - match.trips % factor
+    main = ccode.ForLoop(
+        ccode.Assignment(var, match.value(0)),
+        (ccode.LessThan if match.step > 0 else ccode.GreaterThan)(
+            var, match.value(trips)),
+        (ccode.AssignmentAddition if match.step > 0 else
+         ccode.AssignmentSubtraction)(
+            var, cdata.IntLiteral(abs(match.step) * factor)),
+    )
+    for i in range(factor):
+        main.code.extend(match.body(match.offset(i)))
+    statements = [main]
+    if trips != match.trips:
+        # the remaining iterations, continuing from where the loop stopped
+        loop = match.loop
+        _, cond, step = loop.cond.args
+        remainder = crewrite.clone_block(loop, lambda node: node)
+        remainder.cond = ccode.ForLoop._ForCond(ccode.Expr(""), cond, step)
+        statements.append(remainder)
+    return statements
+
+
+def _check_factor(factor):
+    if factor is not None and factor < 1:
+        raise code.CodeError("Cannot unroll a loop {} times".format(factor))
+
+
+def _unroll(match, factor):
+    if factor is None or factor >= match.trips:
+        return _full(match)
+    if factor == 1:
+        return [match.loop]
+    return _partial(match, factor)
+
+
+def unroll(loop, factor=None):
+    # Returns the statements to replace a for loop with, which counts a
+    # variable from one integer literal to another, with the loop unrolled
+    # factor times, or completely if factor is None. Returns None if the
+    # loop does not have that form, or its body might change the variable
+    # or jump.
+    _check_factor(factor)
+    match = _match(loop)
+    if match is None:
+        return None
+    return _unroll(match, factor)
+
+
+class UnrollPass(transform.Pass):
+
+    TYPES = (ccode.ForLoop,)
+    FUSIBLE = False
+
+    def __init__(self, factor=None, max_trips=DEFAULT_MAX_TRIPS):
+        _check_factor(factor)
+        self.factor = factor
+        self.max_trips = max_trips
+
+    def transform(self, loop):
+        match = _match(loop)
+        if match is None or (self.factor is None and
+                             match.trips > self.max_trips):
+            return loop
+        return _unroll(match, self.factor)
+
+
+def unroll_block(block, factor=None, max_trips=DEFAULT_MAX_TRIPS):
+    # Unrolls the loops in block and its nested blocks in place, inner
+    # loops first. Loops are only unrolled completely if they run at most
+    # max_trips times.
+    transform.PassManager([UnrollPass(factor, max_trips)]).run(block)
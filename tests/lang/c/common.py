@@ -3,12 +3,16 @@
 
 from tests.lang import common
 
-from codegen.lang.c import ccode, cdecl, csource
+from codegen.lang.c import ccode, cdata, cdecl, csource
 
 dummy = ccode.Expr("dummy")
 dummy_parentheses = ccode.Expr("0 + 1")
 ct_int = cdecl.Primitive("int")
 
 
+def lit(value, base=cdata.IntLiteral.B_DEC):
+    return cdata.IntLiteral(value, base)
+
+
 class CCodeTest(common.LangTest):
     CONFIG = csource._config
@@ -1,20 +1,21 @@
 #! /usr/bin/python3
 
+import io
 import unittest
 
 from tests.lang.c.common import CCodeTest, dummy, ct_int
 
-from codegen.lang.c import ccode, cdecl
-from codegen.core import code
+from codegen.lang.c import ccode, cdata, cdecl, csource
+from codegen.core import code, rendercache, source
 
 dummy_parentheses = ccode.Expr("0 + 1")
 
 
 class TestNotImplementedErrors(unittest.TestCase):
 
-    def test_ccode_get_parentheses_behaviour(self):
+    def test_ccode_get_precedence(self):
         with self.assertRaises(NotImplementedError):
-            ccode._CCode().get_parentheses_behaviour()
+            ccode._CCode().get_precedence()
 
     def test_binary_operation_op(self):
         with self.assertRaises(NotImplementedError):
@@ -24,6 +25,10 @@ class TestNotImplementedErrors(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             ccode._UnaryOperation(None)
 
+    def test_nary_operation_op(self):
+        with self.assertRaises(NotImplementedError):
+            ccode._NaryOperation([])
+
     def test_cond_block_magic_word(self):
         with self.assertRaises(NotImplementedError):
             ccode._CondBlock(None)
@@ -68,6 +73,32 @@ class TestGlobal(CCodeTest):
     def test_global(self):
         self.check_gen(ccode.Global(ct_int("a")), "int a;\n")
 
+    def test_global_struct(self):
+        struct = cdecl.Struct("a", [ct_int("a"), ct_int("b")])
+        self.check_gen(ccode.Global(cdecl.Pointer(struct)("a")), (
+            "struct a {\n"
+            "\tint a;\n"
+            "\tint b;\n"
+            "} *a;\n"
+        ))
+
+    def test_struct_uses_source_indentation(self):
+        struct = cdecl.Struct("a", [ct_int("a")])
+        func = ccode.Func(cdecl.Func(ct_int, cdecl.void_args)("a"),
+                          variables=[ccode.Variable(struct("b"))])
+        config = csource._config._replace(indentation="  ")
+        stream = io.StringIO()
+        func._act(source._SourceStream(config, stream))
+        self.assertEqual(stream.getvalue(), (
+            "int a(void)\n"
+            "{\n"
+            "  struct a {\n"
+            "    int a;\n"
+            "  } b;\n"
+            "\n"
+            "}\n"
+        ))
+
     def test_global_to_variable(self):
         self.check_gen(ccode.Global(ct_int("a")).to_variable(), "a")
 
@@ -123,6 +154,109 @@ class TestBinaryOperation(CCodeTest):
         )
 
 
+class TestPrecedence(CCodeTest):
+
+    def test_tighter_operand(self):
+        self.check_gen(
+            ccode.Addition(ccode.Multiplication(dummy, dummy),
+                           ccode.Division(dummy, dummy)),
+            "dummy * dummy + dummy / dummy",
+        )
+
+    def test_looser_operand(self):
+        self.check_gen(
+            ccode.Multiplication(ccode.Addition(dummy, dummy),
+                                 ccode.Subtraction(dummy, dummy)),
+            "(dummy + dummy) * (dummy - dummy)",
+        )
+
+    def test_left_associativity(self):
+        self.check_gen(
+            ccode.Subtraction(ccode.Subtraction(dummy, dummy), dummy),
+            "dummy - dummy - dummy",
+        )
+        self.check_gen(
+            ccode.Subtraction(dummy, ccode.Subtraction(dummy, dummy)),
+            "dummy - (dummy - dummy)",
+        )
+
+    def test_right_associativity(self):
+        self.check_gen(
+            ccode.Assignment(dummy, ccode.Assignment(dummy, dummy)),
+            "dummy = dummy = dummy",
+        )
+        self.check_gen(
+            ccode.Assignment(ccode.Assignment(dummy, dummy), dummy),
+            "(dummy = dummy) = dummy",
+        )
+
+    def test_assignment_of_expression(self):
+        self.check_gen(
+            ccode.Assignment(dummy, ccode.LogicalOr(dummy, dummy)),
+            "dummy = dummy || dummy",
+        )
+
+    def test_unary_operand(self):
+        self.check_gen(
+            ccode.Addition(ccode.Minus(dummy), ccode.Dereference(dummy)),
+            "-dummy + *dummy",
+        )
+        self.check_gen(
+            ccode.Minus(ccode.Addition(dummy, dummy)),
+            "-(dummy + dummy)",
+        )
+
+    def test_pasted_operators(self):
+        self.check_gen(ccode.Minus(ccode.Minus(dummy)), "-(-dummy)")
+        self.check_gen(ccode.Minus(ccode.PreDecrement(dummy)), "-(--dummy)")
+        self.check_gen(ccode.Minus(cdata.IntLiteral(-2)), "-(-2)")
+        self.check_gen(ccode.Minus(ccode.LogicalNot(dummy)), "-!dummy")
+        self.check_gen(ccode.Addition(dummy, cdata.IntLiteral(-2)),
+                       "dummy + -2")
+
+    def test_cast_operand(self):
+        self.check_gen(
+            ccode.Addition(ccode.Cast(ct_int, dummy), dummy),
+            "(int)dummy + dummy",
+        )
+        self.check_gen(
+            ccode.Subscript(ccode.Cast(ct_int, dummy), dummy),
+            "((int)dummy)[dummy]",
+        )
+
+    def test_keyword_operand(self):
+        self.check_gen(
+            ccode.Return(ccode.Assignment(dummy, dummy)),
+            "return dummy = dummy",
+        )
+        self.check_gen(ccode.Return(dummy_parentheses), "return (0 + 1)")
+
+    def test_clarify(self):
+        for op, operand in [
+            (ccode.LeftShift, ccode.Addition),
+            (ccode.And, ccode.Equal),
+            (ccode.Or, ccode.And),
+            (ccode.Or, ccode.Xor),
+            (ccode.Xor, ccode.Subtraction),
+            (ccode.LogicalOr, ccode.LogicalAnd),
+            (ccode.Equal, ccode.LessThan),
+            (ccode.LessThan, ccode.LessThan),
+        ]:
+            self.check_gen(
+                op(operand(dummy, dummy), dummy),
+                "(dummy {} dummy) {} dummy".format(operand.OP, op.OP),
+            )
+
+    def test_changed_expr(self):
+        expr = ccode.Expr("dummy")
+        product = ccode.Multiplication(dummy, expr)
+        self.check_gen(product, "dummy * dummy")
+        expr.expr = "0 + 1"
+        self.assertEqual(expr.precedence(), ccode.LOWEST)
+        self.check_gen(product, "dummy * (0 + 1)")
+        self.assertEqual(ccode.Expr("").precedence(), ccode.LOWEST)
+
+
 class TestPrefixUnaryOperation(CCodeTest):
 
     def test_simple_prefix_unary_ops(self):
@@ -267,6 +401,15 @@ class TestIfBlock(CCodeTest):
             "}\n"
         ))
 
+    def test_if_else_if_single_statement(self):
+        elseb = ccode.ElseBlock(code=[ccode.IfBlock(dummy, code=[dummy])])
+        self.check_gen(ccode.IfBlock(dummy, elseb=elseb), (
+            "if (dummy) {\n"
+            "} else if (dummy) {\n"
+            "\tdummy;\n"
+            "}\n"
+        ))
+
     def test_if_else_with_multiple_expressions_in_else(self):
         elseb = ccode.ElseBlock(code=[ccode.IfBlock(dummy), dummy])
         self.check_gen(ccode.IfBlock(dummy, elseb=elseb), (
@@ -318,6 +461,83 @@ class TestForLoop(CCodeTest):
         ))
 
 
+class TestSwitchBlock(CCodeTest):
+
+    def test_empty_switch(self):
+        self.check_gen(ccode.SwitchBlock(dummy), (
+            "switch (dummy) {\n"
+            "}\n"
+        ))
+
+    def test_cases(self):
+        switch = ccode.SwitchBlock(dummy, [
+            ccode.Case([cdata.IntLiteral(1), cdata.IntLiteral(2)],
+                       code=[dummy]),
+            ccode.Case([cdata.IntLiteral(3)], code=[ccode.Return(dummy)]),
+        ])
+        switch.add_case(ccode.Default(code=[dummy, dummy]))
+        self.check_gen(switch, (
+            "switch (dummy) {\n"
+            "case 1:\n"
+            "case 2:\n"
+            "\tdummy;\n"
+            "\tbreak;\n"
+            "case 3:\n"
+            "\treturn dummy;\n"
+            "default:\n"
+            "\tdummy;\n"
+            "\tdummy;\n"
+            "\tbreak;\n"
+            "}\n"
+        ))
+
+    def test_fallthrough(self):
+        self.check_gen(ccode.SwitchBlock(dummy, [
+            ccode.Case([dummy], fallthrough=True),
+            ccode.Case([dummy], code=[dummy], fallthrough=True),
+            ccode.Default(),
+        ]), (
+            "switch (dummy) {\n"
+            "case dummy:\n"
+            "case dummy:\n"
+            "\tdummy;\n"
+            "\t/* fallthrough */\n"
+            "default:\n"
+            "\tbreak;\n"
+            "}\n"
+        ))
+
+    def test_case_variables(self):
+        case = ccode.Case([dummy], variables=[ccode.Variable(ct_int("a"))],
+                          code=[dummy])
+        self.check_gen(ccode.SwitchBlock(dummy, [case]), (
+            "switch (dummy) {\n"
+            "case dummy: {\n"
+            "\tint a;\n"
+            "\n"
+            "\tdummy;\n"
+            "\tbreak;\n"
+            "}\n"
+            "}\n"
+        ))
+
+    def test_nested_switch(self):
+        inner = ccode.SwitchBlock(dummy, [ccode.Default(code=[dummy])])
+        self.check_gen(ccode.SwitchBlock(dummy, [ccode.Case([dummy], code=[
+            inner,
+        ])]), (
+            "switch (dummy) {\n"
+            "case dummy:\n"
+            "\tswitch (dummy) {\n"
+            "\tdefault:\n"
+            "\t\tdummy;\n"
+            "\t\tbreak;\n"
+            "\t}\n"
+            "\tbreak;\n"
+            "}\n"
+        ))
+
+
 class TestCall(CCodeTest):
 
     def test_call_no_params(self):
@@ -330,6 +550,12 @@ class TestCall(CCodeTest):
         call = ccode.Call(dummy, [dummy, dummy])
         self.check_gen(call, "dummy(dummy, dummy)")
 
+    def test_replaced_func(self):
+        call = ccode.Call(dummy, [])
+        call.func = ccode.Expr("f")
+        self.assertIs(call.operand, call.func)
+        self.check_gen(call, "f()")
+
 
 class TestFunc(CCodeTest):
 
@@ -365,3 +591,112 @@ class TestSubscript(CCodeTest):
     def test_subscript_simple(self):
         call = ccode.Subscript(dummy, dummy)
         self.check_gen(call, "dummy[dummy]")
+
+
+class TestDeepTrees(CCodeTest):
+
+    DEPTH = 10000
+
+    def test_deep_binary_chain(self):
+        expr = dummy
+        for _ in range(self.DEPTH):
+            expr = ccode.Addition(expr, dummy)
+        self.check_gen(expr, "dummy" + " + dummy" * self.DEPTH)
+
+    def test_deep_right_binary_chain(self):
+        expr = dummy
+        for _ in range(self.DEPTH):
+            expr = ccode.Addition(dummy, expr)
+        expected = "dummy + (" * (self.DEPTH - 1) + "dummy + dummy" + (
+            ")" * (self.DEPTH - 1))
+        self.check_gen(expr, expected)
+
+    def test_long_else_if_ladder(self):
+        ifb = ccode.IfBlock(dummy)
+        top = ifb
+        for _ in range(self.DEPTH):
+            elseifb = ccode.IfBlock(dummy)
+            ifb.add_else(ccode.ElseBlock(code=[elseifb]))
+            ifb = elseifb
+        expected = (
+            "if (dummy) {\n" +
+            "} else if (dummy) {\n" * self.DEPTH +
+            "}\n"
+        )
+        self.check_gen(top, expected)
+
+
+class TestRenderCache(CCodeTest):
+
+    def make(self, element, render_cache):
+        sourceobj = csource.CSource()
+        sourceobj.add_element(element)
+        stream = io.StringIO()
+        sourceobj.make(stream, render_cache=render_cache)
+        return stream.getvalue()
+
+    def test_shared_expression(self):
+        shared = ccode.Addition(dummy, ccode.Call(dummy, [dummy]))
+        func = ccode.Func(cdecl.Func(ct_int, cdecl.void_args)("a"),
+                          code=[shared, shared])
+        render_cache = rendercache.RenderCache()
+        self.assertEqual(self.make(func, render_cache), (
+            "int a(void)\n"
+            "{\n"
+            "\tdummy + dummy(dummy);\n"
+            "\tdummy + dummy(dummy);\n"
+            "}\n"
+        ))
+        self.assertEqual(render_cache.hits, 1)
+
+    def test_add_code_invalidates_expression(self):
+        block = ccode.StatementExpression(code=[dummy, dummy])
+        expr = ccode.Call(dummy, [block])
+        render_cache = rendercache.RenderCache()
+        self.assertEqual(self.make(expr, render_cache), (
+            "dummy(({\n"
+            "\tdummy;\n"
+            "\tdummy;\n"
+            "})\n"
+            ")"
+        ))
+        block.add_code(dummy)
+        self.assertEqual(self.make(expr, render_cache), (
+            "dummy(({\n"
+            "\tdummy;\n"
+            "\tdummy;\n"
+            "\tdummy;\n"
+            "})\n"
+            ")"
+        ))
+
+
+class TestNaryOperation(CCodeTest):
+
+    def test_nary_ops(self):
+        for op in [
+            ccode.NaryAddition,
+            ccode.NaryMultiplication,
+            ccode.NaryAnd,
+            ccode.NaryOr,
+            ccode.NaryXor,
+            ccode.NaryLogicalAnd,
+            ccode.NaryLogicalOr,
+        ]:
+            self.check_gen(op([dummy, dummy, dummy]),
+                           "dummy {0} dummy {0} dummy".format(op.OP))
+
+    def test_nary_single_operand(self):
+        self.check_gen(ccode.NaryAddition([dummy]), "dummy")
+
+    def test_nary_no_operands(self):
+        with self.assertRaises(code.CodeError):
+            ccode.NaryAddition([])
+
+    def test_nary_parentheses(self):
+        self.check_gen(
+            ccode.NaryAddition([dummy, ccode.Addition(dummy, dummy)]),
+            "dummy + (dummy + dummy)",
+        )
+        self.check_gen(ccode.NaryAddition([dummy, dummy]), "(dummy + dummy)",
+                       action="_act_with_parentheses")
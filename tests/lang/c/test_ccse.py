@@ -0,0 +1,214 @@
+#! /usr/bin/python3
+
+from tests.lang.c.common import CCodeTest, ct_int
+
+from codegen.lang.c import ccode, cdata, cdecl, ccse
+
+i = ccode.Expr("i")
+p = ccode.Expr("p")
+x = ccode.Expr("x")
+f = ccode.Expr("f")
+
+
+def element():
+    return ccode.Subscript(ccode.Dereference(p),
+                           ccode.Addition(i, cdata.IntLiteral(1)))
+
+
+def func(*statements, **kw):
+    args = [ct_int("i"), cdecl.Pointer(cdecl.Pointer(ct_int))("p")]
+    return ccode.Func(cdecl.Func(ct_int, args)("func"), code=list(statements),
+                      **kw)
+
+
+class TestEliminate(CCodeTest):
+
+    def check_cse(self, func, expected):
+        ccse.eliminate(func)
+        self.check_gen(func, "int func(int i, int **p)\n{\n" + expected)
+
+    def test_hoist(self):
+        self.check_cse(func(
+            ccode.Return(ccode.Addition(
+                ccode.Multiplication(element(), element()),
+                ccode.Multiplication(ccode.Addition(i, cdata.IntLiteral(1)),
+                                     x),
+            )),
+        ), (
+            "\t__auto_type cse0 = i + 1;\n"
+            "\t__auto_type cse1 = (*p)[cse0];\n"
+            "\n"
+            "\treturn cse1 * cse1 + cse0 * x;\n"
+            "}\n"
+        ))
+
+    def test_no_repeats(self):
+        self.check_cse(func(ccode.Return(element())), (
+            "\treturn (*p)[i + 1];\n"
+            "}\n"
+        ))
+
+    def test_only_inside_larger(self):
+        # i + 1 is only used by the hoisted (*p)[i + 1]
+        self.check_cse(func(
+            ccode.Assignment(x, element()),
+            ccode.Return(element()),
+        ), (
+            "\t__auto_type cse0 = (*p)[i + 1];\n"
+            "\n"
+            "\tx = cse0;\n"
+            "\treturn cse0;\n"
+            "}\n"
+        ))
+
+    def test_unique_names(self):
+        cse0 = ccode.Expr("cse0")
+        self.check_cse(func(
+            ccode.Assignment(cse0, ccode.Addition(i, i)),
+            ccode.Return(ccode.Addition(i, i)),
+        ), (
+            "\t__auto_type cse1 = i + i;\n"
+            "\n"
+            "\tcse0 = cse1;\n"
+            "\treturn cse1;\n"
+            "}\n"
+        ))
+
+    def test_written_name(self):
+        block = func(
+            ccode.Assignment(x, ccode.Addition(i, i)),
+            ccode.PostIncrement(i),
+            ccode.Return(ccode.Addition(i, i)),
+        )
+        self.check_cse(block, (
+            "\tx = i + i;\n"
+            "\ti++;\n"
+            "\treturn i + i;\n"
+            "}\n"
+        ))
+
+    def test_written_memory(self):
+        self.check_cse(func(
+            ccode.Assignment(x, element()),
+            ccode.Assignment(ccode.Dereference(x), i),
+            ccode.Return(element()),
+        ), (
+            "\t__auto_type cse0 = i + 1;\n"
+            "\n"
+            "\tx = (*p)[cse0];\n"
+            "\t*x = i;\n"
+            "\treturn (*p)[cse0];\n"
+            "}\n"
+        ))
+
+    def test_written_variable(self):
+        # a variable with a value is still a name, not its value
+        a = ccode.Variable(ct_int("a"), cdata.IntLiteral(0))
+        r = ccode.Variable(ct_int("r"))
+        product = ccode.Multiplication(a, cdata.IntLiteral(3))
+        self.check_cse(func(
+            ccode.Assignment(r, product),
+            ccode.Assignment(a, cdata.IntLiteral(5)),
+            ccode.AssignmentAddition(r, product),
+            ccode.Return(r),
+            variables=[a, r],
+        ), (
+            "\tint a = 0;\n"
+            "\tint r;\n"
+            "\n"
+            "\tr = a * 3;\n"
+            "\ta = 5;\n"
+            "\tr += a * 3;\n"
+            "\treturn r;\n"
+            "}\n"
+        ))
+
+    def test_calls(self):
+        # a call may change globals, but not locals
+        self.check_cse(func(
+            ccode.Call(f, []),
+            ccode.Assignment(x, ccode.Addition(i, i)),
+            ccode.Assignment(x, ccode.Addition(x, x)),
+            ccode.Return(ccode.Addition(ccode.Addition(i, i),
+                                        ccode.Addition(x, x))),
+        ), (
+            "\tf();\n"
+            "\tx = i + i;\n"
+            "\tx = x + x;\n"
+            "\treturn i + i + (x + x);\n"
+            "}\n"
+        ))
+
+    def test_short_circuit(self):
+        deref = ccode.Dereference(ccode.Dereference(p))
+        self.check_cse(func(
+            ccode.Return(ccode.LogicalAnd(
+                p,
+                ccode.Equal(ccode.Addition(deref, deref), i),
+            )),
+        ), (
+            "\treturn p && **p + **p == i;\n"
+            "}\n"
+        ))
+
+    def test_after_barrier(self):
+        # the dereference may only be valid once the if block has returned
+        deref = ccode.Dereference(p)
+        self.check_cse(func(
+            ccode.IfBlock(ccode.LogicalNot(p), code=[ccode.Return(i)]),
+            ccode.Return(ccode.Addition(deref, deref)),
+        ), (
+            "\tif (!p)\n"
+            "\t\treturn i;\n"
+            "\treturn *p + *p;\n"
+            "}\n"
+        ))
+
+    def test_negative_literals(self):
+        def product():
+            return ccode.Multiplication(i, cdata.IntLiteral(-3))
+        self.check_cse(func(
+            ccode.Assignment(x, product()),
+            ccode.AssignmentAddition(x, product()),
+            ccode.Return(x),
+        ), (
+            "\t__auto_type cse0 = i * -3;\n"
+            "\n"
+            "\tx = cse0;\n"
+            "\tx += cse0;\n"
+            "\treturn x;\n"
+            "}\n"
+        ))
+
+    def test_nested_blocks(self):
+        inner = ccode.WhileLoop(ccode.LessThan(x, ccode.Addition(i, i)),
+                                code=[ccode.Assignment(x, ccode.Addition(
+                                    ccode.Multiplication(i, i),
+                                    ccode.Multiplication(i, i),
+                                ))])
+        self.check_cse(func(
+            ccode.Assignment(x, ccode.Addition(i, i)),
+            inner,
+        ), (
+            "\t__auto_type cse0 = i + i;\n"
+            "\n"
+            "\tx = cse0;\n"
+            "\twhile (x < cse0) {\n"
+            "\t\t__auto_type cse1 = i * i;\n"
+            "\n"
+            "\t\tx = cse1 + cse1;\n"
+            "\t}\n"
+            "}\n"
+        ))
+
+    def test_custom_type(self):
+        block = ccode.Block(code=[ccode.Return(ccode.Multiplication(
+            ccode.Addition(i, i), ccode.Addition(i, i)))])
+        ccse.eliminate(block, ctype=ct_int, prefix="t")
+        self.check_gen(block, (
+            "{\n"
+            "\tint t0 = i + i;\n"
+            "\n"
+            "\treturn t0 * t0;\n"
+            "}\n"
+        ))
@@ -1,9 +1,22 @@
 #! /usr/bin/python3
 
-from tests.lang.c.common import CCodeTest, dummy
+import array
+import ctypes
+import io
+import os
+import tempfile
+import unittest
 
+from tests.lang.c.common import CCodeTest, ct_int, dummy
+
+from codegen.core import code, source
 from codegen.lang.c import cdata
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class TestIntLiteral(CCodeTest):
 
@@ -25,6 +38,43 @@ class TestStringLiteral(CCodeTest):
     def test_binray_string_literal(self):
         self.check_gen(cdata.StringLiteral("\x00\x01"), "\"\\x00\\x01\"")
 
+    def test_hex_escape_before_digit(self):
+        self.check_gen(cdata.StringLiteral("\x01a\\x01a"),
+                       "\"\\x01\" \"a\\\\x01a\"")
+
+    def test_unprintable_string_literal(self):
+        self.check_gen(cdata.StringLiteral("\u200b\xe9"), "\"\\u200b\xe9\"")
+
+    def test_trigraphs(self):
+        self.check_gen(cdata.StringLiteral("??=???"), "\"?\\?=?\\?\\?\"")
+
+    def test_bytes_string_literal(self):
+        self.check_gen(cdata.StringLiteral(b"\xff\x001\n\"\\a"),
+                       "\"\\377\\0001\\n\\\"\\\\a\"")
+
+    def test_split_string_literal(self):
+        self.check_gen(cdata.StringLiteral("hello world", width=4), (
+            "\"hell\"\n"
+            "\t\"o wo\"\n"
+            "\t\"rld\""
+        ))
+
+    def test_split_between_escapes(self):
+        self.check_gen(cdata.StringLiteral("ab\x01\\\\\u200b", width=3), (
+            "\"ab\"\n"
+            "\t\"\\x01\"\n"
+            "\t\"\\\\\"\n"
+            "\t\"\\\\\"\n"
+            "\t\"\\u200b\""
+        ))
+
+    def test_split_empty_string_literal(self):
+        self.check_gen(cdata.StringLiteral("", width=4), "\"\"")
+
+    def test_bad_width(self):
+        with self.assertRaises(code.CodeError):
+            cdata.StringLiteral("a", width=0)
+
 
 class TestCompoundLiteral(CCodeTest):
 
@@ -37,3 +87,136 @@ class TestCompoundLiteral(CCodeTest):
     def test_compound_literal_with_multiple_values(self):
         compound = cdata.CompoundLiteral([dummy, dummy])
         self.check_gen(compound, "{\n\tdummy,\n\tdummy,\n}")
+
+
+class TestArrayLiteral(CCodeTest):
+
+    def test_same_as_compound_literal(self):
+        values = [3, -1, 20]
+        for base in [cdata.IntLiteral.B_DEC, cdata.IntLiteral.B_HEX]:
+            compound = cdata.CompoundLiteral([cdata.IntLiteral(v, base)
+                                              for v in values])
+            stream = io.StringIO()
+            compound._act(source._SourceStream(self.CONFIG, stream))
+            self.check_gen(cdata.ArrayLiteral(array.array("i", values), base),
+                           stream.getvalue())
+
+    def test_empty(self):
+        self.check_gen(cdata.ArrayLiteral(b""), "{\n}")
+
+    def test_per_line_and_suffix(self):
+        literal = cdata.ArrayLiteral(range(5), cdata.IntLiteral.B_HEX,
+                                     per_line=2, suffix="U")
+        self.check_gen(literal, (
+            "{\n"
+            "\t0x0U, 0x1U,\n"
+            "\t0x2U, 0x3U,\n"
+            "\t0x4U,\n"
+            "}"
+        ))
+
+    def test_dimensions(self):
+        values = memoryview(bytes(range(6))).cast("B", (2, 3))
+        self.check_gen(cdata.ArrayLiteral(values, per_line=3), (
+            "{\n"
+            "\t0, 1, 2,\n"
+            "\t3, 4, 5,\n"
+            "}"
+        ))
+
+    def test_strided(self):
+        values = memoryview(array.array("i", range(6)))[::2]
+        self.check_gen(cdata.ArrayLiteral(values, per_line=3),
+                       "{\n\t0, 2, 4,\n}")
+
+    def test_byte_order(self):
+        for ctype in (ctypes.c_int32.__ctype_be__,
+                      ctypes.c_int32.__ctype_le__,
+                      ctypes.c_uint16.__ctype_be__):
+            values = (ctype * 2 * 2)(*[(ctype * 2)(1, 256), (ctype * 2)(2)])
+            self.check_gen(cdata.ArrayLiteral(values, per_line=4),
+                           "{\n\t1, 256, 2, 0,\n}")
+        values = (ctypes.c_int8.__ctype_be__ * 2)(-1, 1)
+        self.check_gen(cdata.ArrayLiteral(values, per_line=2),
+                       "{\n\t-1, 1,\n}")
+
+    def test_bools(self):
+        values = (ctypes.c_bool * 3)(True, False, True)
+        self.check_gen(cdata.ArrayLiteral(values, per_line=3),
+                       "{\n\t1, 0, 1,\n}")
+
+    def test_bad_format(self):
+        class Pair(ctypes.Structure):
+            _fields_ = [("a", ctypes.c_int), ("b", ctypes.c_char)]
+
+        with self.assertRaises(code.CodeError):
+            cdata.ArrayLiteral((Pair * 2)())
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        values = numpy.arange(6, dtype=">i4").reshape(2, 3)
+        for array_values in (values.T, numpy.asfortranarray(values)):
+            self.check_gen(cdata.ArrayLiteral(array_values, per_line=6),
+                           "{{\n\t{},\n}}".format(", ".join(
+                               str(v) for v in array_values.flatten())))
+        self.check_gen(cdata.ArrayLiteral(numpy.arange(3, dtype="e"),
+                                          per_line=3),
+                       "{\n\t0.0, 1.0, 2.0,\n}")
+        self.check_gen(cdata.ArrayLiteral(numpy.array([True, False])),
+                       "{\n\t1,\n\t0,\n}")
+
+    def test_chunks(self):
+        class SmallChunks(cdata.ArrayLiteral):
+            __slots__ = ()
+            CHUNK_LINES = 2
+
+        self.check_gen(SmallChunks(bytes(range(7)), per_line=2), (
+            "{\n"
+            "\t0, 1,\n"
+            "\t2, 3,\n"
+            "\t4, 5,\n"
+            "\t6,\n"
+            "}"
+        ))
+
+    def test_bad_per_line(self):
+        with self.assertRaises(code.CodeError):
+            cdata.ArrayLiteral(b"", per_line=0)
+
+
+class TestBlobLiteral(CCodeTest):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write_blob(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_blob(self):
+        self.write_blob(bytes(range(0, 140, 10)))
+        self.check_gen(cdata.BlobLiteral(self.path), (
+            "{\n"
+            "\t0x00, 0x0a, 0x14, 0x1e, 0x28, 0x32, 0x3c, 0x46, 0x50, 0x5a,"
+            " 0x64, 0x6e,\n"
+            "\t0x78, 0x82,\n"
+            "}"
+        ))
+
+    def test_empty_blob(self):
+        self.check_gen(cdata.BlobLiteral(self.path), "{\n}")
+
+    def test_read_when_rendered(self):
+        blob = cdata.BlobLiteral(self.path, per_line=2, suffix="U")
+        self.write_blob(b"\x01\x02\x03")
+        self.check_gen(blob, "{\n\t0x01U, 0x02U,\n\t0x03U,\n}")
+
+    def test_length_global(self):
+        self.write_blob(b"\x00" * 5)
+        blob = cdata.BlobLiteral(self.path)
+        length = blob.length_global(ct_int("blob_len"))
+        self.check_gen(length, "int blob_len = 5;\n")
@@ -0,0 +1,214 @@
+#! /usr/bin/python3
+
+from tests.lang.c.common import CCodeTest, ct_int, dummy, lit
+
+from codegen.core import code
+from codegen.lang.c import ccode, cdce
+
+x = ccode.Expr("x")
+
+
+def statement(name):
+    return ccode.Expr(name)
+
+
+class TestPrune(CCodeTest):
+
+    def check_prune(self, statements, expected):
+        block = ccode.Block(code=statements)
+        cdce.prune_block(block)
+        self.check_gen(block, expected)
+
+    def test_false_if(self):
+        self.check_prune([
+            ccode.IfBlock(lit(0), code=[statement("a")]),
+            statement("b"),
+        ], "\tb;\n")
+
+    def test_true_if(self):
+        self.check_prune([
+            ccode.IfBlock(lit(1), code=[statement("a"), statement("b")],
+                          elseb=ccode.ElseBlock(code=[statement("c")])),
+        ], (
+            "{\n"
+            "\ta;\n"
+            "\tb;\n"
+            "}\n"
+        ))
+
+    def test_folded_condition(self):
+        self.check_prune([
+            ccode.IfBlock(ccode.LogicalAnd(lit(0), x), code=[statement("a")],
+                          elseb=ccode.ElseBlock(code=[statement("b")])),
+        ], "\tb;\n")
+
+    def test_arm_with_variables(self):
+        self.check_prune([
+            ccode.IfBlock(lit(1), [ccode.Variable(ct_int("a"))],
+                          [statement("a")]),
+            statement("b"),
+        ], (
+            "{\n"
+            "\t{\n"
+            "\t\tint a;\n"
+            "\n"
+            "\t\ta;\n"
+            "\t}\n"
+            "\tb;\n"
+            "}\n"
+        ))
+
+    def test_else_if_collapses(self):
+        inner = ccode.IfBlock(lit(0), code=[statement("b")])
+        inner.add_else(ccode.ElseBlock(code=[
+            ccode.IfBlock(x, code=[statement("c"), statement("d")]),
+        ]))
+        outer = ccode.IfBlock(dummy, code=[statement("a")])
+        outer.add_else(ccode.ElseBlock(code=[inner]))
+        self.check_prune([outer], (
+            "\tif (dummy) {\n"
+            "\t\ta;\n"
+            "\t} else if (x) {\n"
+            "\t\tc;\n"
+            "\t\td;\n"
+            "\t}\n"
+        ))
+
+    def test_else_removed(self):
+        outer = ccode.IfBlock(dummy, code=[statement("a")])
+        outer.add_else(ccode.ElseBlock(code=[
+            ccode.IfBlock(lit(0), code=[statement("b")]),
+        ]))
+        self.check_prune([outer], (
+            "\tif (dummy)\n"
+            "\t\ta;\n"
+        ))
+        self.assertIsNone(outer.elseb)
+
+    def test_false_loops(self):
+        self.check_prune([
+            ccode.WhileLoop(lit(0), code=[statement("a")]),
+            ccode.ForLoop(ccode.Assignment(x, lit(0)), lit(0), x,
+                          code=[statement("b")]),
+            ccode.ForLoop(ccode.Expr(""), lit(0), x, code=[statement("c")]),
+            ccode.WhileLoop(lit(1), code=[statement("d")]),
+        ], (
+            "{\n"
+            "\tx = 0;\n"
+            "\twhile (1)\n"
+            "\t\td;\n"
+            "}\n"
+        ))
+
+    def test_after_return(self):
+        self.check_prune([
+            statement("a"),
+            ccode.Return(x),
+            statement("b"),
+            ccode.IfBlock(x, code=[statement("c")]),
+        ], (
+            "{\n"
+            "\ta;\n"
+            "\treturn x;\n"
+            "}\n"
+        ))
+
+    def test_after_jumps(self):
+        for jump in ["break", "continue", "goto out"]:
+            self.check_prune([statement(jump), statement("a")],
+                             "\t{};\n".format(jump))
+
+    def test_after_terminating_if(self):
+        self.check_prune([
+            ccode.IfBlock(x, code=[ccode.Return(x)],
+                          elseb=ccode.ElseBlock(code=[statement("break")])),
+            statement("a"),
+        ], (
+            "\tif (x) {\n"
+            "\t\treturn x;\n"
+            "\t} else {\n"
+            "\t\tbreak;\n"
+            "\t}\n"
+        ))
+
+    def test_after_terminating_ladder(self):
+        def ladder(last):
+            top = prev = None
+            for i in range(3000):
+                ifb = ccode.IfBlock(ccode.Expr("c{}".format(i)),
+                                    code=[ccode.Return(lit(i))])
+                if top is None:
+                    top = ifb
+                else:
+                    prev.add_else(ccode.ElseBlock(code=[ifb]))
+                prev = ifb
+            prev.add_else(ccode.ElseBlock(code=[last]))
+            return ccode.Block(code=[top, statement("a")])
+
+        block = ladder(ccode.Return(x))
+        cdce.prune_block(block)
+        self.assertEqual(len(block.code), 1)
+        block = ladder(statement("b"))
+        cdce.prune_block(block)
+        self.assertEqual(len(block.code), 2)
+
+    def test_after_partly_terminating_if(self):
+        self.check_prune([
+            ccode.IfBlock(x, code=[ccode.Return(x)]),
+            statement("a"),
+        ], (
+            "{\n"
+            "\tif (x)\n"
+            "\t\treturn x;\n"
+            "\ta;\n"
+            "}\n"
+        ))
+
+    def test_labels(self):
+        self.check_prune([
+            ccode.Return(x),
+            statement("a"),
+            statement("out:"),
+            statement("b"),
+            ccode.IfBlock(lit(0), code=[statement("again:")]),
+        ], (
+            "{\n"
+            "\treturn x;\n"
+            "\tout:;\n"
+            "\tb;\n"
+            "\tif (0)\n"
+            "\t\tagain:;\n"
+            "}\n"
+        ))
+
+    def test_nested(self):
+        self.check_prune([
+            ccode.WhileLoop(x, code=[
+                ccode.IfBlock(lit(0), code=[statement("a")]),
+                statement("break"),
+                statement("b"),
+            ]),
+        ], (
+            "\twhile (x)\n"
+            "\t\tbreak;\n"
+        ))
+
+    def test_version(self):
+        block = ccode.Block(code=[statement("a")])
+        version = block._version
+        cdce.prune_block(block)
+        self.assertEqual(block._version, version)
+        block.add_code(ccode.Return(x))
+        block.add_code(statement("b"))
+        version = block._version
+        cdce.prune_block(block)
+        self.assertNotEqual(block._version, version)
+
+    def test_conditional_root(self):
+        for root in [
+            ccode.IfBlock(lit(0), code=[statement("a")]),
+            ccode.WhileLoop(x, code=[statement("a")]),
+        ]:
+            with self.assertRaises(code.CodeError):
+                cdce.prune_block(root)
+            self.assertEqual(len(root.code), 1)
@@ -1,10 +1,20 @@
 #! /usr/bin/python3
 
+import copy
+import io
+import pickle
 import unittest
 
 from tests.lang.c.common import ct_int
 
-from codegen.lang.c import cdecl
+from codegen.core import source
+from codegen.lang.c import cdecl, csource
+
+
+def write(decl):
+    stream = io.StringIO()
+    decl._write(source._SourceStream(csource._config, stream))
+    return stream.getvalue()
 
 
 class TestNotImplementedErrors(unittest.TestCase):
@@ -138,3 +148,114 @@ class TestCompositeType(unittest.TestCase):
     def test_tagless_struct(self):
         decl = cdecl.Struct("", [])("a")
         self.assertEqual(str(decl), "struct {\n} a")
+
+    def test_nested_struct(self):
+        inner = cdecl.Union("b", [ct_int("c"), cdecl.Pointer(ct_int)("d")])
+        decl = cdecl.Struct("a", [ct_int("a"), inner("b")])("a")
+        self.assertEqual(str(decl), (
+            "struct a {\n"
+            "\tint a;\n"
+            "\tunion b {\n"
+            "\t\tint c;\n"
+            "\t\tint *d;\n"
+            "\t} b;\n"
+            "} a"
+        ))
+
+
+class TestDeclCache(unittest.TestCase):
+
+    def test_repeated_decl(self):
+        ctype = cdecl.Pointer(cdecl.Array(ct_int, 1))
+        self.assertIs(str(ctype("a")), str(ctype("a")))
+        self.assertEqual(str(ctype("b")), "int (*b)[1]")
+
+    def test_replaced_attribute(self):
+        ctype = cdecl.Array(ct_int, 1)
+        self.assertEqual(str(ctype("a")), "int a[1]")
+        with self.assertRaises(AttributeError):
+            ctype.size = 2
+        self.assertEqual(str(ctype("a")), "int a[1]")
+
+    def test_replaced_func_args(self):
+        ctype = cdecl.Func(ct_int, cdecl.void_args)
+        with self.assertRaises(AttributeError):
+            ctype.args = (ct_int("b"),)
+        self.assertEqual(str(ctype("a")), "int a(void)")
+
+    def test_write_uses_cache(self):
+        ctype = cdecl.Pointer(cdecl.Func(ct_int, [ct_int("b")]))
+        self.assertEqual(write(ctype("a")), "int (*a)(int b)")
+        self.assertIn("a", ctype._decls)
+        struct = cdecl.Struct("s", [ct_int("b")])
+        self.assertEqual(write(cdecl.Pointer(struct)("a")), (
+            "struct s {\n"
+            "\tint b;\n"
+            "} *a"
+        ))
+
+    def test_func_args_are_immutable(self):
+        args = [ct_int("b")]
+        ctype = cdecl.Func(ct_int, args)
+        args.append(ct_int("c"))
+        self.assertEqual(str(ctype("a")), "int a(int b)")
+
+    def test_renamed_func_arg(self):
+        ctype = cdecl.Func(ct_int, (ct_int("b"),))
+        self.assertEqual(str(ctype("a")), "int a(int b)")
+        with self.assertRaises(AttributeError):
+            ctype.args[0].name = "c"
+        with self.assertRaises(AttributeError):
+            ctype.args[0].ctype = cdecl.Primitive("char")
+        self.assertEqual(str(ctype("a")), "int a(int b)")
+
+    def test_bounded(self):
+        ctype = cdecl.Pointer(ct_int)
+        for i in range(ctype._DECLS_SIZE + 10):
+            self.assertEqual(str(ctype("a{}".format(i))), "int *a{}".format(i))
+        self.assertEqual(len(ctype._decls), ctype._DECLS_SIZE)
+        self.assertNotIn("a0", ctype._decls)
+        self.assertEqual(ct_int._decls, {})
+
+
+class TestInterning(unittest.TestCase):
+
+    def test_primitive(self):
+        self.assertIs(cdecl.Primitive("int"), ct_int)
+        self.assertIsNot(cdecl.Primitive("char"), ct_int)
+
+    def test_nested(self):
+        self.assertIs(cdecl.Pointer(cdecl.Array(ct_int, 1)),
+                      cdecl.Pointer(cdecl.Array(ct_int, 1)))
+        self.assertIsNot(cdecl.Array(ct_int, 1), cdecl.Array(ct_int, 2))
+        self.assertIs(cdecl.Array(ct_int), cdecl.Array(ct_int, ""))
+
+    def test_func(self):
+        self.assertIs(cdecl.Func(ct_int, [ct_int("a")]),
+                      cdecl.Func(ct_int, (ct_int("a"),)))
+        self.assertIsNot(cdecl.Func(ct_int, [ct_int("a")]),
+                         cdecl.Func(ct_int, [ct_int("b")]))
+        self.assertIsNot(cdecl.Func(ct_int, [ct_int("")]),
+                         cdecl.Func(ct_int, [cdecl.NamelessArg(ct_int)]))
+
+    def test_composite(self):
+        self.assertIs(cdecl.Struct("a", [ct_int("a")]),
+                      cdecl.Struct("a", [ct_int("a")]))
+        self.assertIsNot(cdecl.Struct("a", []), cdecl.Union("a", []))
+
+    def test_decl_equality(self):
+        self.assertEqual(ct_int("a"), cdecl.Primitive("int")("a"))
+        self.assertEqual(hash(ct_int("a")), hash(cdecl.Primitive("int")("a")))
+        self.assertNotEqual(ct_int("a"), ct_int("b"))
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            ct_int.typename = "char"
+
+    def test_copy_and_pickle(self):
+        ctype = cdecl.Pointer(cdecl.Func(ct_int, [ct_int("a")]))
+        self.assertIs(copy.deepcopy(ctype), ctype)
+        self.assertIs(pickle.loads(pickle.dumps(ctype)), ctype)
+        decl = ctype("b")
+        self.assertIs(copy.deepcopy(decl), decl)
+        self.assertEqual(pickle.loads(pickle.dumps(decl)), decl)
@@ -0,0 +1,53 @@
+#! /usr/bin/python3
+
+from tests.lang.c.common import CCodeTest, dummy
+
+from codegen.lang.c import ccode, cflatten
+
+a = ccode.Expr("a")
+b = ccode.Expr("b")
+c = ccode.Expr("c")
+
+
+class TestFlatten(CCodeTest):
+
+    def test_left_chain(self):
+        expr = ccode.Addition(ccode.Addition(a, b), c)
+        flat = cflatten.flatten(expr)
+        self.assertIs(type(flat), ccode.NaryAddition)
+        self.check_gen(flat, "a + b + c")
+
+    def test_right_chain_of_addition(self):
+        expr = ccode.Addition(a, ccode.Addition(b, c))
+        self.check_gen(cflatten.flatten(expr), "a + (b + c)")
+
+    def test_right_chain_of_associative(self):
+        for op in [ccode.And, ccode.Or, ccode.Xor, ccode.LogicalAnd,
+                   ccode.LogicalOr]:
+            expr = op(a, op(b, op(c, dummy)))
+            self.check_gen(cflatten.flatten(expr),
+                           "a {0} b {0} c {0} dummy".format(op.OP))
+
+    def test_mixed_ops(self):
+        expr = ccode.Addition(ccode.Multiplication(
+            ccode.Multiplication(a, b), c), ccode.Subtraction(a, b))
+        self.check_gen(cflatten.flatten(expr), "a * b * c + (a - b)")
+
+    def test_nested_in_other_nodes(self):
+        expr = ccode.Call(dummy, [ccode.Or(ccode.Or(a, b), c)])
+        self.check_gen(cflatten.flatten(expr), "dummy(a | b | c)")
+
+    def test_long_chain(self):
+        expr = a
+        for _ in range(10000):
+            expr = ccode.Addition(expr, b)
+        flat = cflatten.flatten(expr)
+        self.assertEqual(len(flat.operands), 10001)
+        self.check_gen(flat, "a" + " + b" * 10000)
+
+    def test_flatten_block(self):
+        block = ccode.Block(code=[
+            ccode.Return(ccode.LogicalAnd(ccode.LogicalAnd(a, b), c)),
+        ])
+        cflatten.flatten_block(block)
+        self.check_gen(block, "\treturn a && b && c;\n")
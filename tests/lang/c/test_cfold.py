@@ -0,0 +1,105 @@
+#! /usr/bin/python3
+
+from tests.lang.c.common import CCodeTest, dummy, lit
+
+from codegen.lang.c import ccode, cdata, cfold
+
+
+class TestFold(CCodeTest):
+
+    def check_fold(self, expr, expected):
+        self.check_gen(cfold.fold(expr), expected)
+
+    def test_arithmetic(self):
+        expr = ccode.Addition(lit(4), ccode.Multiplication(lit(8), lit(2)))
+        self.check_fold(expr, "20")
+
+    def test_division_truncates(self):
+        self.check_fold(ccode.Division(ccode.Minus(lit(7)), lit(2)), "-3")
+        self.check_fold(ccode.Modulo(ccode.Minus(lit(7)), lit(2)), "-1")
+
+    def test_division_by_zero(self):
+        self.check_fold(ccode.Division(lit(1), lit(0)), "1 / 0")
+
+    def test_overflow(self):
+        self.check_fold(ccode.Multiplication(lit(1 << 16), lit(1 << 16)),
+                        "65536 * 65536")
+        self.check_fold(ccode.Addition(lit(cfold.INT_MAX), lit(0)),
+                        "2147483647")
+
+    def test_int_min(self):
+        self.check_fold(ccode.Subtraction(lit(cfold.INT_MIN + 1), lit(1)),
+                        "-2147483647 - 1")
+        self.check_fold(ccode.Minus(lit(cfold.INT_MAX)), "-2147483647")
+        self.check_fold(ccode.BitNegation(lit(cfold.INT_MAX)),
+                        "~2147483647")
+
+    def test_shifts(self):
+        self.check_fold(ccode.LeftShift(lit(1), lit(4)), "16")
+        self.check_fold(ccode.LeftShift(lit(1), lit(32)), "1 << 32")
+        self.check_fold(ccode.LeftShift(lit(1), lit(31)), "1 << 31")
+        self.check_fold(ccode.RightShift(lit(256), lit(4)), "16")
+
+    def test_comparisons_and_logic(self):
+        self.check_fold(ccode.LessThan(lit(1), lit(2)), "1")
+        self.check_fold(ccode.Equal(lit(1), lit(2)), "0")
+        self.check_fold(ccode.LogicalOr(lit(0), lit(3)), "1")
+        self.check_fold(ccode.LogicalNot(lit(3)), "0")
+
+    def test_short_circuit(self):
+        self.check_fold(ccode.LogicalAnd(lit(0), dummy), "0")
+        self.check_fold(ccode.LogicalOr(lit(2), dummy), "1")
+        self.check_fold(ccode.LogicalAnd(lit(1), dummy), "1 && dummy")
+
+    def test_bitwise(self):
+        hexa = cdata.IntLiteral.B_HEX
+        self.check_fold(ccode.And(lit(0xff, hexa), lit(0x0f, hexa)), "0xf")
+        self.check_fold(ccode.BitNegation(lit(0)), "-1")
+        self.check_fold(ccode.Or(lit(0xf0, hexa), lit(1)), "241")
+
+    def test_identities(self):
+        self.check_fold(ccode.Addition(dummy, lit(0)), "dummy")
+        self.check_fold(ccode.Addition(lit(0), dummy), "dummy")
+        self.check_fold(ccode.Multiplication(lit(1), dummy), "dummy")
+        self.check_fold(ccode.Subtraction(lit(0), dummy), "0 - dummy")
+        self.check_fold(ccode.Division(dummy, lit(1)), "dummy")
+
+    def test_nested_non_constant(self):
+        expr = ccode.Call(dummy, [ccode.Addition(lit(1), lit(2)), dummy])
+        self.check_fold(expr, "dummy(3, dummy)")
+        self.check_fold(ccode.Subscript(dummy, ccode.Minus(lit(1))),
+                        "dummy[-1]")
+
+    def test_input_untouched(self):
+        inner = ccode.Addition(lit(1), lit(2))
+        expr = ccode.Addition(dummy, inner)
+        cfold.fold(expr)
+        self.assertIs(expr.right, inner)
+
+    def test_deep_chain(self):
+        expr = lit(0)
+        for _ in range(10000):
+            expr = ccode.Addition(expr, lit(1))
+        self.check_fold(expr, "10000")
+
+    def test_fold_block(self):
+        ifb = ccode.IfBlock(ccode.Equal(lit(1), lit(1)), code=[
+            ccode.Return(ccode.Multiplication(dummy, lit(1))),
+        ], elseb=ccode.ElseBlock(code=[
+            ccode.Return(ccode.Addition(lit(1), lit(1))),
+        ]))
+        loop = ccode.ForLoop(dummy, ccode.LessThan(dummy, ccode.Addition(
+            lit(1), lit(2))), dummy, code=[dummy])
+        block = ccode.Block(code=[ifb, loop])
+        cfold.fold_block(block)
+        self.check_gen(block, (
+            "{\n"
+            "\tif (1) {\n"
+            "\t\treturn dummy;\n"
+            "\t} else {\n"
+            "\t\treturn 2;\n"
+            "\t}\n"
+            "\tfor (dummy; dummy < 3; dummy)\n"
+            "\t\tdummy;\n"
+            "}\n"
+        ))
@@ -0,0 +1,142 @@
+#! /usr/bin/python3
+
+import unittest
+
+from tests.lang.c.common import CCodeTest, dummy, ct_int
+
+from codegen.core import code
+from codegen.lang.c import ccode, cdata, cdecl, clayout
+
+ct_char = cdecl.Primitive("char")
+ct_long = cdecl.Primitive("unsigned long")
+
+
+class TestLayout(unittest.TestCase):
+
+    def setUp(self):
+        self.layout = clayout.Layout(clayout.LP64)
+
+    def test_primitives(self):
+        self.assertEqual(self.layout.sizeof(ct_char), 1)
+        self.assertEqual(self.layout.sizeof(ct_long), 8)
+        self.assertEqual(self.layout.alignof(cdecl.Primitive("const int")), 4)
+        self.assertEqual(self.layout.sizeof(cdecl.Primitive("unsigned")), 4)
+        self.assertEqual(self.layout.sizeof(cdecl.Primitive("long int")), 8)
+
+    def test_pointer_and_array(self):
+        self.assertEqual(self.layout.sizeof(cdecl.Pointer(ct_char)), 8)
+        self.assertEqual(self.layout.sizeof(cdecl.Array(ct_int, 3)), 12)
+        self.assertEqual(self.layout.alignof(cdecl.Array(ct_int, 3)), 4)
+
+    def test_ilp32(self):
+        struct = cdecl.Struct("a", [
+            ct_char("a"),
+            cdecl.Primitive("double")("b"),
+            cdecl.Primitive("long long")("c"),
+        ])
+        for abi, offsets, size in [
+            (clayout.I386, [0, 4, 12], 20),
+            (clayout.ARM_EABI, [0, 8, 16], 24),
+        ]:
+            layout = clayout.Layout(abi)
+            self.assertEqual(layout.sizeof(cdecl.Pointer(ct_char)), 4)
+            self.assertEqual(layout.sizeof(ct_long), 4)
+            struct_layout = layout.layout(struct)
+            self.assertEqual([f.offset for f in struct_layout.fields],
+                             offsets)
+            self.assertEqual(struct_layout.size, size)
+
+    def test_struct(self):
+        struct = cdecl.Struct("a", [ct_char("a"), ct_long("b"), ct_int("c")])
+        layout = self.layout.layout(struct)
+        self.assertEqual([f.offset for f in layout.fields], [0, 8, 16])
+        self.assertEqual(layout.size, 24)
+        self.assertEqual(layout.align, 8)
+        self.assertEqual(layout.padding, 11)
+
+    def test_union(self):
+        union = cdecl.Union("a", [ct_char("a"), cdecl.Array(ct_int, 3)("b")])
+        layout = self.layout.layout(union)
+        self.assertEqual([f.offset for f in layout.fields], [0, 0])
+        self.assertEqual(layout.size, 12)
+        self.assertEqual(layout.padding, 0)
+
+    def test_nested_and_named(self):
+        inner = cdecl.Struct("b", [ct_char("a"), ct_int("b")])
+        self.layout.define(inner)
+        struct = cdecl.Struct("a", [
+            ct_char("a"),
+            inner("b"),
+            inner.to_nonverbose()("c"),
+        ])
+        layout = self.layout.layout(struct)
+        self.assertEqual([f.offset for f in layout.fields], [0, 4, 12])
+        self.assertEqual(layout.size, 20)
+
+    def test_flexible_array(self):
+        struct = cdecl.Struct("a", [ct_long("a"), ct_char("b"),
+                                    cdecl.Array(ct_int)("c")])
+        layout = self.layout.layout(struct)
+        self.assertEqual(layout.fields[-1].offset, 12)
+        self.assertEqual(layout.size, 16)
+        reordered = self.layout.reorder(struct)
+        self.assertEqual(reordered.fields[-1].name, "c")
+
+    def test_flexible_array_not_last(self):
+        struct = cdecl.Struct("a", [cdecl.Array(ct_int)("a"), ct_int("b")])
+        with self.assertRaises(code.CodeError):
+            self.layout.layout(struct)
+
+    def test_unknown_type(self):
+        with self.assertRaises(code.CodeError):
+            self.layout.sizeof(cdecl.Primitive("struct unknown"))
+
+    def test_reorder(self):
+        struct = cdecl.Struct("a", [
+            ct_char("a"), ct_long("b"), ct_char("c"), ct_int("d"),
+        ])
+        self.assertEqual(self.layout.layout(struct).size, 24)
+        reordered = self.layout.reorder(struct)
+        self.assertEqual([f.name for f in reordered.fields],
+                         ["b", "d", "a", "c"])
+        self.assertEqual(self.layout.layout(reordered).size, 16)
+
+    def test_reorder_cache_line(self):
+        struct = cdecl.Struct("a", [
+            cdecl.Array(ct_char, 40)("a"),
+            cdecl.Array(ct_char, 30)("b"),
+            cdecl.Array(ct_char, 24)("c"),
+        ])
+        self.assertEqual(self.layout.layout(struct).cache_line_splits(64), 1)
+        reordered = self.layout.reorder(struct, cache_line=64)
+        self.assertEqual([f.name for f in reordered.fields], ["a", "c", "b"])
+        layout = self.layout.layout(reordered)
+        self.assertEqual(layout.cache_line_splits(64), 0)
+
+
+class TestStaticAsserts(CCodeTest):
+
+    def test_static_assert(self):
+        self.check_gen(ccode.StaticAssert(dummy, cdata.StringLiteral("a")),
+                       "_Static_assert(dummy, \"a\");\n")
+
+    def test_static_asserts(self):
+        layout = clayout.Layout(clayout.LP64)
+        struct = cdecl.Struct("a", [ct_char("a"), ct_int("b")])
+        block = ccode.Block(code=layout.static_asserts(struct))
+        self.check_gen(block, (
+            "{\n"
+            "\t_Static_assert(sizeof(struct a) == 8, \"sizeof(struct a)\");\n"
+            "\t_Static_assert(offsetof(struct a, a) == 0, "
+            "\"offsetof(struct a, a)\");\n"
+            "\t_Static_assert(offsetof(struct a, b) == 4, "
+            "\"offsetof(struct a, b)\");\n"
+            "}\n"
+        ))
+
+    def test_tagless(self):
+        layout = clayout.Layout(clayout.LP64)
+        struct = cdecl.Struct("", [ct_int("a")])
+        with self.assertRaises(code.CodeError):
+            layout.static_asserts(struct)
+        self.assertEqual(len(layout.static_asserts(struct, "a_t")), 2)
@@ -0,0 +1,228 @@
+#! /usr/bin/python3
+
+from tests.lang.c.common import CCodeTest, ct_int, lit
+
+from codegen.lang.c import ccode, cdecl, cswitch
+
+x = ccode.Expr("x")
+y = ccode.Expr("y")
+
+
+def chain(values, arm=None, default=None, subject=x):
+    if arm is None:
+        def arm(value):
+            return [ccode.Assignment(y, lit(value))]
+    top = prev = None
+    for value in values:
+        if isinstance(value, tuple):
+            cond = ccode.LogicalOr(*(ccode.Equal(subject, lit(v))
+                                     for v in value))
+            value = value[0]
+        else:
+            cond = ccode.Equal(subject, lit(value))
+        ifb = ccode.IfBlock(cond, code=arm(value))
+        if top is None:
+            top = ifb
+        else:
+            prev.add_else(ccode.ElseBlock(code=[ifb]))
+        prev = ifb
+    if default is not None:
+        prev.add_else(ccode.ElseBlock(code=default))
+    return top
+
+
+def returns(value):
+    return [ccode.Return(lit(value * 10))]
+
+
+def func(*statements):
+    return ccode.Func(cdecl.Func(ct_int, cdecl.void_args)("func"),
+                      code=list(statements))
+
+
+class TestConvert(CCodeTest):
+
+    def check_convert(self, ifb, expected, **kw):
+        block = func(ifb)
+        cswitch.switch_block(block, **kw)
+        self.check_gen(block, "int func(void)\n{\n" + expected + "}\n")
+
+    def test_switch(self):
+        self.check_convert(chain([1, (2, 3), 4], default=[y]), (
+            "\tswitch (x) {\n"
+            "\tcase 1:\n"
+            "\t\ty = 1;\n"
+            "\t\tbreak;\n"
+            "\tcase 2:\n"
+            "\tcase 3:\n"
+            "\t\ty = 2;\n"
+            "\t\tbreak;\n"
+            "\tcase 4:\n"
+            "\t\ty = 4;\n"
+            "\t\tbreak;\n"
+            "\tdefault:\n"
+            "\t\ty;\n"
+            "\t\tbreak;\n"
+            "\t}\n"
+        ))
+
+    def test_literal_on_the_left(self):
+        ifb = chain([1, 2, 3])
+        ifb.cond = ccode.Equal(lit(1), x)
+        self.check_convert(ifb, (
+            "\tswitch (x) {\n"
+            "\tcase 1:\n"
+            "\t\ty = 1;\n"
+            "\t\tbreak;\n"
+            "\tcase 2:\n"
+            "\t\ty = 2;\n"
+            "\t\tbreak;\n"
+            "\tcase 3:\n"
+            "\t\ty = 3;\n"
+            "\t\tbreak;\n"
+            "\t}\n"
+        ))
+
+    def test_duplicate_values(self):
+        self.check_convert(chain([1, (2, 1), 1, 3]), (
+            "\tswitch (x) {\n"
+            "\tcase 1:\n"
+            "\t\ty = 1;\n"
+            "\t\tbreak;\n"
+            "\tcase 2:\n"
+            "\t\ty = 2;\n"
+            "\t\tbreak;\n"
+            "\tcase 3:\n"
+            "\t\ty = 3;\n"
+            "\t\tbreak;\n"
+            "\t}\n"
+        ))
+
+    def test_table(self):
+        self.check_convert(chain([3, 4, 6], arm=returns, default=[
+            ccode.Return(lit(-1)),
+        ]), (
+            "\tif (x >= 3 && x <= 6)\n"
+            "\t\treturn ((const int []){\n"
+            "\t\t\t30,\n"
+            "\t\t\t40,\n"
+            "\t\t\t-1,\n"
+            "\t\t\t60,\n"
+            "\t\t})[x - 3];\n"
+            "\treturn -1;\n"
+        ))
+
+    def test_table_without_default(self):
+        self.check_convert(chain([0, 1, 2], arm=returns), (
+            "\tif (x >= 0 && x <= 2)\n"
+            "\t\treturn ((const int []){\n"
+            "\t\t\t0,\n"
+            "\t\t\t10,\n"
+            "\t\t\t20,\n"
+            "\t\t})[x];\n"
+        ))
+
+    def test_no_table(self):
+        # a gap without a default, a sparse table, or tables disabled
+        for ifb, kw in [
+            (chain([0, 1, 3], arm=returns), {}),
+            (chain([0, 1, 30], arm=returns, default=returns(9)), {}),
+            (chain([0, 1, 2], arm=returns), dict(table_type=None)),
+        ]:
+            statements = cswitch.convert(ifb, **kw)
+            self.assertEqual(len(statements), 1)
+            self.assertIs(type(statements[0]), ccode.SwitchBlock)
+
+    def test_no_table_values(self):
+        # values which are not integer literals, or which do not fit in the
+        # type of the table
+        def pointers(value):
+            return [ccode.Return(ccode.Expr("ptr{}".format(value)))]
+
+        def large(value):
+            return [ccode.Return(lit(0x100000000 + value))]
+
+        for ifb, kw in [
+            (chain([0, 1, 2], arm=pointers), {}),
+            (chain([0, 1, 2], arm=large), {}),
+            (chain([0, 1, 2], arm=returns, default=[
+                ccode.Return(lit(-1)),
+            ]), dict(table_type=cdecl.Primitive("unsigned char"))),
+            (chain([0, 1, 2], arm=returns),
+             dict(table_type=cdecl.Primitive("double"))),
+        ]:
+            statements = cswitch.convert(ifb, **kw)
+            self.assertEqual(len(statements), 1)
+            self.assertIs(type(statements[0]), ccode.SwitchBlock)
+
+    def test_table_range(self):
+        statements = cswitch.convert(
+            chain([0, 1, 2], arm=lambda value: [ccode.Return(lit(-value))]),
+            table_type=cdecl.Primitive("int8_t"))
+        self.assertIs(type(statements[0]), ccode.IfBlock)
+
+    def test_table_type(self):
+        statements = cswitch.convert(chain([0, 1, 2], arm=returns),
+                                     table_type=ct_int)
+        self.check_gen(statements[0].code[0].operand.operand, (
+            "(int [])"
+            "{\n"
+            "\t0,\n"
+            "\t10,\n"
+            "\t20,\n"
+            "}"
+        ))
+
+    def test_not_converted(self):
+        z = ccode.Expr("z")
+        mixed = chain([1, 2, 3])
+        mixed.elseb.code[0].cond = ccode.Equal(z, lit(2))
+        impure = chain([1, 2, 3], subject=ccode.PostIncrement(x))
+        breaks = chain([1, 2, 3], arm=lambda value: [ccode.Expr("break")])
+        not_constant = chain([1, 2, 3])
+        not_constant.cond = ccode.Equal(x, z)
+        for ifb in [
+            chain([1, 2]),
+            mixed,
+            impure,
+            breaks,
+            not_constant,
+        ]:
+            self.assertIsNone(cswitch.convert(ifb))
+
+    def test_variables_with_same_value(self):
+        a = ccode.Variable(ct_int("a"), lit(0))
+        b = ccode.Variable(ct_int("b"), lit(0))
+        ifb = chain([1, 2, 3], subject=a)
+        ifb.elseb.code[0].cond = ccode.Equal(b, lit(2))
+        self.assertIsNone(cswitch.convert(ifb))
+
+    def test_min_cases(self):
+        self.assertIsNotNone(cswitch.convert(chain([1, 2]), min_cases=2))
+
+    def test_long_chain(self):
+        values = list(range(0, 20000, 2))
+        statements = cswitch.convert(chain(values))
+        self.assertEqual(len(statements[0].code), len(values))
+
+    def test_end_of_chain(self):
+        # the first arm compares something else, the rest is converted
+        ifb = ccode.IfBlock(y, code=[x])
+        ifb.add_else(ccode.ElseBlock(code=[chain([1, 2, 3])]))
+        self.check_convert(ifb, (
+            "\tif (y) {\n"
+            "\t\tx;\n"
+            "\t} else {\n"
+            "\t\tswitch (x) {\n"
+            "\t\tcase 1:\n"
+            "\t\t\ty = 1;\n"
+            "\t\t\tbreak;\n"
+            "\t\tcase 2:\n"
+            "\t\t\ty = 2;\n"
+            "\t\t\tbreak;\n"
+            "\t\tcase 3:\n"
+            "\t\t\ty = 3;\n"
+            "\t\t\tbreak;\n"
+            "\t\t}\n"
+            "\t}\n"
+        ))
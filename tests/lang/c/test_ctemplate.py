@@ -0,0 +1,148 @@
+#! /usr/bin/python3
+
+import io
+
+from tests.lang.c.common import CCodeTest, ct_int
+
+from codegen.core import code, source
+from codegen.lang.c import ccode, cdata, cdecl, ctemplate
+
+a = ccode.Variable(ct_int("a"))
+
+
+def func_template():
+    name = ctemplate.Placeholder("name")
+    k = ctemplate.Placeholder("k")
+    b = ccode.Variable(ct_int("b"), k)
+    decl = cdecl.Func(ct_int, [a.decl])(str(name))
+    return ctemplate.Template(ccode.Func(decl, variables=[b], code=[
+        ccode.AssignmentAddition(b, ccode.Multiplication(a, k)),
+        ccode.Return(b),
+    ]))
+
+
+class TestTemplate(CCodeTest):
+
+    def test_render(self):
+        template = func_template()
+        self.assertEqual(template.names, frozenset(["name", "k"]))
+        self.assertEqual(template.render(dict(name="f", k=3)), (
+            "int f(int a)\n"
+            "{\n"
+            "\tint b = 3;\n"
+            "\n"
+            "\tb += a * 3;\n"
+            "\treturn b;\n"
+            "}\n"
+        ))
+
+    def test_parentheses(self):
+        k = ccode.Addition(a, cdata.IntLiteral(1))
+        self.assertEqual(func_template().render(dict(name="f", k=k)), (
+            "int f(int a)\n"
+            "{\n"
+            "\tint b = a + 1;\n"
+            "\n"
+            "\tb += a * (a + 1);\n"
+            "\treturn b;\n"
+            "}\n"
+        ))
+
+    def test_clarify(self):
+        # gcc wants a + b in parentheses as an operand of &
+        value = ctemplate.Placeholder("value")
+        template = ctemplate.Template(ccode.And(value, ccode.Expr("m")))
+        b = ccode.Expr("b")
+        self.assertEqual(template.render(dict(value=ccode.Addition(a, b))),
+                         "(a + b) & m")
+        self.assertEqual(template.render(dict(value=ccode.And(a, b))),
+                         "a & b & m")
+
+    def test_negative_value(self):
+        template = ctemplate.Template(ccode.Minus(ctemplate.Placeholder("k")))
+        self.assertEqual(template.render(dict(k=-3)), "-(-3)")
+        self.assertEqual(template.render(dict(k=cdata.IntLiteral(-3))),
+                         "-(-3)")
+        self.assertEqual(template.render(dict(k=3)), "-3")
+
+    def test_expression_text(self):
+        template = ctemplate.Template(
+            ccode.Multiplication(a, ctemplate.Placeholder("k")))
+        self.assertEqual(template.render(dict(k="a + 1")), "a * (a + 1)")
+        self.assertEqual(template.render(dict(k="b")), "a * b")
+
+    def test_config(self):
+        config = source.SourceConfig(indentation="    ",
+                                     seperate_elements=False)
+        template = func_template()
+        expected = (
+            "int f(int a)\n"
+            "{\n"
+            "    int b = 3;\n"
+            "\n"
+            "    b += a * 3;\n"
+            "    return b;\n"
+            "}\n"
+        )
+        self.assertEqual(template.render(dict(name="f", k=3), config),
+                         expected)
+        stream = io.StringIO()
+        sourceobj = source.Source(config)
+        sourceobj.add_element(template.instantiate(dict(name="f", k=3)))
+        sourceobj.make(stream)
+        self.assertEqual(stream.getvalue(), expected)
+
+    def test_missing_value(self):
+        with self.assertRaises(code.CodeError):
+            func_template().render(dict(name="f"))
+
+    def test_bad_name(self):
+        with self.assertRaises(code.CodeError):
+            ctemplate.Placeholder("a\0b")
+
+    def test_multiline_value(self):
+        value = ctemplate.Placeholder("value")
+        template = ctemplate.Template(ccode.Block(code=[
+            ccode.Assignment(ccode.Expr("x"), value),
+        ]))
+        literal = cdata.CompoundLiteral([cdata.IntLiteral(1),
+                                         cdata.IntLiteral(2)])
+        self.assertEqual(template.render(dict(value=literal)), (
+            "\tx = {\n"
+            "\t\t1,\n"
+            "\t\t2,\n"
+            "\t};\n"
+        ))
+
+    def test_instance(self):
+        template = func_template()
+        block = ccode.Block(code=[
+            template.instantiate(dict(name="f", k=1)),
+            ccode.Expr("x"),
+        ])
+        self.check_gen(block, (
+            "{\n"
+            "\tint f(int a)\n"
+            "\t{\n"
+            "\t\tint b = 1;\n"
+            "\n"
+            "\t\tb += a * 1;\n"
+            "\t\treturn b;\n"
+            "\t}\n"
+            "\tx;\n"
+            "}\n"
+        ))
+
+    def test_statement_instance(self):
+        x = ctemplate.Placeholder("x")
+        template = ctemplate.Template(ccode.Return(x))
+        block = ccode.Block(code=[
+            ccode.Expr("a"),
+            template.instantiate(dict(x="y")),
+        ])
+        self.check_gen(block, (
+            "{\n"
+            "\ta;\n"
+            "\treturn y;\n"
+            "}\n"
+        ))
@@ -0,0 +1,174 @@
+#! /usr/bin/python3
+
+from tests.lang.c.common import CCodeTest, ct_int, lit
+
+from codegen.core import code
+from codegen.lang.c import ccode, cunroll
+
+i = ccode.Expr("i")
+a = ccode.Expr("a")
+x = ccode.Expr("x")
+
+
+def loop(start, op, bound, step=None, body=None):
+    if step is None:
+        step = ccode.PostIncrement(i)
+    if body is None:
+        body = [ccode.AssignmentAddition(x, ccode.Subscript(a, i))]
+    return ccode.ForLoop(ccode.Assignment(i, lit(start)), op(i, lit(bound)),
+                         step, code=body)
+
+
+class TestUnroll(CCodeTest):
+
+    def check_unroll(self, loop, expected, factor=None):
+        statements = cunroll.unroll(loop, factor)
+        self.check_gen(ccode.Block(code=statements), expected)
+
+    def test_full(self):
+        self.check_unroll(loop(0, ccode.LessThan, 3), (
+            "{\n"
+            "\tx += a[0];\n"
+            "\tx += a[1];\n"
+            "\tx += a[2];\n"
+            "\ti = 3;\n"
+            "}\n"
+        ))
+
+    def test_inclusive_bound_and_step(self):
+        self.check_unroll(loop(1, ccode.LessEqualThan, 7,
+                               ccode.AssignmentAddition(i, lit(3))), (
+            "{\n"
+            "\tx += a[1];\n"
+            "\tx += a[4];\n"
+            "\tx += a[7];\n"
+            "\ti = 10;\n"
+            "}\n"
+        ))
+
+    def test_counting_down(self):
+        self.check_unroll(loop(2, ccode.GreaterEqualThan, 0,
+                               ccode.PostDecrement(i)), (
+            "{\n"
+            "\tx += a[2];\n"
+            "\tx += a[1];\n"
+            "\tx += a[0];\n"
+            "\ti = -1;\n"
+            "}\n"
+        ))
+
+    def test_no_trips(self):
+        self.check_unroll(loop(5, ccode.LessThan, 0), "\ti = 5;\n")
+
+    def test_factor(self):
+        self.check_unroll(loop(0, ccode.LessThan, 10), (
+            "{\n"
+            "\tfor (i = 0; i < 8; i += 4) {\n"
+            "\t\tx += a[i];\n"
+            "\t\tx += a[i + 1];\n"
+            "\t\tx += a[i + 2];\n"
+            "\t\tx += a[i + 3];\n"
+            "\t}\n"
+            "\tfor (; i < 10; i++)\n"
+            "\t\tx += a[i];\n"
+            "}\n"
+        ), factor=4)
+
+    def test_factor_without_remainder(self):
+        self.check_unroll(loop(9, ccode.GreaterThan, 1,
+                               ccode.AssignmentSubtraction(i, lit(2))), (
+            "\tfor (i = 9; i > 1; i -= 4) {\n"
+            "\t\tx += a[i];\n"
+            "\t\tx += a[i - 2];\n"
+            "\t}\n"
+        ), factor=2)
+
+    def test_body_variables(self):
+        y = ccode.Variable(ct_int("y"), ccode.Multiplication(i, i))
+        body_loop = loop(0, ccode.LessThan, 2,
+                         body=[ccode.AssignmentAddition(x, y)])
+        body_loop.add_var(y)
+        self.check_unroll(body_loop, (
+            "{\n"
+            "\t{\n"
+            "\t\tint y = 0 * 0;\n"
+            "\n"
+            "\t\tx += y;\n"
+            "\t}\n"
+            "\t{\n"
+            "\t\tint y = 1 * 1;\n"
+            "\n"
+            "\t\tx += y;\n"
+            "\t}\n"
+            "\ti = 2;\n"
+            "}\n"
+        ))
+
+    def test_nested_blocks_are_copied(self):
+        body = ccode.IfBlock(ccode.Equal(i, x), code=[ccode.Return(i)])
+        statements = cunroll.unroll(loop(0, ccode.LessThan, 2, body=[body]))
+        self.assertIsNot(statements[0], body)
+        self.assertIsNot(statements[0], statements[1])
+        self.check_gen(ccode.Block(code=statements), (
+            "{\n"
+            "\tif (0 == x)\n"
+            "\t\treturn 0;\n"
+            "\tif (1 == x)\n"
+            "\t\treturn 1;\n"
+            "\ti = 2;\n"
+            "}\n"
+        ))
+
+    def test_not_unrollable(self):
+        for not_unrollable in [
+            loop(0, ccode.LessThan, 4, body=[ccode.PostIncrement(i)]),
+            loop(0, ccode.LessThan, 4, body=[ccode.Expr("break")]),
+            loop(0, ccode.LessThan, 4, body=[ccode.Expr("i = 0")]),
+            loop(0, ccode.LessThan, 4, body=[ccode.Call(x, [
+                ccode.AddressOf(i)])]),
+            loop(0, ccode.LessThan, 4, ccode.PostDecrement(i)),
+            loop(0, ccode.Unequal, 5, ccode.AssignmentAddition(i, lit(2))),
+            loop(0, ccode.LessThan, 4, ccode.PostIncrement(x)),
+            ccode.ForLoop(ccode.Assignment(i, x), ccode.LessThan(i, lit(4)),
+                          ccode.PostIncrement(i)),
+            ccode.ForLoop(ccode.Assignment(i, lit(0)), ccode.LessThan(i, x),
+                          ccode.PostIncrement(i)),
+        ]:
+            self.assertIsNone(cunroll.unroll(not_unrollable))
+
+    def test_bad_factor(self):
+        with self.assertRaises(code.CodeError):
+            cunroll.unroll(loop(0, ccode.LessThan, 4), 0)
+
+
+class TestUnrollBlock(CCodeTest):
+
+    def test_inner_loops_first(self):
+        j = ccode.Expr("j")
+        element = ccode.Subscript(ccode.Subscript(a, i), j)
+        inner = ccode.ForLoop(ccode.Assignment(j, lit(0)),
+                              ccode.LessThan(j, lit(2)), ccode.PreIncrement(j),
+                              code=[ccode.AssignmentAddition(x, element)])
+        block = ccode.Block(code=[loop(0, ccode.LessThan, 2, body=[inner])])
+        cunroll.unroll_block(block)
+        self.check_gen(block, (
+            "{\n"
+            "\tx += a[0][0];\n"
+            "\tx += a[0][1];\n"
+            "\tj = 2;\n"
+            "\tx += a[1][0];\n"
+            "\tx += a[1][1];\n"
+            "\tj = 2;\n"
+            "\ti = 2;\n"
+            "}\n"
+        ))
+
+    def test_max_trips(self):
+        block = ccode.Block(code=[loop(0, ccode.LessThan, 100)])
+        version = block._version
+        cunroll.unroll_block(block, max_trips=10)
+        self.assertEqual(block._version, version)
+        self.assertIs(type(block.code[0]), ccode.ForLoop)
+        cunroll.unroll_block(block, factor=10)
+        self.assertNotEqual(block._version, version)
+        self.assertEqual(len(block.code[0].code), 10)
@@ -0,0 +1,73 @@
+#! /usr/bin/python3
+
+import tracemalloc
+import unittest
+
+from tests.lang.c.common import dummy, ct_int
+
+from codegen.lang.c import ccode, cdata, cdecl, cpp
+
+
+def bytes_per_node(factory, count=10000):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = [factory() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del nodes
+    return (after - before) / count
+
+
+def with_dict(cls):
+    return type(cls.__name__, (cls,), {})
+
+
+class TestSlots(unittest.TestCase):
+
+    NODES = [
+        lambda: ccode.Expr("a"),
+        lambda: ccode.Variable(ct_int("a")),
+        lambda: ccode.Global(ct_int("a")),
+        lambda: ccode.Addition(dummy, dummy),
+        lambda: ccode.Minus(dummy),
+        lambda: ccode.PostIncrement(dummy),
+        lambda: ccode.Block(),
+        lambda: ccode.ElseBlock(),
+        lambda: ccode.IfBlock(dummy),
+        lambda: ccode.WhileLoop(dummy),
+        lambda: ccode.ForLoop(dummy, dummy, dummy),
+        lambda: ccode.Call(dummy, []),
+        lambda: ccode.Func(ct_int("a")),
+        lambda: ccode.StatementExpression(),
+        lambda: ccode.Cast(ct_int, dummy),
+        lambda: ccode.Subscript(dummy, dummy),
+        lambda: cdata.IntLiteral(1),
+        lambda: cdata.StringLiteral("a"),
+        lambda: cdata.CompoundLiteral([]),
+        lambda: ct_int("a"),
+        lambda: cdecl.NamelessArg(ct_int),
+        lambda: cdecl.Primitive("int"),
+        lambda: cdecl.Pointer(ct_int),
+        lambda: cdecl.Array(ct_int, 1),
+        lambda: cdecl.Func(ct_int, cdecl.void_args),
+        lambda: cdecl.Struct("a", []),
+        lambda: cdecl.Union("a", []),
+        lambda: cpp.LocalIncludeFile("a"),
+        lambda: cpp.GlobalIncludeFile("a"),
+        lambda: cpp.Include(dummy),
+    ]
+
+    def test_no_instance_dict(self):
+        for factory in self.NODES:
+            node = factory()
+            self.assertFalse(hasattr(node, "__dict__"), type(node))
+
+    def test_bytes_per_node(self):
+        slotted = bytes_per_node(lambda: ccode.Addition(dummy, dummy))
+        addition = with_dict(ccode.Addition)
+        unslotted = bytes_per_node(lambda: addition(dummy, dummy))
+        # a node with two children fits in the object header and two slots
+        self.assertLessEqual(slotted, 64)
+        self.assertLess(slotted, unslotted)
@@ -1,9 +1,11 @@
 #! /usr/bin/python3
 
 import io
+import os
+import tempfile
 import unittest
 
-from codegen.core import source, code
+from codegen.core import source, code, rendercache, renderprofile
 
 base_config = dict(
     indentation="indent",
@@ -29,6 +31,10 @@ class TestCode(CoreTest):
         with self.assertRaises(NotImplementedError):
             code.Code()._act(None)
 
+    def test_iterative_code_iter_act(self):
+        with self.assertRaises(NotImplementedError):
+            code.IterativeCode()._iter_act(None)
+
     def test_empty_line(self):
         def callback(sourceobj):
             sourceobj.add_element(code.empty_line)
@@ -69,3 +75,269 @@ class TestSource(CoreTest):
             sourceobj.add_element(self._test_config_seperate_elements_dummy)
             return "dummy\ndummy\n"
         self.check_gen(callback, seperate_elements=False)
+
+
+class CountingStream(io.StringIO):
+
+    def __init__(self):
+        io.StringIO.__init__(self)
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return io.StringIO.write(self, text)
+
+
+class TestBufferedSource(CoreTest):
+
+    _dummies = [
+        Dummy(lambda sourceobj: sourceobj.writeline("dummy")),
+        Dummy(lambda sourceobj: (sourceobj.indent(),
+                                 sourceobj.writeline("dummy"),
+                                 sourceobj.dedent())),
+    ]
+
+    def make_source(self):
+        sourceobj = source.Source(source.SourceConfig(**base_config))
+        for dummy in self._dummies:
+            sourceobj.add_element(dummy)
+        return sourceobj
+
+    def test_buffered_matches_unbuffered(self):
+        sourceobj = self.make_source()
+        buffered = io.StringIO()
+        sourceobj.make(buffered)
+        unbuffered = io.StringIO()
+        sourceobj.make(unbuffered, buffered=False)
+        self.assertEqual(buffered.getvalue(), "dummy\n\nindentdummy\n")
+        self.assertEqual(buffered.getvalue(), unbuffered.getvalue())
+
+    def test_buffered_writes_once(self):
+        stream = CountingStream()
+        self.make_source().make(stream)
+        self.assertEqual(stream.writes, 1)
+
+    def test_buffered_threshold(self):
+        stream = CountingStream()
+        self.make_source().make(stream, threshold=1)
+        self.assertEqual(stream.writes, 5)
+        self.assertEqual(stream.getvalue(), "dummy\n\nindentdummy\n")
+
+
+class TestChunks(CoreTest):
+
+    def make_source(self, count):
+        sourceobj = source.Source(source.SourceConfig(**base_config))
+        for _ in range(count):
+            sourceobj.add_element(
+                Dummy(lambda sourceobj: sourceobj.writeline("dummy")))
+        return sourceobj
+
+    def test_iter_chunks(self):
+        chunks = list(self.make_source(100).iter_chunks(chunk_size=64))
+        self.assertEqual("".join(chunks), "dummy\n\n" * 99 + "dummy\n")
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(len(chunk), 64)
+
+    def test_iter_chunks_is_lazy(self):
+        chunks = self.make_source(100).iter_chunks(chunk_size=1)
+        self.assertEqual(next(chunks), "dummy")
+
+    def test_iter_chunks_empty(self):
+        self.assertEqual(list(self.make_source(0).iter_chunks()), [])
+
+    def test_make_to_path(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out.c")
+            self.make_source(2).make_to_path(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), "dummy\n\ndummy\n")
+
+
+class CachedNode(code.IterativeCode):
+
+    CACHEABLE = True
+
+    def __init__(self, text, children=()):
+        self.text = text
+        self.children = children
+        self.renders = 0
+
+    def _iter_act(self, source):
+        self.renders += 1
+        if self.text.endswith("\n"):
+            source.writeline(self.text[:-1])
+        else:
+            source.write(self.text)
+        for child in self.children:
+            yield child
+
+
+class MutableNode(code.IterativeCode):
+
+    MUTABLE = True
+
+    def __init__(self, text):
+        self.text = text
+        self._version = 0
+
+    def set_text(self, text):
+        self.text = text
+        self._version += 1
+
+    def _iter_act(self, source):
+        source.writeline(self.text)
+        source.indent()
+        return ()
+
+
+class TestRenderCache(CoreTest):
+
+    def make(self, sourceobj, render_cache):
+        stream = io.StringIO()
+        sourceobj.make(stream, render_cache=render_cache)
+        return stream.getvalue()
+
+    def make_source(self, *elements):
+        sourceobj = source.Source(source.SourceConfig(
+            indentation="\t",
+            seperate_elements=False,
+        ))
+        for element in elements:
+            sourceobj.add_element(element)
+        return sourceobj
+
+    def test_shared_subtree_rendered_once(self):
+        leaf = CachedNode("leaf\n")
+        shared = CachedNode("shared ", [leaf])
+        sourceobj = self.make_source(shared, shared, shared)
+        render_cache = rendercache.RenderCache()
+        self.assertEqual(self.make(sourceobj, render_cache),
+                         "shared leaf\n" * 3)
+        self.assertEqual(shared.renders, 1)
+        self.assertEqual(leaf.renders, 1)
+        self.assertEqual(render_cache.hits, 2)
+
+    def test_cache_keyed_by_indentation(self):
+        shared = CachedNode("shared")
+        sourceobj = self.make_source(
+            shared,
+            Dummy(lambda sourceobj: (sourceobj.linefeed(),
+                                     sourceobj.indent())),
+            shared,
+        )
+        render_cache = rendercache.RenderCache()
+        self.assertEqual(self.make(sourceobj, render_cache),
+                         "shared\n\tshared")
+        self.assertEqual(shared.renders, 2)
+
+    def test_mutation_invalidates_ancestors(self):
+        mutable = MutableNode("a")
+        inner = CachedNode("inner ", [mutable])
+        outer = CachedNode("outer ", [inner])
+        sourceobj = self.make_source(outer)
+        render_cache = rendercache.RenderCache()
+        self.assertEqual(self.make(sourceobj, render_cache), "outer inner a\n")
+        self.assertEqual(self.make(sourceobj, render_cache), "outer inner a\n")
+        self.assertEqual(outer.renders, 1)
+        mutable.set_text("b")
+        self.assertEqual(self.make(sourceobj, render_cache), "outer inner b\n")
+        self.assertEqual(outer.renders, 2)
+        self.assertEqual(inner.renders, 2)
+
+    def test_lru_eviction(self):
+        nodes = [CachedNode("{}\n".format(i)) for i in range(3)]
+        render_cache = rendercache.RenderCache(size=2)
+        self.make(self.make_source(*nodes), render_cache)
+        self.assertEqual(len(render_cache), 2)
+        self.make(self.make_source(nodes[0]), render_cache)
+        self.assertEqual(nodes[0].renders, 2)
+        self.make(self.make_source(nodes[2]), render_cache)
+        self.assertEqual(nodes[2].renders, 1)
+
+    def test_cache_output_matches_uncached(self):
+        shared = CachedNode("x", [CachedNode("y")])
+        sourceobj = self.make_source(shared, shared)
+        stream = io.StringIO()
+        sourceobj.make(stream)
+        render_cache = rendercache.RenderCache()
+        self.assertEqual(self.make(sourceobj, render_cache),
+                         stream.getvalue())
+
+    def test_nested_captures_are_shared(self):
+        stream = io.StringIO()
+        source_stream = source._BufferedSourceStream(
+            source.SourceConfig(**base_config), stream)
+        source_stream._begin_capture()
+        source_stream.write("x")
+        source_stream._begin_capture()
+        source_stream.writeline("y")
+        inner = source_stream._end_capture()
+        outer = source_stream._end_capture()
+        self.assertIs(outer._parts[-1], inner)
+        self.assertEqual((outer.length, outer.indented), (3, False))
+        source_stream._replay(outer)
+        source_stream.flush()
+        self.assertEqual(stream.getvalue(), "xy\nxy\n")
+        self.assertEqual(str(inner), "y\n")
+
+    def test_deep_nesting(self):
+        node = CachedNode("leaf\n")
+        for i in range(5000):
+            node = CachedNode("{} ".format(i), [node])
+        sourceobj = self.make_source(node, node)
+        stream = io.StringIO()
+        sourceobj.make(stream)
+        render_cache = rendercache.RenderCache(size=10000)
+        self.assertEqual(self.make(sourceobj, render_cache),
+                         stream.getvalue())
+        self.assertEqual(render_cache.hits, 1)
+
+
+class TestRenderProfile(CoreTest):
+
+    @staticmethod
+    def make_clock():
+        ticks = iter(range(1000))
+        return lambda: next(ticks)
+
+    def make(self, *elements, **kw):
+        sourceobj = source.Source(source.SourceConfig(**base_config))
+        for element in elements:
+            sourceobj.add_element(element)
+        stream = io.StringIO()
+        sourceobj.make(stream, **kw)
+        return stream.getvalue()
+
+    def test_profile(self):
+        profile = renderprofile.RenderProfile(clock=self.make_clock())
+        tree = CachedNode("outer ", [CachedNode("inner\n")])
+        self.assertEqual(self.make(tree, profile=profile), "outer inner\n")
+        self.assertEqual(profile.report(), [
+            renderprofile.NodeProfile("CachedNode", 2, 4, 3, 12),
+        ])
+
+    def test_profile_per_class(self):
+        profile = renderprofile.RenderProfile(clock=self.make_clock())
+        dummy = Dummy(lambda sourceobj: sourceobj.writeline("dummy"))
+        tree = CachedNode("outer ", [dummy])
+        self.make(tree, profile=profile)
+        report = {node.name: node for node in profile.report()}
+        self.assertEqual(report["CachedNode"].count, 1)
+        self.assertEqual(report["CachedNode"].cumulative_time, 3)
+        self.assertEqual(report["CachedNode"].self_time, 2)
+        self.assertEqual(report["CachedNode"].bytes, 6)
+        self.assertEqual(report["Dummy"].bytes, 6)
+        self.assertIn("CachedNode", profile.format())
+
+    def test_profile_with_render_cache(self):
+        profile = renderprofile.RenderProfile(clock=self.make_clock())
+        render_cache = rendercache.RenderCache()
+        shared = CachedNode("shared\n")
+        output = self.make(shared, shared, profile=profile,
+                           render_cache=render_cache)
+        self.assertEqual(output, "shared\n\nshared\n")
+        self.assertEqual(shared.renders, 1)
+        self.assertEqual(profile.report()[0].count, 2)
+        self.assertEqual(profile.report()[0].bytes, 14)
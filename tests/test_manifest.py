@@ -0,0 +1,92 @@
+#! /usr/bin/python3
+
+import os
+import stat
+import tempfile
+import unittest
+
+from codegen.core import code, manifest
+from codegen.lang.c import ccode, csource, ctemplate
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+        self.manifest_path = os.path.join(self.tmpdir, "manifest.json")
+        self.path = os.path.join(self.tmpdir, "a.c")
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    @staticmethod
+    def make_source(text):
+        sourceobj = csource.CSource()
+        sourceobj.add_element(ccode.Expr(text))
+        return sourceobj
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    @staticmethod
+    def mode(path):
+        return stat.S_IMODE(os.stat(path).st_mode)
+
+    def test_first_make_writes(self):
+        manifestobj = manifest.Manifest(self.manifest_path)
+        self.assertTrue(manifestobj.make(self.path, self.make_source("a")))
+        self.assertEqual(self.read(), "a")
+        self.assertEqual(manifestobj.changed, [self.path])
+
+    def test_unchanged_is_not_written(self):
+        manifestobj = manifest.Manifest(self.manifest_path)
+        manifestobj.make(self.path, self.make_source("a"))
+        manifestobj.save()
+        os.utime(self.path, (0, 0))
+        manifestobj = manifest.Manifest(self.manifest_path)
+        self.assertFalse(manifestobj.make(self.path, self.make_source("a")))
+        self.assertEqual(os.stat(self.path).st_mtime, 0)
+        self.assertEqual(manifestobj.changed, [])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ["a.c", "manifest.json"])
+
+    def test_changed_is_written(self):
+        manifestobj = manifest.Manifest(self.manifest_path)
+        manifestobj.make(self.path, self.make_source("a"))
+        self.assertTrue(manifestobj.make(self.path, self.make_source("b")))
+        self.assertEqual(self.read(), "b")
+
+    def test_missing_file_is_written(self):
+        manifestobj = manifest.Manifest(self.manifest_path)
+        manifestobj.make(self.path, self.make_source("a"))
+        os.unlink(self.path)
+        self.assertTrue(manifestobj.make(self.path, self.make_source("a")))
+        self.assertEqual(self.read(), "a")
+
+    def test_failed_render_keeps_file(self):
+        manifestobj = manifest.Manifest(self.manifest_path)
+        manifestobj.make(self.path, self.make_source("a"))
+        sourceobj = csource.CSource()
+        template = ctemplate.Template(ctemplate.Placeholder("a"))
+        sourceobj.add_element(template.instantiate({}))
+        with self.assertRaises(code.CodeError):
+            manifestobj.make(self.path, sourceobj)
+        self.assertEqual(self.read(), "a")
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["a.c"])
+
+    def test_new_file_mode(self):
+        reference = os.path.join(self.tmpdir, "b.c")
+        open(reference, "w").close()
+        manifestobj = manifest.Manifest(self.manifest_path)
+        manifestobj.make(self.path, self.make_source("a"))
+        self.assertEqual(self.mode(self.path), self.mode(reference))
+
+    def test_mode_is_kept(self):
+        manifestobj = manifest.Manifest(self.manifest_path)
+        manifestobj.make(self.path, self.make_source("a"))
+        os.chmod(self.path, 0o751)
+        manifestobj.make(self.path, self.make_source("b"))
+        self.assertEqual(self.read(), "b")
+        self.assertEqual(self.mode(self.path), 0o751)
@@ -0,0 +1,85 @@
+#! /usr/bin/python3
+
+import concurrent.futures
+import os
+import tempfile
+import unittest
+
+from codegen.core import code, manifest, project
+from codegen.lang.c import ccode, csource
+
+
+class Failing(code.Code):
+
+    def _act(self, source):
+        raise ValueError("failing")
+
+
+class TestProject(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def make_source(self, name):
+        sourceobj = csource.CSource()
+        sourceobj.add_element(ccode.Expr(name))
+        return sourceobj
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def read(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
+
+    def make_project(self, names):
+        projectobj = project.Project()
+        for name in names:
+            projectobj.add_file(self.path(name), self.make_source(name))
+        return projectobj
+
+    def test_process_pool(self):
+        names = ["a{}".format(i) for i in range(8)]
+        results = self.make_project(names).make(max_workers=2)
+        self.assertEqual([result.path for result in results],
+                         [self.path(name) for name in names])
+        for result in results:
+            self.assertIsNone(result.error)
+        for name in names:
+            self.assertEqual(self.read(name), name)
+
+    def test_errors_per_file(self):
+        projectobj = self.make_project(["a", "c"])
+        failing = csource.CSource()
+        failing.add_element(Failing())
+        projectobj.add_file(self.path("b"), failing)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            results = projectobj.make(executor)
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[2].error, ValueError)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(self.read("a"), "a")
+        self.assertEqual(self.read("c"), "c")
+
+    def test_manifest(self):
+        manifestobj = manifest.Manifest(self.path("manifest.json"))
+        projectobj = self.make_project(["a", "b"])
+        results = projectobj.make(max_workers=2, manifest=manifestobj)
+        self.assertEqual([result.changed for result in results],
+                         [True, True])
+        projectobj.files[self.path("b")] = self.make_source("c")
+        results = projectobj.make(max_workers=2, manifest=manifestobj)
+        self.assertEqual([result.changed for result in results],
+                         [False, True])
+        self.assertEqual(manifestobj.changed,
+                         [self.path("a"), self.path("b"), self.path("b")])
+        self.assertEqual(self.read("b"), "c")
+
+    def test_duplicate_path(self):
+        projectobj = self.make_project(["a"])
+        with self.assertRaises(code.CodeError):
+            projectobj.add_file(self.path("a"), self.make_source("a"))
@@ -0,0 +1,206 @@
+#! /usr/bin/python3
+
+import io
+import unittest
+
+from tests.lang.c.common import ct_int, lit
+
+from codegen.core import code, source, transform
+from codegen.lang.c import (ccode, cdata, cdce, cflatten, cfold, csource,
+                            cunroll)
+
+x = ccode.Expr("x")
+y = ccode.Expr("y")
+
+
+def render(element):
+    stream = io.StringIO()
+    element._act(source._SourceStream(csource._config, stream))
+    return stream.getvalue()
+
+
+class Counter(transform.Pass):
+
+    def __init__(self, types=None):
+        self.TYPES = types
+        self.seen = []
+
+    def transform(self, node):
+        self.seen.append(node)
+        return node
+
+
+class Rename(transform.Pass):
+
+    TYPES = (ccode.Expr,)
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+    def transform(self, node):
+        if type(node) is ccode.Expr and node.expr == self.old:
+            return ccode.Expr(self.new)
+        return node
+
+
+class TestSchema(unittest.TestCase):
+
+    def test_children(self):
+        call = ccode.Call(x, [y, lit(1)])
+        self.assertEqual(list(transform.children(call)), [x, y, call.args[1]])
+        self.assertIs(call.func, x)
+        subscript = ccode.Subscript(x, y)
+        self.assertEqual(list(transform.children(subscript)), [x, y])
+        self.assertEqual(list(transform.children(x)), [])
+
+    def test_block_children(self):
+        var = ccode.Variable(ct_int("a"))
+        elseb = ccode.ElseBlock(code=[y])
+        ifb = ccode.IfBlock(x, [var], [y], elseb=elseb)
+        self.assertEqual(list(transform.children(ifb)),
+                         [x, var, y, elseb])
+
+    def test_variable_children(self):
+        # the value of a variable is only walked where it is declared
+        var = ccode.Variable(ct_int("a"), x)
+        self.assertEqual(list(transform.children(var)), [])
+        self.assertEqual(list(transform.children(var, declared=True)), [x])
+        block = ccode.Block([var], [ccode.Addition(var, y)])
+        self.assertEqual(list(transform.iter_nodes(block)),
+                         [block, var, x, block.code[0], var, y])
+
+    def test_iter_nodes(self):
+        expr = ccode.Addition(ccode.Multiplication(x, y), lit(2))
+        self.assertEqual([type(node) for node in transform.iter_nodes(expr)],
+                         [ccode.Addition, ccode.Multiplication, ccode.Expr,
+                          ccode.Expr, cdata.IntLiteral])
+
+    def test_with_children_copies(self):
+        expr = ccode.Addition(x, y)
+        new = transform.with_children(expr, [x, x])
+        self.assertIsNot(new, expr)
+        self.assertIs(expr.right, y)
+        self.assertEqual(render(new), "x + x")
+        self.assertIs(transform.with_children(expr, [x, y]), expr)
+
+    def test_with_children_keeps_other_slots(self):
+        cast = ccode.Cast(ct_int, x)
+        new = transform.with_children(cast, [y])
+        self.assertIs(new.casttype, cast.casttype)
+        self.assertEqual(render(new), "(int)y")
+
+    def test_with_children_in_place(self):
+        block = ccode.Block(code=[x])
+        version = block._version
+        self.assertIs(transform.with_children(block, [[], [y]]), block)
+        self.assertEqual(block.code, [y])
+        self.assertNotEqual(block._version, version)
+
+
+class TestPassManager(unittest.TestCase):
+
+    def test_rewrites_everywhere(self):
+        loop = ccode.ForLoop(ccode.Assignment(x, lit(0)),
+                             ccode.LessThan(x, y), ccode.PostIncrement(x),
+                             code=[ccode.Call(ccode.Expr("f"), [x])])
+        block = ccode.Block([ccode.Variable(ct_int("a"), x)], [loop])
+        transform.PassManager([Rename("x", "i")]).run(block)
+        self.assertEqual(render(block), (
+            "{\n"
+            "\tint a = i;\n"
+            "\n"
+            "\tfor (i = 0; i < y; i++)\n"
+            "\t\tf(i);\n"
+            "}\n"
+        ))
+
+    def test_shared_subtrees_are_not_changed(self):
+        expr = ccode.Addition(x, y)
+        block = ccode.Block(code=[expr])
+        transform.PassManager([Rename("x", "i")]).run(block)
+        self.assertEqual(render(block.code[0]), "i + y")
+        self.assertEqual(render(expr), "x + y")
+
+    def test_fused_walk(self):
+        first = Counter()
+        second = Counter(types=(ccode._BinaryOperation,))
+        expr = ccode.Addition(ccode.Multiplication(x, y), x)
+        transform.PassManager([first, second]).run(expr)
+        self.assertEqual([type(n) for n in first.seen],
+                         [ccode.Expr, ccode.Expr, ccode.Multiplication,
+                          ccode.Expr, ccode.Addition])
+        self.assertEqual([type(n) for n in second.seen],
+                         [ccode.Multiplication, ccode.Addition])
+
+    def test_not_fusible_ends_walk(self):
+        # folding only sees the copies unrolling makes in a second walk
+        body = [ccode.AssignmentAddition(
+            x, ccode.Multiplication(ccode.Expr("i"), lit(2)))]
+        loop = ccode.ForLoop(ccode.Assignment(ccode.Expr("i"), lit(0)),
+                             ccode.LessThan(ccode.Expr("i"), lit(2)),
+                             ccode.PostIncrement(ccode.Expr("i")), code=body)
+        block = ccode.Block(code=[loop])
+        transform.PassManager([
+            cunroll.UnrollPass(),
+            cfold.FoldPass(),
+        ]).run(block)
+        self.assertEqual(render(block), (
+            "{\n"
+            "\tx += 0;\n"
+            "\tx += 2;\n"
+            "\ti = 2;\n"
+            "}\n"
+        ))
+
+    def test_splice(self):
+        block = ccode.Block(code=[
+            ccode.IfBlock(lit(1), code=[x, y]),
+            ccode.WhileLoop(lit(0), code=[x]),
+        ])
+        transform.PassManager([cdce.PrunePass()]).run(block)
+        self.assertEqual(block.code, [x, y])
+
+    def test_splice_into_single_slot(self):
+        class Split(transform.Pass):
+            TYPES = (ccode.Expr,)
+
+            def transform(self, node):
+                return [node, node]
+
+        with self.assertRaises(code.CodeError):
+            transform.PassManager([Split()]).run(ccode.Addition(x, y))
+
+    def test_passes_in_order(self):
+        expr = ccode.Addition(ccode.Addition(x, lit(1)), lit(2))
+        flattened = transform.PassManager([
+            cfold.FoldPass(),
+            cflatten.FlattenPass(),
+        ]).run(expr)
+        self.assertIs(type(flattened), ccode.NaryAddition)
+        self.assertEqual(render(flattened), "x + 1 + 2")
+
+    def test_defer(self):
+        class Outer(Counter):
+            def defer(self, node, parent):
+                return type(node) is type(parent)
+
+        counter = Outer(types=(ccode.Addition,))
+        inner = ccode.Addition(x, y)
+        expr = ccode.Multiplication(ccode.Addition(inner, x), inner)
+        transform.PassManager([counter]).run(expr)
+        self.assertEqual([render(node) for node in counter.seen],
+                         ["x + y + x", "x + y"])
+
+    def test_deep(self):
+        expr = x
+        for _ in range(10000):
+            expr = ccode.Addition(expr, lit(1))
+        first = Counter()
+        result = transform.PassManager([
+            cflatten.FlattenPass(),
+            first,
+        ]).run(expr)
+        self.assertIs(type(result), ccode.NaryAddition)
+        self.assertEqual(len(result.operands), 10001)
+        self.assertEqual(len(first.seen), 20001)